@@ -13,5 +13,11 @@
 # limitations under the License.
 
 from .blob import Blob
+from .blob import verify_many
+from .fetcher import AsyncFetcher
 from .fetcher import Fetcher
+from .fetcher import SubFetcher
+from .mmap_blob import MmapBlob
 from .ref import Ref
+from .refset import RefMap
+from .refset import RefSet
@@ -12,19 +12,48 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+
+from typing import IO
 from typing import Callable
+from typing import Deque
+from typing import Final
+from typing import Iterable
+from typing import Iterator
 from typing import Optional
+from typing import Tuple
+
+from collections import deque
+from concurrent.futures import Executor
+from concurrent.futures import Future
 
 from .ref import Hash
 from .ref import Ref
 
 ReadAll = Callable[[], bytes]
 
+# Returns a new iterator over the contents of a blob, in chunks of at most
+# the given size.
+OpenChunks = Callable[[int], Iterator[bytes]]
+
+# hashlib releases the GIL while hashing chunks larger than 2047 bytes, so
+# large chunks let blobs be hashed in parallel on threads.
+DEFAULT_CHUNK_SIZE: Final[int] = 1 << 20
+
 
 class Blob:
-    def __init__(self, ref: Ref, readall: ReadAll) -> None:
+    def __init__(
+        self,
+        ref: Ref,
+        readall: ReadAll,
+        open_chunks: Optional[OpenChunks] = None,
+    ) -> None:
+        """
+        'open_chunks', when provided, lets the contents be streamed without
+        reading them all in memory.
+        """
         self._ref: Ref = ref
         self._readall: ReadAll = readall
+        self._open_chunks: Optional[OpenChunks] = open_chunks
         self._bytes: Optional[bytes] = None
 
     def get_ref(self) -> Ref:
@@ -35,17 +64,46 @@ class Blob:
             self._bytes = self._readall()
         return self._bytes
 
+    def iter_chunks(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """
+        Yields the contents of the blob in chunks of at most 'chunk_size'
+        bytes, streaming them if the blob supports it.
+        """
+        if self._bytes is None and self._open_chunks is not None:
+            yield from self._open_chunks(chunk_size)
+            return
+
+        data: memoryview = memoryview(self.get_bytes())
+        for start in range(0, len(data), chunk_size):
+            yield data[start : start + chunk_size].tobytes()
+
+    def write_to(self, f: IO[bytes]) -> None:
+        """Writes the contents of the blob to a file object"""
+        for chunk in self.iter_chunks():
+            f.write(chunk)
+
     def is_utf8(self) -> bool:
+        data: bytes = self.get_bytes()
+        # ASCII is valid UTF-8, and checking it does not allocate
+        if data.isascii():
+            return True
         try:
-            self.get_bytes().decode("utf-8")
+            data.decode("utf-8")
         except UnicodeDecodeError:
             return False
         return True
 
     def is_valid(self) -> bool:
+        """Hashes the contents, in chunks, and compares them with the ref"""
         hash_: Hash = self._ref.get_new_hash()
-        hash_.update(self.get_bytes())
-        return hash_.hexdigest() == self._ref.get_hexdigest()
+        if self._bytes is not None:
+            hash_.update(self._bytes)
+        else:
+            for chunk in self.iter_chunks():
+                hash_.update(chunk)
+        return hash_.digest() == self._ref.get_bytes()
 
     @classmethod
     def from_contents_bytes(cls, data: bytes) -> "Blob":
@@ -55,3 +113,77 @@ class Blob:
     @classmethod
     def from_contents_str(cls, data: str) -> "Blob":
         return cls.from_contents_bytes(data.encode("utf-8"))
+
+    @classmethod
+    def from_file(
+        cls, f: IO[bytes], chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> "Blob":
+        """
+        Creates a blob from the rest of a seekable file object, hashing it
+        in chunks. The blob reads from the file object when its contents
+        are accessed.
+        """
+        start: int = f.tell()
+        ref: Ref = Ref.from_contents_chunks(_read_chunks(f, chunk_size))
+
+        def open_chunks(chunk_size: int) -> Iterator[bytes]:
+            f.seek(start)
+            return _read_chunks(f, chunk_size)
+
+        def readall() -> bytes:
+            f.seek(start)
+            return f.read()
+
+        return cls(ref=ref, readall=readall, open_chunks=open_chunks)
+
+    @classmethod
+    def from_path(
+        cls, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> "Blob":
+        """
+        Creates a blob from a file, hashing it in chunks. The file is opened
+        again whenever the contents of the blob are accessed.
+        """
+        with open(path, "rb") as f:
+            ref: Ref = Ref.from_contents_chunks(_read_chunks(f, chunk_size))
+
+        def open_chunks(chunk_size: int) -> Iterator[bytes]:
+            with open(path, "rb") as f:
+                yield from _read_chunks(f, chunk_size)
+
+        def readall() -> bytes:
+            with open(path, "rb") as f:
+                return f.read()
+
+        return cls(ref=ref, readall=readall, open_chunks=open_chunks)
+
+
+def verify_many(
+    blobs: Iterable[Blob], executor: Executor, *, window: int = 64
+) -> Iterator[Tuple[Blob, bool]]:
+    """
+    Checks the contents of many blobs against their refs on an executor,
+    keeping at most 'window' blobs in flight. Yields (blob, is_valid) in
+    the order of 'blobs'.
+    """
+    in_flight: Deque[Tuple[Blob, "Future[bool]"]] = deque()
+    try:
+        for blob in blobs:
+            in_flight.append((blob, executor.submit(blob.is_valid)))
+            if len(in_flight) >= window:
+                done_blob, future = in_flight.popleft()
+                yield done_blob, future.result()
+        while in_flight:
+            done_blob, future = in_flight.popleft()
+            yield done_blob, future.result()
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+
+
+def _read_chunks(f: IO[bytes], chunk_size: int) -> Iterator[bytes]:
+    while True:
+        chunk: bytes = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
@@ -14,6 +14,7 @@
 
 from typing import Optional
 from typing import Protocol
+from typing import runtime_checkable
 
 from .blob import Blob
 from .ref import Ref
@@ -22,3 +23,18 @@ from .ref import Ref
 class Fetcher(Protocol):
     def fetch_blob(self, ref: Ref) -> Optional[Blob]:
         ...
+
+
+@runtime_checkable
+class SubFetcher(Protocol):
+    def read_range(self, ref: Ref, offset: int, size: int) -> bytes:
+        """
+        Reads up to 'size' bytes of the blob starting at 'offset'. Fewer
+        bytes are returned when the blob ends first.
+        """
+        ...
+
+
+class AsyncFetcher(Protocol):
+    async def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+        ...
@@ -0,0 +1,92 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import IO
+from typing import Iterator
+
+import mmap
+import os
+from contextlib import contextmanager
+
+from .blob import Blob
+from .ref import Hash
+from .ref import Ref
+
+
+class MmapBlob(Blob):
+    """
+    Blob backed by a local file, which is memory-mapped whenever its
+    contents are accessed.
+
+    The contents are never cached in the blob: hashing and writing work
+    directly on the mapping and get_bytes() returns a new copy each time.
+    """
+
+    def __init__(self, ref: Ref, path: str) -> None:
+        super().__init__(
+            ref=ref,
+            readall=self._read_file,
+            open_chunks=self._open_file_chunks,
+        )
+        self._path: str = path
+
+    def get_path(self) -> str:
+        return self._path
+
+    def get_size(self) -> int:
+        return os.stat(self._path).st_size
+
+    @contextmanager
+    def open_memoryview(self) -> Iterator[memoryview]:
+        """
+        Maps the file and yields a read-only memoryview over it. The view,
+        and any slice of it, must not be used after the context exits.
+        """
+        with open(self._path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files can't be mapped.
+                yield memoryview(b"")
+                return
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view: memoryview = memoryview(mapped)
+                try:
+                    yield view
+                finally:
+                    view.release()
+
+    def get_bytes(self) -> bytes:
+        return self._read_file()
+
+    def is_valid(self) -> bool:
+        hash_: Hash = self._ref.get_new_hash()
+        with self.open_memoryview() as view:
+            hash_.update(view)
+        return hash_.digest() == self._ref.get_bytes()
+
+    def write_to(self, f: IO[bytes]) -> None:
+        with self.open_memoryview() as view:
+            f.write(view)
+
+    def _read_file(self) -> bytes:
+        with self.open_memoryview() as view:
+            return view.tobytes()
+
+    def _open_file_chunks(self, chunk_size: int) -> Iterator[bytes]:
+        # Chunks are copied out of the mapping, as callers may keep them
+        # after the file is unmapped.
+        with self.open_memoryview() as view:
+            for start in range(0, len(view), chunk_size):
+                yield view[start : start + chunk_size].tobytes()
@@ -12,15 +12,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Final
+from typing import Iterable
+from typing import List
+from typing import Optional
 from typing import Protocol
+from typing import Tuple
 from typing import Type
 from typing import runtime_checkable
 
 import enum
+import functools
 import hashlib
 
-from perkeepy.typing import assert_never
-
 
 class Hash(Protocol):
     def update(self, bytes: bytes) -> None:
@@ -41,12 +45,26 @@ class DigestAlgorithm(Protocol):
         ...
 
 
+@functools.total_ordering
 class Ref:
+    """
+    A reference to a blob: the digest of its contents and the algorithm
+    used to compute it.
+
+    Refs are immutable, hashable and ordered like their string form. They
+    use __slots__ and share digest algorithm instances, as millions of them
+    may be held in memory at once.
+    """
+
+    __slots__ = ("_digest_algorithm", "_bytes", "_str")
+
     def __init__(
         self, digest_algorithm: DigestAlgorithm, bytes_: bytes
     ) -> None:
-        self._digest_algorithm = digest_algorithm
-        self._bytes = bytes_
+        self._digest_algorithm: DigestAlgorithm = digest_algorithm
+        self._bytes: bytes = bytes(bytes_)
+        # The string form is computed lazily, then cached.
+        self._str: Optional[str] = None
 
     def get_digest_algorithm(self) -> DigestAlgorithm:
         return self._digest_algorithm
@@ -67,30 +85,75 @@ class Ref:
         if not isinstance(other, Ref):
             return False
         return (
-            self.get_digest_name() == other.get_digest_name()
-            and self.get_bytes() == other.get_bytes()
+            self._bytes == other._bytes
+            and self.get_digest_name() == other.get_digest_name()
         )
 
+    def __lt__(self, other: object) -> bool:
+        if not isinstance(other, Ref):
+            return NotImplemented
+        # Hex digests sort like the digest bytes they encode.
+        return (self.get_digest_name(), self._bytes) < (
+            other.get_digest_name(),
+            other._bytes,
+        )
+
+    def __hash__(self) -> int:
+        return hash(self._bytes)
+
+    def __repr__(self) -> str:
+        return f"Ref({self.to_str()!r})"
+
     def to_str(self) -> str:
-        digest_name: str = self.get_digest_name()
-        hexdigest: str = self.get_hexdigest()
-        return f"{digest_name}-{hexdigest}"
+        if self._str is None:
+            digest_name: str = self.get_digest_name()
+            hexdigest: str = self.get_hexdigest()
+            self._str = f"{digest_name}-{hexdigest}"
+        return self._str
 
     @staticmethod
     def get_currently_recommended_digest_algorithm() -> DigestAlgorithm:
-        return SHA224()
+        return _SHA224
 
     @classmethod
     def from_ref_str(cls, ref: str) -> "Ref":
         """Creates a ref from a 'digalg-blobref' string"""
-        digalg_name, hexdigest = ref.split("-")
-        return cls(
-            digest_algorithm=DigestAlgorithmName.get_digest_algorithm_from_name(
-                digalg_name,
+        digalg_name, hexdigest = _split_ref_str(ref)
+        return cls._from_digest(
+            DigestAlgorithmName.get_digest_algorithm_from_name(digalg_name),
+            _parse_hexdigest(
+                ref, hexdigest, _DIGEST_SIZES_BY_NAME[digalg_name]
             ),
-            bytes_=bytearray.fromhex(hexdigest),
         )
 
+    @classmethod
+    def parse_many(cls, refs: Iterable[str]) -> List["Ref"]:
+        """
+        Creates refs from many 'digalg-blobref' strings, looking up each
+        digest algorithm only once.
+        """
+        digest_algorithms: dict[str, DigestAlgorithm] = {}
+        parsed: List[Ref] = []
+
+        for ref in refs:
+            digalg_name, hexdigest = _split_ref_str(ref)
+            digest_algorithm: Optional[DigestAlgorithm] = digest_algorithms.get(
+                digalg_name
+            )
+            if digest_algorithm is None:
+                digest_algorithm = (
+                    DigestAlgorithmName.get_digest_algorithm_from_name(
+                        digalg_name
+                    )
+                )
+                digest_algorithms[digalg_name] = digest_algorithm
+            digest: bytes = _parse_hexdigest(
+                ref, hexdigest, _DIGEST_SIZES_BY_NAME[digalg_name]
+            )
+            parsed.append(cls._from_digest(digest_algorithm, digest))
+
+        return parsed
+
     @classmethod
     def from_contents_str(cls, data: str) -> "Ref":
         return cls.from_contents_bytes(data.encode("utf-8"))
@@ -101,9 +164,30 @@ class Ref:
         digest_alg = cls.get_currently_recommended_digest_algorithm()
         hasher = digest_alg.get_new_hash()
         hasher.update(data)
-        return Ref.from_ref_str(
-            f"{digest_alg.get_digest_name()}-{hasher.hexdigest()}"
-        )
+        return cls._from_digest(digest_alg, hasher.digest())
+
+    @classmethod
+    def from_contents_chunks(cls, chunks: Iterable[bytes]) -> "Ref":
+        """
+        Returns a blobref using the currently recommended hash function,
+        hashing the contents one chunk at a time.
+        """
+        digest_alg = cls.get_currently_recommended_digest_algorithm()
+        hasher = digest_alg.get_new_hash()
+        for chunk in chunks:
+            hasher.update(chunk)
+        return cls._from_digest(digest_alg, hasher.digest())
+
+    @classmethod
+    def _from_digest(
+        cls, digest_algorithm: DigestAlgorithm, digest: bytes
+    ) -> "Ref":
+        """Creates a ref without going through __init__'s conversions"""
+        ref: Ref = cls.__new__(cls)
+        ref._digest_algorithm = digest_algorithm
+        ref._bytes = digest
+        ref._str = None
+        return ref
 
 
 class DigestAlgorithmName(enum.Enum):
@@ -111,17 +195,22 @@ class DigestAlgorithmName(enum.Enum):
 
     @staticmethod
     def get_digest_algorithm_from_name(name: str) -> DigestAlgorithm:
-        digalg: DigestAlgorithmName = DigestAlgorithmName(name)
-        if digalg is DigestAlgorithmName.SHA224:
-            return SHA224()
-        else:
-            assert_never(digalg)
+        digest_algorithm: Optional[
+            DigestAlgorithm
+        ] = _DIGEST_ALGORITHMS_BY_NAME.get(name)
+        if digest_algorithm is None:
+            raise ValueError(f"{name!r} is not a valid DigestAlgorithmName")
+        return digest_algorithm
 
 
 class SHA224:
-    @staticmethod
-    def get_digest_name() -> str:
-        return DigestAlgorithmName.SHA224.value
+    __slots__ = ()
+
+    _DIGEST_NAME: Final[str] = DigestAlgorithmName.SHA224.value
+
+    @classmethod
+    def get_digest_name(cls) -> str:
+        return cls._DIGEST_NAME
 
     @staticmethod
     def get_new_hash() -> Hash:
@@ -132,6 +221,36 @@ class SHA224:
         f: DigestAlgorithm = sha224
 
 
+# Digest algorithms are stateless, all refs share the same instances.
+_SHA224: Final[SHA224] = SHA224()
+
+_DIGEST_ALGORITHMS_BY_NAME: Final[dict[str, DigestAlgorithm]] = {
+    SHA224.get_digest_name(): _SHA224,
+}
+
+_DIGEST_SIZES_BY_NAME: Final[dict[str, int]] = {
+    name: len(digest_algorithm.get_new_hash().digest())
+    for name, digest_algorithm in _DIGEST_ALGORITHMS_BY_NAME.items()
+}
+
+
+def _split_ref_str(ref: str) -> Tuple[str, str]:
+    digalg_name, separator, hexdigest = ref.partition("-")
+    if not separator:
+        raise ValueError(f"{ref!r} is not a 'digalg-blobref' string")
+    return digalg_name, hexdigest
+
+
+def _parse_hexdigest(ref: str, hexdigest: str, digest_size: int) -> bytes:
+    # bytes.fromhex() skips whitespace, so check the length of both forms.
+    digest: bytes = bytes.fromhex(hexdigest)
+    if len(hexdigest) != 2 * digest_size or len(digest) != digest_size:
+        raise ValueError(f"{ref!r} does not have a {digest_size} bytes digest")
+    return digest
+
+
 class SHA224Ref(Ref):
+    __slots__ = ()
+
     def get_digest_algorithm(self) -> DigestAlgorithm:
-        return SHA224()
+        return _SHA224
@@ -0,0 +1,381 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import TypeVar
+
+import itertools
+from array import array
+
+from .ref import DigestAlgorithm
+from .ref import Ref
+
+
+class RefSet:
+    """
+    Immutable set of refs stored as a sorted, contiguous buffer of raw
+    digests.
+
+    All refs must use the same digest algorithm. Memory use is the size of
+    the digests themselves (28 bytes per sha224 ref), membership is a binary
+    search and set operations merge the sorted buffers in linear time.
+    """
+
+    def __init__(
+        self,
+        refs: Iterable[Ref] = (),
+        *,
+        digest_algorithm: Optional[DigestAlgorithm] = None,
+    ) -> None:
+        self._digest_algorithm: DigestAlgorithm = (
+            digest_algorithm or Ref.get_currently_recommended_digest_algorithm()
+        )
+        self._digest_size: int = _get_digest_size(self._digest_algorithm)
+        digest_name: str = self._digest_algorithm.get_digest_name()
+        size: int = self._digest_size
+
+        def iter_runs() -> Iterator[bytearray]:
+            for run in _iter_runs(refs):
+                digests: set[bytes] = {
+                    _get_checked_digest(ref, digest_name, size) for ref in run
+                }
+                yield bytearray(b"".join(sorted(digests)))
+
+        def union(older: bytearray, newer: bytearray) -> bytearray:
+            return _merge_digests(
+                size, older, newer, keep_a=True, keep_b=True, keep_both=True
+            )
+
+        digests: bytearray = _merge_runs(iter_runs(), union, bytearray())
+        self._digests: bytes = bytes(digests)
+
+    @classmethod
+    def _from_digests(
+        cls, digest_algorithm: DigestAlgorithm, digests: bytes
+    ) -> "RefSet":
+        """Creates a set from a buffer of sorted, unique digests"""
+        refset: RefSet = cls(digest_algorithm=digest_algorithm)
+        refset._digests = digests
+        return refset
+
+    def get_digest_algorithm(self) -> DigestAlgorithm:
+        return self._digest_algorithm
+
+    def get_nbytes(self) -> int:
+        """Returns the size of the digests buffer"""
+        return len(self._digests)
+
+    def __len__(self) -> int:
+        return len(self._digests) // self._digest_size
+
+    def __contains__(self, ref: object) -> bool:
+        return self._index_of(ref) is not None
+
+    def __iter__(self) -> Iterator[Ref]:
+        """Yields refs in sorted order"""
+        size: int = self._digest_size
+        for start in range(0, len(self._digests), size):
+            yield Ref(
+                self._digest_algorithm, self._digests[start : start + size]
+            )
+
+    def union(self, other: "RefSet") -> "RefSet":
+        return self._merge(
+            other, keep_self=True, keep_other=True, keep_both=True
+        )
+
+    def intersection(self, other: "RefSet") -> "RefSet":
+        return self._merge(
+            other, keep_self=False, keep_other=False, keep_both=True
+        )
+
+    def difference(self, other: "RefSet") -> "RefSet":
+        return self._merge(
+            other, keep_self=True, keep_other=False, keep_both=False
+        )
+
+    def __or__(self, other: "RefSet") -> "RefSet":
+        return self.union(other)
+
+    def __and__(self, other: "RefSet") -> "RefSet":
+        return self.intersection(other)
+
+    def __sub__(self, other: "RefSet") -> "RefSet":
+        return self.difference(other)
+
+    def _index_of(self, ref: object) -> Optional[int]:
+        """Returns the position of the ref in the set, if it is there"""
+        if not isinstance(ref, Ref) or (
+            ref.get_digest_name() != self._digest_algorithm.get_digest_name()
+        ):
+            return None
+
+        digest: bytes = ref.get_bytes()
+        size: int = self._digest_size
+        index: int = _bisect_digests(self._digests, size, digest)
+        start: int = index * size
+        if self._digests[start : start + size] == digest:
+            return index
+        return None
+
+    def _merge(
+        self,
+        other: "RefSet",
+        *,
+        keep_self: bool,
+        keep_other: bool,
+        keep_both: bool,
+    ) -> "RefSet":
+        if (
+            other._digest_algorithm.get_digest_name()
+            != self._digest_algorithm.get_digest_name()
+        ):
+            raise ValueError("RefSets must use the same digest algorithm")
+
+        return RefSet._from_digests(
+            self._digest_algorithm,
+            bytes(
+                _merge_digests(
+                    self._digest_size,
+                    self._digests,
+                    other._digests,
+                    keep_a=keep_self,
+                    keep_b=keep_other,
+                    keep_both=keep_both,
+                )
+            ),
+        )
+
+
+class RefMap:
+    """
+    Immutable mapping of refs to integers (e.g. blob sizes), stored as a
+    RefSet plus a parallel array of 64-bit values.
+
+    When a ref is given more than once, the last value wins.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[Tuple[Ref, int]] = (),
+        *,
+        digest_algorithm: Optional[DigestAlgorithm] = None,
+    ) -> None:
+        digest_algorithm = (
+            digest_algorithm or Ref.get_currently_recommended_digest_algorithm()
+        )
+        digest_name: str = digest_algorithm.get_digest_name()
+        size: int = _get_digest_size(digest_algorithm)
+
+        def iter_runs() -> Iterator[_MapRun]:
+            for run in _iter_runs(items):
+                values_by_digest: dict[bytes, int] = {
+                    _get_checked_digest(ref, digest_name, size): value
+                    for ref, value in run
+                }
+                digests: List[bytes] = sorted(values_by_digest)
+                yield (
+                    bytearray(b"".join(digests)),
+                    array("q", (values_by_digest[d] for d in digests)),
+                )
+
+        digests, values = _merge_runs(
+            iter_runs(),
+            lambda older, newer: _merge_map_runs(size, older, newer),
+            (bytearray(), array("q")),
+        )
+        self._refs: RefSet = RefSet._from_digests(
+            digest_algorithm, bytes(digests)
+        )
+        self._values: array[int] = values
+
+    def get_refs(self) -> RefSet:
+        return self._refs
+
+    def get_nbytes(self) -> int:
+        """Returns the size of the digests and values buffers"""
+        return (
+            self._refs.get_nbytes() + len(self._values) * self._values.itemsize
+        )
+
+    def get(self, ref: Ref) -> Optional[int]:
+        index: Optional[int] = self._refs._index_of(ref)
+        if index is None:
+            return None
+        return self._values[index]
+
+    def __getitem__(self, ref: Ref) -> int:
+        value: Optional[int] = self.get(ref)
+        if value is None:
+            raise KeyError(ref)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, ref: object) -> bool:
+        return ref in self._refs
+
+    def __iter__(self) -> Iterator[Ref]:
+        return iter(self._refs)
+
+    def items(self) -> Iterator[Tuple[Ref, int]]:
+        """Yields (ref, value) pairs in sorted order"""
+        return zip(self._refs, self._values)
+
+
+# Refs are sorted this many at a time while building sets and maps, so
+# that only one run of them is held as Python objects.
+_RUN_SIZE: int = 1 << 16
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+# Sorted digests and their values
+_MapRun = Tuple[bytearray, "array[int]"]
+
+
+def _iter_runs(items: Iterable[_T]) -> Iterator[List[_T]]:
+    iterator: Iterator[_T] = iter(items)
+    while True:
+        run: List[_T] = list(itertools.islice(iterator, _RUN_SIZE))
+        if not run:
+            return
+        yield run
+
+
+def _merge_runs(
+    runs: Iterator[_R], merge: Callable[[_R, _R], _R], empty: _R
+) -> _R:
+    """
+    Merges sorted runs, given oldest first, two runs of the same level at a
+    time like a merge sort, so that each item is copied a logarithmic
+    number of times.
+    """
+    stack: List[Tuple[int, _R]] = []
+    for run in runs:
+        level: int = 0
+        while stack and stack[-1][0] == level:
+            run = merge(stack.pop()[1], run)
+            level += 1
+        stack.append((level, run))
+
+    if not stack:
+        return empty
+    merged: _R = stack.pop()[1]
+    while stack:
+        merged = merge(stack.pop()[1], merged)
+    return merged
+
+
+def _merge_digests(
+    size: int,
+    a: bytes,
+    b: bytes,
+    *,
+    keep_a: bool,
+    keep_b: bool,
+    keep_both: bool,
+) -> bytearray:
+    merged = bytearray()
+
+    i: int = 0
+    j: int = 0
+    while i < len(a) and j < len(b):
+        digest_a: bytes = a[i : i + size]
+        digest_b: bytes = b[j : j + size]
+        if digest_a < digest_b:
+            if keep_a:
+                merged += digest_a
+            i += size
+        elif digest_b < digest_a:
+            if keep_b:
+                merged += digest_b
+            j += size
+        else:
+            if keep_both:
+                merged += digest_a
+            i += size
+            j += size
+
+    if keep_a:
+        merged += a[i:]
+    if keep_b:
+        merged += b[j:]
+
+    return merged
+
+
+def _merge_map_runs(size: int, older: _MapRun, newer: _MapRun) -> _MapRun:
+    """Merges two map runs, keeping the newer value of common digests"""
+    a, a_values = older
+    b, b_values = newer
+    merged = bytearray()
+    values: array[int] = array("q")
+
+    i: int = 0
+    j: int = 0
+    while i < len(a_values) and j < len(b_values):
+        digest_a: bytes = a[i * size : (i + 1) * size]
+        digest_b: bytes = b[j * size : (j + 1) * size]
+        if digest_a < digest_b:
+            merged += digest_a
+            values.append(a_values[i])
+            i += 1
+        else:
+            merged += digest_b
+            values.append(b_values[j])
+            if digest_a == digest_b:
+                i += 1
+            j += 1
+
+    merged += a[i * size :]
+    values.extend(a_values[i:])
+    merged += b[j * size :]
+    values.extend(b_values[j:])
+
+    return merged, values
+
+
+def _get_checked_digest(ref: Ref, digest_name: str, size: int) -> bytes:
+    if ref.get_digest_name() != digest_name:
+        raise ValueError(f"{ref.to_str()} is not a {digest_name} ref")
+    digest: bytes = ref.get_bytes()
+    if len(digest) != size:
+        raise ValueError(f"{ref.to_str()} does not have a {size} bytes digest")
+    return digest
+
+
+def _get_digest_size(digest_algorithm: DigestAlgorithm) -> int:
+    return len(digest_algorithm.get_new_hash().digest())
+
+
+def _bisect_digests(digests: bytes, size: int, digest: bytes) -> int:
+    """Returns the index of the first digest greater or equal to 'digest'"""
+    lo: int = 0
+    hi: int = len(digests) // size
+    while lo < hi:
+        mid: int = (lo + hi) // 2
+        start: int = mid * size
+        if digests[start : start + size] < digest:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
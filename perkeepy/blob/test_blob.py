@@ -12,10 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
 import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 from perkeepy.blob import Blob
 from perkeepy.blob import Ref
+from perkeepy.blob import verify_many
 
 
 def test_is_utf8() -> None:
@@ -35,6 +43,8 @@ def test_is_utf8() -> None:
     )
     assert not blob.is_utf8()
 
+    assert Blob.from_contents_str("pattes d'orford, québec").is_utf8()
+
 
 def test_is_valid_fail() -> None:
     blob: Blob = Blob(
@@ -70,3 +80,79 @@ def test_from_contents_str() -> None:
     )
     assert blob.get_bytes().decode("utf-8") == "test"
     assert blob.is_valid()
+
+
+def test_iter_chunks() -> None:
+    blob: Blob = Blob.from_contents_str("0123456789")
+    assert list(blob.iter_chunks(chunk_size=4)) == [b"0123", b"4567", b"89"]
+    assert list(Blob.from_contents_str("").iter_chunks()) == []
+
+
+def test_is_valid_streams() -> None:
+    data: bytes = b"0123456789" * 100
+
+    def readall() -> bytes:
+        raise AssertionError("is_valid should not read the whole blob")
+
+    def open_chunks(chunk_size: int) -> Iterator[bytes]:
+        for start in range(0, len(data), chunk_size):
+            yield data[start : start + chunk_size]
+
+    blob: Blob = Blob(
+        ref=Ref.from_contents_bytes(data),
+        readall=readall,
+        open_chunks=open_chunks,
+    )
+    assert blob.is_valid()
+
+    blob = Blob(
+        ref=Ref.from_contents_str("other"),
+        readall=readall,
+        open_chunks=open_chunks,
+    )
+    assert not blob.is_valid()
+
+
+def test_from_path() -> None:
+    data: bytes = os.urandom(1000)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path: str = os.path.join(tmpdir, "blob")
+        with open(path, "wb") as f:
+            f.write(data)
+
+        blob: Blob = Blob.from_path(path, chunk_size=64)
+        assert blob.get_ref() == Ref.from_contents_bytes(data)
+        assert b"".join(blob.iter_chunks(chunk_size=100)) == data
+        assert blob.is_valid()
+        assert blob.get_bytes() == data
+
+
+def test_from_file() -> None:
+    data: bytes = os.urandom(1000)
+    with tempfile.TemporaryFile() as f:
+        f.write(b"header" + data)
+        f.seek(len(b"header"))
+
+        blob: Blob = Blob.from_file(f, chunk_size=64)
+        assert blob.get_ref() == Ref.from_contents_bytes(data)
+        assert blob.is_valid()
+        assert b"".join(blob.iter_chunks(chunk_size=100)) == data
+        assert blob.get_bytes() == data
+
+
+def test_verify_many() -> None:
+    blobs: List[Blob] = [Blob.from_contents_str(str(i)) for i in range(10)]
+    blobs.append(
+        Blob(
+            ref=Ref.from_contents_str("other"),
+            readall=lambda: b"contents",
+        )
+    )
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results: List[Tuple[Blob, bool]] = list(
+            verify_many(blobs, executor, window=3)
+        )
+
+    assert [blob for blob, _ in results] == blobs
+    assert [valid for _, valid in results] == [True] * 10 + [False]
@@ -0,0 +1,58 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import io
+import os
+import tempfile
+
+from perkeepy.blob import MmapBlob
+from perkeepy.blob import Ref
+
+
+def test_mmap_blob() -> None:
+    data: bytes = os.urandom(1000)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path: str = os.path.join(tmpdir, "blob")
+        with open(path, "wb") as f:
+            f.write(data)
+
+        blob = MmapBlob(ref=Ref.from_contents_bytes(data), path=path)
+        assert blob.get_size() == 1000
+        assert blob.is_valid()
+        assert blob.get_bytes() == data
+        assert blob._bytes is None
+        assert b"".join(blob.iter_chunks(chunk_size=64)) == data
+
+        with blob.open_memoryview() as view:
+            assert view[10:20] == data[10:20]
+
+        out = io.BytesIO()
+        blob.write_to(out)
+        assert out.getvalue() == data
+
+        assert not MmapBlob(
+            ref=Ref.from_contents_str("x"), path=path
+        ).is_valid()
+
+
+def test_mmap_blob_empty() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path: str = os.path.join(tmpdir, "blob")
+        open(path, "wb").close()
+
+        blob = MmapBlob(ref=Ref.from_contents_bytes(b""), path=path)
+        assert blob.is_valid()
+        assert blob.get_bytes() == b""
+        assert list(blob.iter_chunks()) == []
@@ -12,6 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import List
+
+import pytest
+
 from perkeepy.blob import Ref
 from perkeepy.blob.ref import SHA224Ref
 
@@ -37,3 +41,80 @@ def test_ref_equal() -> None:
     ) == Ref.from_ref_str(
         "sha224-d14a028c2a3a2bc9476102bb288234c415a2b01f828ea62ac5b3e42f"
     )
+
+
+def test_ref_hash() -> None:
+    ref_str: str = (
+        "sha224-d14a028c2a3a2bc9476102bb288234c415a2b01f828ea62ac5b3e42f"
+    )
+    refs: dict[Ref, str] = {Ref.from_ref_str(ref_str): "value"}
+    assert refs[Ref.from_ref_str(ref_str)] == "value"
+    assert len({Ref.from_ref_str(ref_str), Ref.from_ref_str(ref_str)}) == 1
+
+
+def test_ref_ordering() -> None:
+    ref_strs: List[str] = [
+        Ref.from_contents_str(str(i)).to_str() for i in range(100)
+    ]
+    refs: List[Ref] = [Ref.from_ref_str(ref_str) for ref_str in ref_strs]
+    assert [ref.to_str() for ref in sorted(refs)] == sorted(ref_strs)
+    assert refs[0] <= refs[0]
+    assert not refs[0] < refs[0]
+
+
+def test_ref_is_compact() -> None:
+    ref: Ref = Ref.from_contents_str("test")
+    assert not hasattr(ref, "__dict__")
+    assert (
+        ref.get_digest_algorithm()
+        is Ref.from_contents_str("other").get_digest_algorithm()
+    )
+    assert ref.to_str() is ref.to_str()
+
+
+def test_parse_many() -> None:
+    ref_strs: List[str] = [
+        Ref.from_contents_str(str(i)).to_str() for i in range(10)
+    ]
+    refs: List[Ref] = Ref.parse_many(ref_strs)
+    assert refs == [Ref.from_ref_str(ref_str) for ref_str in ref_strs]
+    assert [ref.to_str() for ref in refs] == ref_strs
+    assert Ref.parse_many([]) == []
+
+
+def test_from_ref_str_invalid() -> None:
+    with pytest.raises(ValueError):
+        Ref.from_ref_str("md5-d14a028c2a3a2bc9476102bb288234c4")
+    with pytest.raises(ValueError):
+        Ref.from_ref_str("sha224-xyz")
+    with pytest.raises(ValueError):
+        Ref.parse_many(["sha224-xyz"])
+
+    # Missing separator or digest
+    for ref_str in ("sha224", "sha224-", ""):
+        with pytest.raises(ValueError):
+            Ref.from_ref_str(ref_str)
+        with pytest.raises(ValueError):
+            Ref.parse_many([ref_str])
+
+    # Digests that do not match the length of a sha224
+    valid: str = "d14a028c2a3a2bc9476102bb288234c415a2b01f828ea62ac5b3e42f"
+    for ref_str in (
+        "sha224-abcd",
+        f"sha224-{valid}00",
+        f"sha224-{valid[:-2]} 2f",
+    ):
+        with pytest.raises(ValueError):
+            Ref.from_ref_str(ref_str)
+        with pytest.raises(ValueError):
+            Ref.parse_many([f"sha224-{valid}", ref_str])
+
+
+def test_from_ref_str_uppercase() -> None:
+    ref: Ref = Ref.from_ref_str(
+        "sha224-D14A028C2A3A2BC9476102BB288234C415A2B01F828EA62AC5B3E42F"
+    )
+    assert (
+        ref.to_str()
+        == "sha224-d14a028c2a3a2bc9476102bb288234c415a2b01f828ea62ac5b3e42f"
+    )
@@ -0,0 +1,117 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import List
+
+import hashlib
+
+import pytest
+
+from perkeepy.blob import Ref
+from perkeepy.blob import RefMap
+from perkeepy.blob import RefSet
+from perkeepy.blob import refset
+from perkeepy.blob.ref import Hash
+
+
+def make_refs(count: int) -> List[Ref]:
+    return [Ref.from_contents_str(str(i)) for i in range(count)]
+
+
+def test_refset() -> None:
+    refs: List[Ref] = make_refs(100)
+    refset = RefSet(refs + refs[:10])
+
+    assert len(refset) == 100
+    assert refset.get_nbytes() == 100 * 28
+    assert list(refset) == sorted(refs)
+    for ref in refs:
+        assert ref in refset
+    assert Ref.from_contents_str("missing") not in refset
+    assert "not a ref" not in refset
+
+    assert len(RefSet()) == 0
+    assert refs[0] not in RefSet()
+
+
+def test_refset_operations() -> None:
+    refs: List[Ref] = make_refs(30)
+    a = RefSet(refs[:20])
+    b = RefSet(refs[10:])
+
+    assert list(a | b) == sorted(refs)
+    assert list(a & b) == sorted(refs[10:20])
+    assert list(a - b) == sorted(refs[:10])
+    assert list(b - a) == sorted(refs[20:])
+    assert list(a - RefSet()) == list(a)
+    assert list(RefSet() | a) == list(a)
+
+
+def test_refset_digest_algorithm() -> None:
+    class OtherAlgorithm:
+        def get_digest_name(self) -> str:
+            return "other"
+
+        def get_new_hash(self) -> Hash:
+            return hashlib.sha224()
+
+    with pytest.raises(ValueError):
+        RefSet([Ref(OtherAlgorithm(), b"\x00" * 28)])
+
+
+def test_refset_digest_size() -> None:
+    refs: List[Ref] = make_refs(3)
+    short: Ref = Ref(refs[0].get_digest_algorithm(), b"\xab\xcd")
+
+    with pytest.raises(ValueError):
+        RefSet(refs + [short])
+    with pytest.raises(ValueError):
+        RefMap([(ref, 0) for ref in refs + [short]])
+
+
+def test_refmap() -> None:
+    refs: List[Ref] = make_refs(50)
+    refmap = RefMap([(ref, i) for i, ref in enumerate(refs)] + [(refs[0], -1)])
+
+    assert len(refmap) == 50
+    assert refmap.get_nbytes() == 50 * (28 + 8)
+    assert refmap[refs[0]] == -1
+    assert refmap.get(refs[7]) == 7
+    assert refs[7] in refmap
+    assert refmap.get(Ref.from_contents_str("missing")) is None
+    with pytest.raises(KeyError):
+        refmap[Ref.from_contents_str("missing")]
+
+    assert [ref for ref, _ in refmap.items()] == sorted(refs)
+    assert dict(refmap.items())[refs[3]] == 3
+    assert list(refmap.get_refs()) == sorted(refs)
+
+
+def test_refset_runs(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(refset, "_RUN_SIZE", 3)
+    refs: List[Ref] = make_refs(20)
+
+    ref_set = RefSet(list(reversed(refs)) + refs[5:12])
+    assert list(ref_set) == sorted(refs, key=lambda ref: ref.get_bytes())
+    assert ref_set.get_nbytes() == 20 * 28
+
+    ref_map = RefMap(
+        [(ref, i) for i, ref in enumerate(refs)]
+        + [(ref, -i) for i, ref in enumerate(refs[:7])]
+    )
+    assert len(ref_map) == 20
+    assert list(ref_map) == list(ref_set)
+    for i, ref in enumerate(refs):
+        assert ref_map.get(ref) == (-i if i < 7 else i)
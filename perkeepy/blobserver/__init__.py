@@ -12,6 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from .interface import AsyncBlobEnumerator
+from .interface import AsyncBlobReceiver
+from .interface import AsyncStorage
 from .interface import BlobEnumerator
 from .interface import BlobReceiver
+from .interface import BlobRemover
+from .interface import BlobStatter
 from .interface import Storage
@@ -0,0 +1,171 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Protocol
+
+import dataclasses
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blobserver import BlobRemover
+from perkeepy.blobserver import Storage
+from perkeepy.lru import LRUCache
+
+
+class DiskCache(Storage, BlobRemover, Protocol):
+    """Storage usable as the disk tier of a CachingStorage, e.g. LocalDisk"""
+
+    ...
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    # Fetches that waited for a concurrent fetch of the same blob
+    shared_fetches: int = 0
+    # Disk tier entries that did not match their ref, and were replaced
+    invalid_disk_entries: int = 0
+    misses: int = 0
+    bytes_from_cache: int = 0
+    bytes_from_storage: int = 0
+
+
+class CachingStorage:
+    """
+    Read-through cache in front of a storage. Blobs are immutable, so they
+    can be cached without invalidation.
+
+    Fetched blobs are kept in a memory LRU tier bounded by
+    'max_memory_bytes' and, if provided, in a 'disk_cache' storage (e.g.
+    LocalDisk). Blobs filling the cache are checked against their ref, and
+    disk entries that do not match their ref are replaced. Concurrent
+    fetches of the same blob share a single fetch.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        *,
+        max_memory_bytes: int = 64 << 20,
+        disk_cache: Optional[DiskCache] = None,
+    ) -> None:
+        self._storage: Storage = storage
+        self._disk_cache: Optional[DiskCache] = disk_cache
+        self._memory_cache: LRUCache[Ref, bytes] = LRUCache(
+            max_size=max_memory_bytes,
+            sizeof=len,
+        )
+        self._stats: CacheStats = CacheStats()
+        self._in_flight: Dict[Ref, "Future[Optional[bytes]]"] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def get_stats(self) -> CacheStats:
+        with self._lock:
+            return dataclasses.replace(self._stats)
+
+    def enumerate_blobs(self, after: Optional[Ref] = None) -> Iterator[Ref]:
+        return self._storage.enumerate_blobs(after=after)
+
+    def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+        data: Optional[bytes] = self._memory_cache.get(ref)
+        if data is not None:
+            with self._lock:
+                self._stats.memory_hits += 1
+                self._stats.bytes_from_cache += len(data)
+            return _new_blob(ref, data)
+
+        with self._lock:
+            future: Optional["Future[Optional[bytes]]"] = self._in_flight.get(
+                ref
+            )
+            if future is not None:
+                self._stats.shared_fetches += 1
+            else:
+                fill: "Future[Optional[bytes]]" = Future()
+                self._in_flight[ref] = fill
+
+        if future is not None:
+            data = future.result()
+        else:
+            try:
+                data = self._fill(ref)
+            except BaseException as e:
+                fill.set_exception(e)
+                raise
+            else:
+                fill.set_result(data)
+            finally:
+                with self._lock:
+                    del self._in_flight[ref]
+
+        if data is None:
+            return None
+        return _new_blob(ref, data)
+
+    def receive_blob(self, blob: Blob) -> None:
+        self._storage.receive_blob(blob)
+
+    def _fill(self, ref: Ref) -> Optional[bytes]:
+        """Fetches a blob missing from the memory tier"""
+        if self._disk_cache is not None:
+            cached: Optional[Blob] = self._disk_cache.fetch_blob(ref)
+            if cached is not None and cached.is_valid():
+                data: bytes = cached.get_bytes()
+                with self._lock:
+                    self._stats.disk_hits += 1
+                    self._stats.bytes_from_cache += len(data)
+                self._memory_cache.add(ref, data)
+                return data
+
+            if cached is not None:
+                # Corrupted entry, replaced below with the blob from storage
+                with self._lock:
+                    self._stats.invalid_disk_entries += 1
+                self._disk_cache.remove_blob(ref)
+
+        blob: Optional[Blob] = self._storage.fetch_blob(ref)
+        if blob is None:
+            with self._lock:
+                self._stats.misses += 1
+            return None
+
+        data = blob.get_bytes()
+        fetched: Blob = _new_blob(ref, data)
+        if not fetched.is_valid():
+            raise ValueError(f"Contents of blob {ref.to_str()} do not match")
+
+        with self._lock:
+            self._stats.misses += 1
+            self._stats.bytes_from_storage += len(data)
+
+        if self._disk_cache is not None:
+            self._disk_cache.receive_blob(fetched)
+        self._memory_cache.add(ref, data)
+        return data
+
+    @staticmethod
+    def _assert_implements_storage(bs: "CachingStorage") -> Storage:
+        return bs
+
+
+def _new_blob(ref: Ref, data: bytes) -> Blob:
+    return Blob(ref=ref, readall=lambda: data)
@@ -0,0 +1,156 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import List
+from typing import Optional
+
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blobserver import test_storage
+from perkeepy.blobserver.localdisk import LocalDisk
+from perkeepy.blobserver.memory import MemoryBlobServer
+
+from .caching import CacheStats
+from .caching import CachingStorage
+
+
+class CountingBlobServer(MemoryBlobServer):
+    def __init__(self) -> None:
+        super().__init__()
+        self.fetches: List[Ref] = []
+        self.fetch_started = threading.Event()
+        self.release_fetches = threading.Event()
+        self.release_fetches.set()
+
+    def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+        self.fetches.append(ref)
+        self.fetch_started.set()
+        self.release_fetches.wait()
+        return super().fetch_blob(ref)
+
+
+def test_caching() -> None:
+    test_storage.run_storage_test(CachingStorage(MemoryBlobServer()))
+
+
+def test_caching_memory() -> None:
+    storage = CountingBlobServer()
+    blob: Blob = Blob.from_contents_str("Hello, friends.")
+    storage.receive_blob(blob)
+
+    cache = CachingStorage(storage)
+    for _ in range(3):
+        fetched = cache.fetch_blob(blob.get_ref())
+        assert fetched is not None
+        assert fetched.get_bytes() == b"Hello, friends."
+
+    missing: Ref = Ref.from_contents_str("missing")
+    assert cache.fetch_blob(missing) is None
+
+    assert storage.fetches == [blob.get_ref(), missing]
+    assert cache.get_stats() == CacheStats(
+        memory_hits=2,
+        misses=2,
+        bytes_from_cache=30,
+        bytes_from_storage=15,
+    )
+
+
+def test_caching_disk() -> None:
+    storage = CountingBlobServer()
+    blob: Blob = Blob.from_contents_str("Hello, friends.")
+    storage.receive_blob(blob)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = CachingStorage(storage, disk_cache=LocalDisk(tmpdir))
+        assert cache.fetch_blob(blob.get_ref()) is not None
+
+        # A new cache on the same directory does not fetch the blob again
+        cache = CachingStorage(storage, disk_cache=LocalDisk(tmpdir))
+        fetched = cache.fetch_blob(blob.get_ref())
+        assert fetched is not None
+        assert fetched.get_bytes() == b"Hello, friends."
+
+        assert storage.fetches == [blob.get_ref()]
+        assert cache.get_stats().disk_hits == 1
+
+
+def test_caching_disk_replaces_invalid_entry() -> None:
+    storage = CountingBlobServer()
+    blob: Blob = Blob.from_contents_str("Hello, friends.")
+    storage.receive_blob(blob)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        disk_cache = LocalDisk(tmpdir)
+        disk_cache.receive_blob(blob)
+        with open(disk_cache.get_blob_path(blob.get_ref()), "wb") as f:
+            f.write(b"corrupted")
+
+        cache = CachingStorage(storage, disk_cache=disk_cache)
+        fetched = cache.fetch_blob(blob.get_ref())
+        assert fetched is not None
+        assert fetched.get_bytes() == b"Hello, friends."
+        assert cache.get_stats().invalid_disk_entries == 1
+
+        # The entry was replaced, the next cache reads it from disk
+        cache = CachingStorage(storage, disk_cache=disk_cache)
+        assert cache.fetch_blob(blob.get_ref()) is not None
+        assert cache.get_stats().disk_hits == 1
+        assert storage.fetches == [blob.get_ref()]
+
+
+def test_caching_invalid_blob() -> None:
+    storage = MemoryBlobServer()
+    ref: Ref = Ref.from_contents_str("Hello, friends.")
+    storage.blobs[ref.to_str()] = Blob(ref=ref, readall=lambda: b"corrupted")
+
+    cache = CachingStorage(storage)
+    try:
+        cache.fetch_blob(ref)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected fetch_blob to fail")
+    assert cache.get_stats().bytes_from_storage == 0
+
+
+def test_caching_shared_fetches() -> None:
+    storage = CountingBlobServer()
+    blob: Blob = Blob.from_contents_str("Hello, friends.")
+    storage.receive_blob(blob)
+    storage.release_fetches.clear()
+
+    cache = CachingStorage(storage)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        first = executor.submit(cache.fetch_blob, blob.get_ref())
+        storage.fetch_started.wait()
+        others = [
+            executor.submit(cache.fetch_blob, blob.get_ref()) for _ in range(3)
+        ]
+        while cache.get_stats().shared_fetches < 3:
+            time.sleep(0.001)
+        storage.release_fetches.set()
+
+        for future in [first, *others]:
+            fetched: Optional[Blob] = future.result()
+            assert fetched is not None
+            assert fetched.get_bytes() == b"Hello, friends."
+
+    assert storage.fetches == [blob.get_ref()]
@@ -12,10 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import AsyncIterator
+from typing import Dict
+from typing import Iterable
 from typing import Iterator
 from typing import Optional
 from typing import Protocol
+from typing import runtime_checkable
 
+from perkeepy.blob import AsyncFetcher
 from perkeepy.blob import Blob
 from perkeepy.blob import Fetcher
 from perkeepy.blob import Ref
@@ -35,6 +40,22 @@ class BlobReceiver(Protocol):
         ...
 
 
+class BlobRemover(Protocol):
+    def remove_blob(self, ref: Ref) -> None:
+        """Removing non-existent blobs is OK"""
+        ...
+
+
+@runtime_checkable
+class BlobStatter(Protocol):
+    def stat_blobs(self, refs: Iterable[Ref]) -> Dict[Ref, int]:
+        """
+        Returns the size of the given blobs that exist, without fetching
+        their contents.
+        """
+        ...
+
+
 class Storage(Fetcher, BlobEnumerator, BlobReceiver, Protocol):
     """
     Storage is the interface that must be implemented by a blobserver
@@ -42,3 +63,28 @@ class Storage(Fetcher, BlobEnumerator, BlobReceiver, Protocol):
     """
 
     ...
+
+
+class AsyncBlobEnumerator(Protocol):
+    def enumerate_blobs(self, after: Optional[Ref]) -> AsyncIterator[Ref]:
+        """
+        Asynchronous version of BlobEnumerator.enumerate_blobs, usually
+        implemented as an async generator.
+        """
+        ...
+
+
+class AsyncBlobReceiver(Protocol):
+    async def receive_blob(self, blob: Blob) -> None:
+        ...
+
+
+class AsyncStorage(
+    AsyncFetcher, AsyncBlobEnumerator, AsyncBlobReceiver, Protocol
+):
+    """
+    AsyncStorage is the asyncio counterpart of Storage, letting many
+    fetches be in flight on a single event loop.
+    """
+
+    ...
@@ -0,0 +1,178 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+import os
+import tempfile
+
+from perkeepy.blob import Blob
+from perkeepy.blob import MmapBlob
+from perkeepy.blob import Ref
+from perkeepy.blob.ref import DigestAlgorithmName
+from perkeepy.blobserver import BlobRemover
+from perkeepy.blobserver import BlobStatter
+from perkeepy.blobserver import Storage
+
+
+class LocalDisk:
+    """
+    Blob server storing each blob in its own file, using Perkeep's sharded
+    directory layout:
+
+        <root>/<digest name>/<digest[0:2]>/<digest[2:4]>/<blobref>.dat
+
+    e.g. "sha224/d1/4a/sha224-d14a028c2a...e42f.dat"
+    """
+
+    _BLOB_EXTENSION = ".dat"
+
+    def __init__(self, root: str, *, fsync: bool = True) -> None:
+        """
+        When 'fsync' is true, received blobs are flushed to disk before
+        being moved in place.
+        """
+        self._root: str = root
+        self._fsync: bool = fsync
+        os.makedirs(root, exist_ok=True)
+
+    def get_blob_path(self, ref: Ref) -> str:
+        return os.path.join(
+            self._get_blob_directory(ref),
+            ref.to_str() + self._BLOB_EXTENSION,
+        )
+
+    def enumerate_blobs(self, after: Optional[Ref] = None) -> Iterator[Ref]:
+        """
+        Walks the shards in order, skipping those that only contain refs
+        smaller or equal to 'after' without listing them.
+        """
+        after_str: str = after.to_str() if after else ""
+        known_digest_names = {name.value for name in DigestAlgorithmName}
+
+        digest_names: List[str] = sorted(
+            (
+                name
+                for name in _list_directories(self._root)
+                if name in known_digest_names
+            ),
+            key=lambda name: name + "-",
+        )
+        for digest_name in digest_names:
+            digest_dir: str = os.path.join(self._root, digest_name)
+            prefix: str = digest_name + "-"
+            if _is_before(prefix, after_str):
+                continue
+
+            for shard_1 in sorted(_list_directories(digest_dir)):
+                shard_1_dir: str = os.path.join(digest_dir, shard_1)
+                if _is_before(prefix + shard_1, after_str):
+                    continue
+
+                for shard_2 in sorted(_list_directories(shard_1_dir)):
+                    shard_2_dir: str = os.path.join(shard_1_dir, shard_2)
+                    if _is_before(prefix + shard_1 + shard_2, after_str):
+                        continue
+
+                    ref_strs: List[str] = sorted(
+                        filename[: -len(self._BLOB_EXTENSION)]
+                        for filename in os.listdir(shard_2_dir)
+                        if filename.endswith(self._BLOB_EXTENSION)
+                    )
+                    yield from Ref.parse_many(
+                        ref_str for ref_str in ref_strs if ref_str > after_str
+                    )
+
+    def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+        path: str = self.get_blob_path(ref)
+        if not os.path.isfile(path):
+            return None
+        return MmapBlob(ref=ref, path=path)
+
+    def receive_blob(self, blob: Blob) -> None:
+        """
+        Writes the blob to a temporary file in its shard directory, then
+        atomically renames it in place.
+        """
+        path: str = self.get_blob_path(blob.get_ref())
+        if os.path.exists(path):
+            return
+
+        directory: str = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                blob.write_to(f)
+                if self._fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def stat_blobs(self, refs: Iterable[Ref]) -> Dict[Ref, int]:
+        sizes: Dict[Ref, int] = {}
+        for ref in refs:
+            try:
+                sizes[ref] = os.stat(self.get_blob_path(ref)).st_size
+            except FileNotFoundError:
+                pass
+        return sizes
+
+    def remove_blob(self, ref: Ref) -> None:
+        try:
+            os.remove(self.get_blob_path(ref))
+        except FileNotFoundError:
+            pass
+
+    def _get_blob_directory(self, ref: Ref) -> str:
+        digest: str = ref.get_hexdigest()
+        return os.path.join(
+            self._root, ref.get_digest_name(), digest[0:2], digest[2:4]
+        )
+
+    @staticmethod
+    def _assert_implements_storage(bs: "LocalDisk") -> Storage:
+        return bs
+
+    @staticmethod
+    def _assert_implements_blob_remover(bs: "LocalDisk") -> BlobRemover:
+        return bs
+
+    @staticmethod
+    def _assert_implements_blob_statter(bs: "LocalDisk") -> BlobStatter:
+        return bs
+
+
+def _list_directories(path: str) -> Iterator[str]:
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                yield entry.name
+
+
+def _is_before(prefix: str, after: str) -> bool:
+    """
+    Whether all refs starting with 'prefix' are smaller than 'after', in
+    which case the shard can be skipped.
+    """
+    return not after.startswith(prefix) and prefix < after
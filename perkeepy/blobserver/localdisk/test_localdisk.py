@@ -0,0 +1,101 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import tempfile
+
+from perkeepy.blob import Blob
+from perkeepy.blob import MmapBlob
+from perkeepy.blob import Ref
+from perkeepy.blobserver import test_storage
+
+from .localdisk import LocalDisk
+
+
+def test_localdisk() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        test_storage.run_storage_test(LocalDisk(tmpdir, fsync=False))
+
+
+def test_localdisk_layout() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bs = LocalDisk(tmpdir)
+        blob: Blob = Blob.from_contents_str("Hello, friends.")
+        bs.receive_blob(blob)
+
+        digest: str = blob.get_ref().get_hexdigest()
+        shard_dir: str = os.path.join(tmpdir, "sha224", digest[:2], digest[2:4])
+        assert os.listdir(shard_dir) == [blob.get_ref().to_str() + ".dat"]
+
+        fetched = bs.fetch_blob(blob.get_ref())
+        assert isinstance(fetched, MmapBlob)
+        assert fetched.get_bytes() == b"Hello, friends."
+
+
+def test_localdisk_ignores_unknown_files() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bs = LocalDisk(tmpdir)
+        blob: Blob = Blob.from_contents_str("Hello, friends.")
+        bs.receive_blob(blob)
+
+        # Leftovers from an interrupted write and unrelated directories
+        shard_dir: str = os.path.dirname(bs.get_blob_path(blob.get_ref()))
+        open(os.path.join(shard_dir, "tmp1234.tmp"), "wb").close()
+        os.makedirs(os.path.join(tmpdir, "lost+found"))
+
+        assert list(bs.enumerate_blobs()) == [blob.get_ref()]
+
+
+def test_localdisk_receive_failure() -> None:
+    def failing_readall() -> bytes:
+        raise IOError("read failed")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bs = LocalDisk(tmpdir)
+        ref: Ref = Ref.from_contents_str("Hello, friends.")
+        try:
+            bs.receive_blob(Blob(ref, failing_readall))
+        except IOError:
+            pass
+        else:
+            raise AssertionError("expected receive_blob to fail")
+
+        assert bs.fetch_blob(ref) is None
+        assert os.listdir(os.path.dirname(bs.get_blob_path(ref))) == []
+
+
+def test_localdisk_remove_blob() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bs = LocalDisk(tmpdir)
+        blob: Blob = Blob.from_contents_str("Hello, friends.")
+        bs.receive_blob(blob)
+
+        bs.remove_blob(blob.get_ref())
+        assert bs.fetch_blob(blob.get_ref()) is None
+
+        # Removing a missing blob is OK
+        bs.remove_blob(blob.get_ref())
+
+
+def test_localdisk_stat_blobs() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bs = LocalDisk(tmpdir)
+        blob: Blob = Blob.from_contents_str("Hello, friends.")
+        bs.receive_blob(blob)
+
+        missing: Ref = Ref.from_contents_str("missing")
+        assert bs.stat_blobs([blob.get_ref(), missing]) == {
+            blob.get_ref(): len(b"Hello, friends.")
+        }
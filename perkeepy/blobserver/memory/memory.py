@@ -12,34 +12,89 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import AsyncIterator
 from typing import Iterator
 from typing import Optional
 
+import bisect
+
 from perkeepy.blob import Blob
 from perkeepy.blob import Ref
+from perkeepy.blobserver import AsyncStorage
 from perkeepy.blobserver import Storage
 
 
 class MemoryBlobServer:
-    """Memory-based blob server. Mostly used for tests."""
+    """
+    Memory-based blob server. Mostly used for tests.
+
+    Refs are kept in a sorted list next to the blobs so that enumeration
+    can start from 'after' with a binary search.
+    """
 
     def __init__(
         self,
     ) -> None:
         self.blobs: dict[str, Blob] = dict()
+        self._sorted_refs: list[str] = []
+        # Incremented when refs are added, so that ongoing enumerations
+        # know that they need to look for their position again.
+        self._version: int = 0
 
     def enumerate_blobs(self, after: Optional[Ref] = None) -> Iterator[Ref]:
-        if after:
-            raise Exception("after is not yet supported")
-        for _, blob in sorted(self.blobs.items(), key=lambda x: x[0]):
-            yield blob.get_ref()
+        ref_str: str = after.to_str() if after else ""
+        index: int = bisect.bisect_right(self._sorted_refs, ref_str)
+        version: int = self._version
+
+        while index < len(self._sorted_refs):
+            ref_str = self._sorted_refs[index]
+            yield self.blobs[ref_str].get_ref()
+
+            if version == self._version:
+                index += 1
+            else:
+                index = bisect.bisect_right(self._sorted_refs, ref_str)
+                version = self._version
 
     def fetch_blob(self, ref: Ref) -> Optional[Blob]:
         return self.blobs.get(ref.to_str())
 
     def receive_blob(self, blob: Blob) -> None:
-        self.blobs[blob.get_ref().to_str()] = blob
+        ref_str: str = blob.get_ref().to_str()
+        if ref_str not in self.blobs:
+            bisect.insort(self._sorted_refs, ref_str)
+            self._version += 1
+        self.blobs[ref_str] = blob
 
     @staticmethod
     def _assert_implements_storage(bs: "MemoryBlobServer") -> Storage:
         return bs
+
+
+class AsyncMemoryBlobServer:
+    """
+    Asynchronous version of MemoryBlobServer. Mostly used for tests.
+    """
+
+    def __init__(
+        self,
+    ) -> None:
+        self._blobserver: MemoryBlobServer = MemoryBlobServer()
+
+    async def enumerate_blobs(
+        self, after: Optional[Ref] = None
+    ) -> AsyncIterator[Ref]:
+        for ref in self._blobserver.enumerate_blobs(after=after):
+            yield ref
+
+    async def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+        return self._blobserver.fetch_blob(ref)
+
+    async def receive_blob(self, blob: Blob) -> None:
+        self._blobserver.receive_blob(blob)
+
+    @staticmethod
+    def _assert_implements_async_storage(
+        bs: "AsyncMemoryBlobServer",
+    ) -> AsyncStorage:
+        return bs
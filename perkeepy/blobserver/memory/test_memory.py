@@ -0,0 +1,50 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Iterator
+from typing import List
+
+import asyncio
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blobserver import test_storage
+
+from .memory import AsyncMemoryBlobServer
+from .memory import MemoryBlobServer
+
+
+def test_memory() -> None:
+    test_storage.run_storage_test(MemoryBlobServer())
+
+
+def test_async_memory() -> None:
+    asyncio.run(test_storage.run_async_storage_test(AsyncMemoryBlobServer()))
+
+
+def test_receive_while_enumerating() -> None:
+    bs = MemoryBlobServer()
+    blobs: List[Blob] = [Blob.from_contents_str(f"{i}") for i in range(10)]
+    for blob in blobs[:5]:
+        bs.receive_blob(blob)
+
+    refs: Iterator[Ref] = bs.enumerate_blobs()
+    first: Ref = next(refs)
+    for blob in blobs[5:]:
+        bs.receive_blob(blob)
+
+    expected: List[str] = sorted(blob.get_ref().to_str() for blob in blobs)
+    expected = [ref for ref in expected if ref > first.to_str()]
+    assert [ref.to_str() for ref in refs] == expected
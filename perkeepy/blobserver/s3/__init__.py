@@ -12,5 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from .async_s3 import AsyncS3
+from .async_s3 import AsyncS3Client
 from .s3 import S3
 from .s3 import S3Client
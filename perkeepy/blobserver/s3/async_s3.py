@@ -0,0 +1,206 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import AsyncIterator
+from typing import List
+from typing import Optional
+from typing import Protocol
+from typing import TypedDict
+
+import asyncio
+
+from botocore.exceptions import ClientError
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blobserver import AsyncStorage
+
+from .s3 import S3HeadObjectResponse
+from .s3 import S3ListObjectsV2Response
+from .s3 import is_not_found
+
+
+class AsyncStreamingBody(Protocol):
+    async def read(self) -> bytes:
+        ...
+
+
+class AsyncS3GetObjectResponse(TypedDict):
+    Body: AsyncStreamingBody
+
+
+class AsyncS3Client(Protocol):
+    """
+    Asynchronous S3 client, such as the ones created by aiobotocore.
+    """
+
+    async def list_objects_v2(
+        self,
+        *,
+        Bucket: str,
+        Prefix: Optional[str] = None,
+        StartAfter: str = "",
+        ContinuationToken: str = "",
+        MaxKeys: int = 1000,
+    ) -> S3ListObjectsV2Response:
+        ...
+
+    async def get_object(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        Range: str = "",
+    ) -> AsyncS3GetObjectResponse:
+        ...
+
+    async def head_object(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+    ) -> S3HeadObjectResponse:
+        ...
+
+    async def put_object(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        Body: bytes,
+    ) -> object:
+        ...
+
+
+class AsyncS3:
+    """
+    Asynchronous version of S3.
+
+    Blobs are uploaded with a single put_object request, which S3 accepts
+    for objects of up to 5 GB.
+    """
+
+    def __init__(
+        self,
+        *,
+        s3_client: AsyncS3Client,
+        bucket: str,
+        dirprefix: Optional[str] = None,
+        list_page_size: int = 1000,
+    ) -> None:
+        self.client: AsyncS3Client = s3_client
+        self.bucket: str = bucket
+        self.dirprefix: str = dirprefix.strip("/") + "/" if dirprefix else ""
+        self.list_page_size: int = list_page_size
+
+    async def enumerate_blobs(
+        self, after: Optional[Ref] = None
+    ) -> AsyncIterator[Ref]:
+        """
+        The next page is requested as soon as the current one is received,
+        while the caller consumes it.
+        """
+        start_after: str = self.dirprefix + after.to_str() if after else ""
+        next_page: "asyncio.Task[S3ListObjectsV2Response]" = (
+            asyncio.create_task(self._list_objects_page(start_after, None))
+        )
+
+        try:
+            while True:
+                resp: S3ListObjectsV2Response = await next_page
+                if resp.get("IsTruncated"):
+                    next_page = asyncio.create_task(
+                        self._list_objects_page(
+                            start_after, resp["NextContinuationToken"]
+                        )
+                    )
+
+                refs: List[Ref] = Ref.parse_many(
+                    s3_object["Key"][len(self.dirprefix) :]
+                    for s3_object in resp.get("Contents", [])
+                )
+                for ref in refs:
+                    yield ref
+
+                if not resp.get("IsTruncated"):
+                    break
+        finally:
+            next_page.cancel()
+
+    async def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+        try:
+            resp: AsyncS3GetObjectResponse = await self.client.get_object(
+                Bucket=self.bucket,
+                Key=self._get_key(ref),
+            )
+        except ClientError as e:
+            if is_not_found(e):
+                return None
+            raise
+        data: bytes = await resp["Body"].read()
+        return Blob(ref=ref, readall=lambda: data)
+
+    async def read_range(self, ref: Ref, offset: int, size: int) -> bytes:
+        """
+        Reads up to 'size' bytes of the blob starting at 'offset', with a
+        single ranged request.
+        """
+        if size <= 0:
+            return b""
+        resp: AsyncS3GetObjectResponse = await self.client.get_object(
+            Bucket=self.bucket,
+            Key=self._get_key(ref),
+            Range=f"bytes={offset}-{offset + size - 1}",
+        )
+        return await resp["Body"].read()
+
+    async def receive_blob(self, blob: Blob) -> None:
+        key: str = self._get_key(blob.get_ref())
+        try:
+            await self.client.head_object(Bucket=self.bucket, Key=key)
+            return
+        except ClientError as e:
+            if not is_not_found(e):
+                raise
+
+        await self.client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=blob.get_bytes(),
+        )
+
+    async def _list_objects_page(
+        self, start_after: str, continuation_token: Optional[str]
+    ) -> S3ListObjectsV2Response:
+        if continuation_token is None:
+            return await self.client.list_objects_v2(
+                Bucket=self.bucket,
+                Prefix=self.dirprefix,
+                StartAfter=start_after,
+                MaxKeys=self.list_page_size,
+            )
+        return await self.client.list_objects_v2(
+            Bucket=self.bucket,
+            Prefix=self.dirprefix,
+            ContinuationToken=continuation_token,
+            MaxKeys=self.list_page_size,
+        )
+
+    def _get_key(self, ref: Ref) -> str:
+        return self.dirprefix + ref.to_str()
+
+    @staticmethod
+    def _assert_implements_async_storage(s3: "AsyncS3") -> AsyncStorage:
+        return s3
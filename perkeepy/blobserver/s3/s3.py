@@ -12,38 +12,81 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Deque
+from typing import Dict
+from typing import Iterable
 from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Protocol
+from typing import Tuple
 from typing import TypedDict
+from typing import Union
 
+import bisect
+import itertools
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
 from botocore.response import StreamingBody
 
 from perkeepy.blob import Blob
 from perkeepy.blob import Ref
+from perkeepy.blob import SubFetcher
+from perkeepy.blob.ref import DigestAlgorithmName
+from perkeepy.blobserver import BlobStatter
 from perkeepy.blobserver import Storage
 
 
 class S3ObjectMetadata(TypedDict):
     Key: str
+    Size: int
 
 
-class S3ListObjectsV2Response(TypedDict):
+class S3ListObjectsV2Response(TypedDict, total=False):
     Contents: List[S3ObjectMetadata]
+    IsTruncated: bool
+    NextContinuationToken: str
 
 
 class S3GetObjectResponse(TypedDict):
     Body: StreamingBody
 
 
+class S3HeadObjectResponse(TypedDict):
+    ContentLength: int
+
+
+class S3CreateMultipartUploadResponse(TypedDict):
+    UploadId: str
+
+
+class S3UploadPartResponse(TypedDict):
+    ETag: str
+
+
+class S3CompletedPart(TypedDict):
+    ETag: str
+    PartNumber: int
+
+
+class S3CompletedMultipartUpload(TypedDict):
+    Parts: List[S3CompletedPart]
+
+
 class S3Client(Protocol):
     def list_objects_v2(
         self,
         *,
         Bucket: str,
         Prefix: Optional[str] = None,
-        StartAfter: str,
+        StartAfter: str = "",
+        ContinuationToken: str = "",
+        MaxKeys: int = 1000,
     ) -> S3ListObjectsV2Response:
         ...
 
@@ -52,56 +95,438 @@ class S3Client(Protocol):
         *,
         Bucket: str,
         Key: str,
+        Range: str = "",
     ) -> S3GetObjectResponse:
         ...
 
+    def head_object(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+    ) -> S3HeadObjectResponse:
+        ...
+
+    def put_object(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        Body: bytes,
+    ) -> object:
+        ...
+
+    def create_multipart_upload(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+    ) -> S3CreateMultipartUploadResponse:
+        ...
+
+    def upload_part(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        UploadId: str,
+        PartNumber: int,
+        Body: bytes,
+    ) -> S3UploadPartResponse:
+        ...
+
+    def complete_multipart_upload(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        UploadId: str,
+        MultipartUpload: S3CompletedMultipartUpload,
+    ) -> object:
+        ...
+
+    def abort_multipart_upload(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        UploadId: str,
+    ) -> object:
+        ...
+
 
 class S3:
+    # S3 rejects multipart uploads with parts smaller than 5 MiB.
+    MIN_PART_SIZE: int = 5 << 20
+
     def __init__(
         self,
         *,
         s3_client: S3Client,
         bucket: str,
         dirprefix: Optional[str] = None,
+        part_size: int = 8 << 20,
+        list_page_size: int = 1000,
+        list_buffer_keys: int = 64000,
+        parallel_list: bool = False,
     ) -> None:
+        """
+        Blobs larger than 'part_size' are uploaded with a multipart upload,
+        in parts of 'part_size' bytes.
+
+        Listings request pages of 'list_page_size' keys. When
+        'parallel_list' is true, enumerate_blobs lists the 16 ranges of
+        sha224 refs split on their first hex digit concurrently. Ranges list
+        ahead of the consumer, keeping up to 'list_buffer_keys' keys in
+        memory across all ranges.
+        """
+        if part_size < self.MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {self.MIN_PART_SIZE}")
+
         self.client: S3Client = s3_client
         self.bucket: str = bucket
         self.dirprefix: str = dirprefix.strip("/") + "/" if dirprefix else ""
+        self.part_size: int = part_size
+        self.list_page_size: int = list_page_size
+        self.list_buffer_keys: int = list_buffer_keys
+        self.parallel_list: bool = parallel_list
 
     def enumerate_blobs(self, after: Optional[Ref] = None) -> Iterator[Ref]:
-        while True:
-            after_str: str = self.dirprefix + after.to_str() if after else ""
+        """
+        Each range of the keyspace is listed in a background thread, which
+        keeps fetching pages into its share of the 'list_buffer_keys'
+        buffer while earlier ranges are being consumed. Ranges are disjoint
+        and ordered, so yielding them one after the other keeps the
+        enumeration sorted.
+        """
+        ranges: List[Tuple[str, Optional[str]]] = self._get_list_ranges(
+            self.dirprefix + after.to_str() if after else ""
+        )
+        buffered_pages: int = max(
+            1, self.list_buffer_keys // (len(ranges) * self.list_page_size)
+        )
+        stopped = threading.Event()
 
-            resp: S3ListObjectsV2Response = self.client.list_objects_v2(
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            try:
+                pages: List["queue.Queue[_ListedPage]"] = []
+                for start_after, end in ranges:
+                    range_pages: "queue.Queue[_ListedPage]" = queue.Queue(
+                        maxsize=buffered_pages
+                    )
+                    pages.append(range_pages)
+                    executor.submit(
+                        self._list_range,
+                        start_after,
+                        end,
+                        range_pages,
+                        stopped,
+                    )
+
+                for range_pages in pages:
+                    while True:
+                        page: _ListedPage = range_pages.get()
+                        if page is None:
+                            break
+                        if isinstance(page, BaseException):
+                            raise page
+                        yield from page
+            finally:
+                stopped.set()
+
+    def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+        """
+        Requests the blob, returning None if it does not exist. The response
+        body is only read when the contents of the blob are accessed, and
+        streamed by iter_chunks; later accesses request the blob again.
+        """
+        try:
+            resp: S3GetObjectResponse = self.client.get_object(
                 Bucket=self.bucket,
-                Prefix=self.dirprefix,
-                StartAfter=after_str,
+                Key=self._get_key(ref),
             )
+        except ClientError as e:
+            if is_not_found(e):
+                return None
+            raise
+        return self._new_blob(ref, resp["Body"])
 
-            if not resp.get("Contents"):
-                break
+    def fetch_blob_lazy(self, ref: Ref) -> Blob:
+        """
+        Returns the blob without requesting it until its contents are
+        accessed. Accessing the contents of a missing blob raises
+        ClientError.
+        """
+        return self._new_blob(ref, None)
 
-            for s3_object in resp["Contents"]:
-                ref_str: str = s3_object["Key"].split("/")[-1]
-                ref = Ref.from_ref_str(ref_str)
-                yield ref
+    def read_range(self, ref: Ref, offset: int, size: int) -> bytes:
+        """
+        Reads up to 'size' bytes of the blob starting at 'offset', with a
+        single ranged request.
+        """
+        if size <= 0:
+            return b""
+        resp: S3GetObjectResponse = self.client.get_object(
+            Bucket=self.bucket,
+            Key=self._get_key(ref),
+            Range=f"bytes={offset}-{offset + size - 1}",
+        )
+        body: StreamingBody = resp["Body"]
+        try:
+            return body.read()
+        finally:
+            body.close()
 
-            after = ref
+    def stat_blobs(
+        self, refs: Iterable[Ref], *, concurrency: int = 8
+    ) -> Dict[Ref, int]:
+        """
+        Returns the size of the given blobs that exist, using HEAD requests
+        with up to 'concurrency' of them in flight.
+        """
+        unique_refs: List[Ref] = list(dict.fromkeys(refs))
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            sizes: Iterator[Optional[int]] = executor.map(
+                self._get_object_size, unique_refs
+            )
+            return {
+                ref: size
+                for ref, size in zip(unique_refs, sizes)
+                if size is not None
+            }
 
-    def fetch_blob(self, ref: Ref) -> Blob:
-        resp: S3GetObjectResponse = self.client.get_object(
+    def receive_blob(self, blob: Blob) -> None:
+        key: str = self._get_key(blob.get_ref())
+        if self._head_object(key) is not None:
+            return
+
+        chunks: Iterator[bytes] = blob.iter_chunks(chunk_size=self.part_size)
+        first: bytes = next(chunks, b"")
+        second: Optional[bytes] = next(chunks, None)
+
+        if second is None:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=first)
+            return
+
+        self._upload_multipart(key, itertools.chain((first, second), chunks))
+
+    def receive_blobs(
+        self, blobs: Iterable[Blob], *, concurrency: int = 8
+    ) -> None:
+        """
+        Uploads many blobs, with up to 'concurrency' uploads in flight.
+
+        The S3 client is shared between the upload threads. With boto3, its
+        max_pool_connections should be at least 'concurrency'.
+        """
+        in_flight: Deque["Future[None]"] = deque()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                for blob in blobs:
+                    in_flight.append(executor.submit(self.receive_blob, blob))
+                    if len(in_flight) >= concurrency * 2:
+                        in_flight.popleft().result()
+                while in_flight:
+                    in_flight.popleft().result()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    def _get_list_ranges(
+        self, start_after: str
+    ) -> List[Tuple[str, Optional[str]]]:
+        """
+        Returns the (start_after, end) key ranges to list, skipping those
+        that end before 'start_after'.
+        """
+        if not self.parallel_list:
+            return [(start_after, None)]
+
+        prefix: str = self.dirprefix + DigestAlgorithmName.SHA224.value + "-"
+        bounds: List[str] = [prefix + digit for digit in "123456789abcdef"]
+        starts: List[str] = [""] + bounds
+        ends: List[Optional[str]] = [*bounds, None]
+
+        return [
+            (max(start, start_after), end)
+            for start, end in zip(starts, ends)
+            if end is None or end > start_after
+        ]
+
+    def _list_range(
+        self,
+        start_after: str,
+        end: Optional[str],
+        pages: "queue.Queue[_ListedPage]",
+        stopped: threading.Event,
+    ) -> None:
+        """
+        Lists the keys after 'start_after' and before 'end', putting pages
+        of refs in 'pages' followed by None, or the exception that
+        interrupted the listing.
+        """
+        try:
+            continuation_token: Optional[str] = None
+            while not stopped.is_set():
+                resp: S3ListObjectsV2Response = self._list_objects_page(
+                    start_after, continuation_token
+                )
+
+                keys: List[str] = [
+                    s3_object["Key"] for s3_object in resp.get("Contents", [])
+                ]
+                is_last_page: bool = not resp.get("IsTruncated")
+                if end is not None and keys and keys[-1] >= end:
+                    keys = keys[: bisect.bisect_left(keys, end)]
+                    is_last_page = True
+
+                if keys:
+                    refs: List[Ref] = Ref.parse_many(
+                        key[len(self.dirprefix) :] for key in keys
+                    )
+                    if not _put_page(pages, refs, stopped):
+                        return
+
+                if is_last_page:
+                    break
+                continuation_token = resp["NextContinuationToken"]
+        except BaseException as e:
+            _put_page(pages, e, stopped)
+            return
+
+        _put_page(pages, None, stopped)
+
+    def _list_objects_page(
+        self, start_after: str, continuation_token: Optional[str]
+    ) -> S3ListObjectsV2Response:
+        if continuation_token is None:
+            return self.client.list_objects_v2(
+                Bucket=self.bucket,
+                Prefix=self.dirprefix,
+                StartAfter=start_after,
+                MaxKeys=self.list_page_size,
+            )
+        return self.client.list_objects_v2(
             Bucket=self.bucket,
-            Key=self.dirprefix + ref.to_str(),
+            Prefix=self.dirprefix,
+            ContinuationToken=continuation_token,
+            MaxKeys=self.list_page_size,
         )
-        blob: Blob = Blob(
-            ref=ref,
-            readall=lambda: resp["Body"].read(),
+
+    def _get_key(self, ref: Ref) -> str:
+        return self.dirprefix + ref.to_str()
+
+    def _new_blob(self, ref: Ref, body: Optional[StreamingBody]) -> Blob:
+        key: str = self._get_key(ref)
+        pending_bodies: List[StreamingBody] = [body] if body else []
+
+        def open_body() -> StreamingBody:
+            try:
+                return pending_bodies.pop()
+            except IndexError:
+                return self.client.get_object(Bucket=self.bucket, Key=key)[
+                    "Body"
+                ]
+
+        def readall() -> bytes:
+            body: StreamingBody = open_body()
+            try:
+                return body.read()
+            finally:
+                body.close()
+
+        def open_chunks(chunk_size: int) -> Iterator[bytes]:
+            body: StreamingBody = open_body()
+            try:
+                yield from body.iter_chunks(chunk_size)
+            finally:
+                body.close()
+
+        return Blob(ref=ref, readall=readall, open_chunks=open_chunks)
+
+    def _get_object_size(self, ref: Ref) -> Optional[int]:
+        resp: Optional[S3HeadObjectResponse] = self._head_object(
+            self._get_key(ref)
         )
-        return blob
+        return resp["ContentLength"] if resp is not None else None
 
-    def receive_blob(self, blob: Blob) -> None:
-        raise NotImplementedError()
+    def _head_object(self, key: str) -> Optional[S3HeadObjectResponse]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if is_not_found(e):
+                return None
+            raise
+
+    def _upload_multipart(self, key: str, parts: Iterable[bytes]) -> None:
+        upload_id: str = self.client.create_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+        )["UploadId"]
+
+        try:
+            completed: List[S3CompletedPart] = []
+            for part_number, part in enumerate(parts, start=1):
+                resp: S3UploadPartResponse = self.client.upload_part(
+                    Bucket=self.bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=part,
+                )
+                completed.append(
+                    {"ETag": resp["ETag"], "PartNumber": part_number}
+                )
+
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": completed},
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+            )
+            raise
 
     @staticmethod
     def _assert_implements_storage(s3: "S3") -> Storage:
         return s3
+
+    @staticmethod
+    def _assert_implements_sub_fetcher(s3: "S3") -> SubFetcher:
+        return s3
+
+    @staticmethod
+    def _assert_implements_blob_statter(s3: "S3") -> BlobStatter:
+        return s3
+
+
+# A page of listed refs, the end of a range (None), or a listing error
+_ListedPage = Union[List[Ref], BaseException, None]
+
+
+def _put_page(
+    pages: "queue.Queue[_ListedPage]",
+    page: _ListedPage,
+    stopped: threading.Event,
+) -> bool:
+    """
+    Waits for room in 'pages', giving up if the enumeration was stopped.
+    """
+    while not stopped.is_set():
+        try:
+            pages.put(page, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def is_not_found(e: ClientError) -> bool:
+    """Returns whether the error reports a missing object"""
+    code: str = e.response.get("Error", {}).get("Code", "")
+    return code in ("404", "NoSuchKey", "NotFound")
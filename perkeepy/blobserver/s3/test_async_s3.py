@@ -0,0 +1,123 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import List
+from typing import Optional
+
+import asyncio
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blobserver import test_storage
+
+from .async_s3 import AsyncS3
+from .async_s3 import AsyncS3GetObjectResponse
+from .s3 import S3HeadObjectResponse
+from .s3 import S3ListObjectsV2Response
+from .test_s3 import FakeS3Client
+
+
+class FakeAsyncStreamingBody:
+    def __init__(self, data: bytes) -> None:
+        self._data: bytes = data
+
+    async def read(self) -> bytes:
+        return self._data
+
+
+class FakeAsyncS3Client:
+    """Asynchronous version of FakeS3Client"""
+
+    def __init__(self) -> None:
+        self.client: FakeS3Client = FakeS3Client()
+
+    async def list_objects_v2(
+        self,
+        *,
+        Bucket: str,
+        Prefix: Optional[str] = None,
+        StartAfter: str = "",
+        ContinuationToken: str = "",
+        MaxKeys: int = 1000,
+    ) -> S3ListObjectsV2Response:
+        await asyncio.sleep(0)
+        return self.client.list_objects_v2(
+            Bucket=Bucket,
+            Prefix=Prefix,
+            StartAfter=StartAfter,
+            ContinuationToken=ContinuationToken,
+            MaxKeys=MaxKeys,
+        )
+
+    async def get_object(
+        self, *, Bucket: str, Key: str, Range: str = ""
+    ) -> AsyncS3GetObjectResponse:
+        await asyncio.sleep(0)
+        resp = self.client.get_object(Bucket=Bucket, Key=Key, Range=Range)
+        return {"Body": FakeAsyncStreamingBody(resp["Body"].read())}
+
+    async def head_object(
+        self, *, Bucket: str, Key: str
+    ) -> S3HeadObjectResponse:
+        await asyncio.sleep(0)
+        return self.client.head_object(Bucket=Bucket, Key=Key)
+
+    async def put_object(self, *, Bucket: str, Key: str, Body: bytes) -> object:
+        await asyncio.sleep(0)
+        return self.client.put_object(Bucket=Bucket, Key=Key, Body=Body)
+
+
+def test_async_s3() -> None:
+    asyncio.run(
+        test_storage.run_async_storage_test(
+            AsyncS3(
+                s3_client=FakeAsyncS3Client(),
+                bucket="bucket",
+                dirprefix="blobs",
+                list_page_size=3,
+            )
+        )
+    )
+
+
+def test_async_s3_enumerate_blobs_stop_early() -> None:
+    async def run() -> None:
+        client = FakeAsyncS3Client()
+        s3 = AsyncS3(s3_client=client, bucket="bucket", list_page_size=2)
+        for i in range(50):
+            await s3.receive_blob(Blob.from_contents_str(f"blob {i}"))
+
+        client.client.calls.clear()
+        refs: List[Ref] = []
+        async for ref in s3.enumerate_blobs():
+            refs.append(ref)
+            if len(refs) == 3:
+                break
+
+        assert client.client.calls.count("list_objects_v2") <= 3
+
+    asyncio.run(run())
+
+
+def test_async_s3_read_range() -> None:
+    async def run() -> None:
+        s3 = AsyncS3(s3_client=FakeAsyncS3Client(), bucket="bucket")
+        blob: Blob = Blob.from_contents_str("Hello, friends.")
+        await s3.receive_blob(blob)
+
+        assert await s3.read_range(blob.get_ref(), 7, 7) == b"friends"
+        assert await s3.read_range(blob.get_ref(), 7, 0) == b""
+
+    asyncio.run(run())
@@ -0,0 +1,425 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+import io
+import threading
+import time
+
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blobserver import test_storage
+from perkeepy.schema import Schema
+
+from .s3 import S3
+from .s3 import S3CompletedMultipartUpload
+from .s3 import S3CreateMultipartUploadResponse
+from .s3 import S3GetObjectResponse
+from .s3 import S3HeadObjectResponse
+from .s3 import S3ListObjectsV2Response
+from .s3 import S3UploadPartResponse
+
+
+class FakeS3Client:
+    """In-process S3Client, keeping a single bucket in memory"""
+
+    def __init__(self) -> None:
+        self.objects: Dict[str, bytes] = {}
+        self.calls: List[str] = []
+        self.fail_upload_part: Optional[int] = None
+        self._uploads: Dict[str, Dict[int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def list_objects_v2(
+        self,
+        *,
+        Bucket: str,
+        Prefix: Optional[str] = None,
+        StartAfter: str = "",
+        ContinuationToken: str = "",
+        MaxKeys: int = 1000,
+    ) -> S3ListObjectsV2Response:
+        self._record("list_objects_v2")
+        # The continuation token is the last key of the previous page
+        after: str = ContinuationToken or StartAfter
+        with self._lock:
+            keys: List[str] = sorted(
+                key
+                for key in self.objects
+                if key.startswith(Prefix or "") and key > after
+            )
+            page: List[str] = keys[:MaxKeys]
+            sizes: List[int] = [len(self.objects[key]) for key in page]
+
+        resp: S3ListObjectsV2Response = {
+            "Contents": [
+                {"Key": key, "Size": size} for key, size in zip(page, sizes)
+            ],
+            "IsTruncated": len(keys) > MaxKeys,
+        }
+        if resp["IsTruncated"]:
+            resp["NextContinuationToken"] = page[-1]
+        return resp
+
+    def get_object(
+        self, *, Bucket: str, Key: str, Range: str = ""
+    ) -> S3GetObjectResponse:
+        self._record("get_object")
+        data: bytes = self._get(Key, "GetObject")
+        if Range:
+            first, last = Range[len("bytes=") :].split("-")
+            data = data[int(first) : int(last) + 1]
+        return {"Body": StreamingBody(io.BytesIO(data), len(data))}
+
+    def head_object(self, *, Bucket: str, Key: str) -> S3HeadObjectResponse:
+        self._record("head_object")
+        return {"ContentLength": len(self._get(Key, "HeadObject"))}
+
+    def put_object(self, *, Bucket: str, Key: str, Body: bytes) -> object:
+        self._record("put_object")
+        with self._lock:
+            self.objects[Key] = Body
+        return {}
+
+    def create_multipart_upload(
+        self, *, Bucket: str, Key: str
+    ) -> S3CreateMultipartUploadResponse:
+        self._record("create_multipart_upload")
+        with self._lock:
+            upload_id: str = f"upload-{len(self._uploads)}"
+            self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        UploadId: str,
+        PartNumber: int,
+        Body: bytes,
+    ) -> S3UploadPartResponse:
+        self._record("upload_part")
+        if PartNumber == self.fail_upload_part:
+            raise ClientError({"Error": {"Code": "500"}}, "UploadPart")
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        UploadId: str,
+        MultipartUpload: S3CompletedMultipartUpload,
+    ) -> object:
+        self._record("complete_multipart_upload")
+        with self._lock:
+            parts: Dict[int, bytes] = self._uploads.pop(UploadId)
+            self.objects[Key] = b"".join(
+                parts[part["PartNumber"]] for part in MultipartUpload["Parts"]
+            )
+        return {}
+
+    def abort_multipart_upload(
+        self, *, Bucket: str, Key: str, UploadId: str
+    ) -> object:
+        self._record("abort_multipart_upload")
+        with self._lock:
+            self._uploads.pop(UploadId)
+        return {}
+
+    def _get(self, key: str, operation_name: str) -> bytes:
+        with self._lock:
+            data: Optional[bytes] = self.objects.get(key)
+        if data is None:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, operation_name)
+        return data
+
+    def _record(self, call: str) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+
+def test_s3() -> None:
+    test_storage.run_storage_test(
+        S3(s3_client=FakeS3Client(), bucket="bucket", list_page_size=3)
+    )
+
+
+def test_s3_receive_blob() -> None:
+    client = FakeS3Client()
+    s3 = S3(s3_client=client, bucket="bucket", dirprefix="blobs")
+
+    blob: Blob = Blob.from_contents_str("Hello, friends.")
+    s3.receive_blob(blob)
+    assert client.objects == {
+        "blobs/" + blob.get_ref().to_str(): b"Hello, friends."
+    }
+
+    # Already present blobs are not uploaded again
+    s3.receive_blob(blob)
+    assert client.calls == ["head_object", "put_object", "head_object"]
+
+    assert list(s3.enumerate_blobs()) == [blob.get_ref()]
+
+
+def test_s3_receive_blob_multipart() -> None:
+    client = FakeS3Client()
+    s3 = S3(s3_client=client, bucket="bucket", part_size=S3.MIN_PART_SIZE)
+
+    data: bytes = bytes(range(256)) * (S3.MIN_PART_SIZE * 2 // 256 + 1)
+    blob: Blob = Blob.from_contents_bytes(data)
+    s3.receive_blob(blob)
+
+    assert client.objects == {blob.get_ref().to_str(): data}
+    assert client.calls.count("upload_part") == 3
+    assert "put_object" not in client.calls
+
+
+def test_s3_receive_blob_multipart_abort() -> None:
+    client = FakeS3Client()
+    client.fail_upload_part = 2
+    s3 = S3(s3_client=client, bucket="bucket", part_size=S3.MIN_PART_SIZE)
+
+    data: bytes = b"a" * (S3.MIN_PART_SIZE * 2)
+    try:
+        s3.receive_blob(Blob.from_contents_bytes(data))
+    except ClientError:
+        pass
+    else:
+        raise AssertionError("expected receive_blob to fail")
+
+    assert client.objects == {}
+    assert client.calls[-1] == "abort_multipart_upload"
+
+
+def test_s3_receive_blobs() -> None:
+    client = FakeS3Client()
+    s3 = S3(s3_client=client, bucket="bucket")
+
+    blobs: List[Blob] = [Blob.from_contents_str(f"blob {i}") for i in range(50)]
+    s3.receive_blobs(blobs, concurrency=4)
+
+    assert sorted(client.objects) == sorted(
+        blob.get_ref().to_str() for blob in blobs
+    )
+    assert client.calls.count("put_object") == 50
+
+
+def test_s3_enumerate_blobs() -> None:
+    client = FakeS3Client()
+    blobs: List[Blob] = [Blob.from_contents_str(f"blob {i}") for i in range(50)]
+    S3(s3_client=client, bucket="bucket", dirprefix="blobs").receive_blobs(
+        blobs
+    )
+    sorted_refs: List[str] = sorted(blob.get_ref().to_str() for blob in blobs)
+
+    for parallel_list in (False, True):
+        s3 = S3(
+            s3_client=client,
+            bucket="bucket",
+            dirprefix="blobs",
+            list_page_size=7,
+            parallel_list=parallel_list,
+        )
+        assert [ref.to_str() for ref in s3.enumerate_blobs()] == sorted_refs
+        assert [
+            ref.to_str()
+            for ref in s3.enumerate_blobs(
+                after=Ref.from_ref_str(sorted_refs[24])
+            )
+        ] == sorted_refs[25:]
+
+
+def test_s3_enumerate_blobs_stop_early() -> None:
+    client = FakeS3Client()
+    s3 = S3(
+        s3_client=client,
+        bucket="bucket",
+        list_page_size=2,
+        list_buffer_keys=4,
+    )
+    s3.receive_blobs(Blob.from_contents_str(f"blob {i}") for i in range(50))
+
+    client.calls.clear()
+    refs: Iterator[Ref] = s3.enumerate_blobs()
+    next(refs)
+    refs.close()  # type: ignore
+
+    # The background listing stops without going through all pages
+    assert client.calls.count("list_objects_v2") < 25
+
+
+def test_s3_enumerate_blobs_parallel() -> None:
+    class SlowListS3Client(FakeS3Client):
+        def __init__(self) -> None:
+            super().__init__()
+            self.in_flight: int = 0
+            self.max_in_flight: int = 0
+
+        def list_objects_v2(self, **kwargs: Any) -> S3ListObjectsV2Response:
+            with self._lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                time.sleep(0.01)
+                return super().list_objects_v2(**kwargs)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+    client = SlowListS3Client()
+    S3(s3_client=client, bucket="bucket").receive_blobs(
+        Blob.from_contents_str(f"blob {i}") for i in range(160)
+    )
+
+    def list_blobs(parallel_list: bool) -> List[Ref]:
+        client.calls.clear()
+        s3 = S3(
+            s3_client=client,
+            bucket="bucket",
+            list_page_size=2,
+            parallel_list=parallel_list,
+        )
+        return list(s3.enumerate_blobs())
+
+    sequential_refs: List[Ref] = list_blobs(parallel_list=False)
+    parallel_refs: List[Ref] = list_blobs(parallel_list=True)
+    assert len(parallel_refs) == 160
+    assert set(parallel_refs) == set(sequential_refs)
+    list_calls: int = client.calls.count("list_objects_v2")
+
+    # Every range lists all of its pages while the consumer is still on
+    # the first one
+    client.calls.clear()
+    client.max_in_flight = 0
+    s3 = S3(
+        s3_client=client,
+        bucket="bucket",
+        list_page_size=2,
+        parallel_list=True,
+    )
+    refs: Iterator[Ref] = s3.enumerate_blobs()
+    next(refs)
+    deadline: float = time.monotonic() + 5
+    while client.calls.count("list_objects_v2") < list_calls:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert client.max_in_flight > 1
+    assert len(list(refs)) == 159
+
+
+def test_s3_enumerate_blobs_error() -> None:
+    client = FakeS3Client()
+    client.objects["not-a-ref"] = b""
+    s3 = S3(s3_client=client, bucket="bucket", parallel_list=True)
+
+    try:
+        list(s3.enumerate_blobs())
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected enumerate_blobs to fail")
+
+
+def test_s3_fetch_blob() -> None:
+    client = FakeS3Client()
+    s3 = S3(s3_client=client, bucket="bucket")
+    blob: Blob = Blob.from_contents_str("Hello, friends.")
+    s3.receive_blob(blob)
+
+    # The response of fetch_blob is streamed by the first read
+    client.calls.clear()
+    fetched = s3.fetch_blob(blob.get_ref())
+    assert fetched is not None
+    assert b"".join(fetched.iter_chunks(chunk_size=4)) == b"Hello, friends."
+    assert fetched.is_valid()
+    assert client.calls == ["get_object", "get_object"]
+
+    # fetch_blob_lazy only requests the blob when it is read
+    client.calls.clear()
+    lazy: Blob = s3.fetch_blob_lazy(blob.get_ref())
+    assert client.calls == []
+    assert lazy.get_bytes() == b"Hello, friends."
+    assert client.calls == ["get_object"]
+
+    missing: Blob = s3.fetch_blob_lazy(Ref.from_contents_str("missing"))
+    try:
+        missing.get_bytes()
+    except ClientError:
+        pass
+    else:
+        raise AssertionError("expected get_bytes to fail")
+
+
+def test_s3_sniff() -> None:
+    client = FakeS3Client()
+    s3 = S3(s3_client=client, bucket="bucket")
+    schema_blob: Blob = Blob.from_contents_str(
+        '{"camliVersion": 1, "camliType": "permanode",'
+        ' "random": "x", "camliSigner": "sha224-xxx"}'
+    )
+    data_blob: Blob = Blob.from_contents_bytes(b"\x00" * (1 << 16))
+    s3.receive_blobs([schema_blob, data_blob])
+
+    # Sniffing a fetched schema blob does not request it again
+    client.calls.clear()
+    fetched = s3.fetch_blob(schema_blob.get_ref())
+    assert fetched is not None
+    schema: Optional[Schema] = Schema.sniff(fetched)
+    assert schema is not None
+    assert schema.get_blob().get_bytes() == schema_blob.get_bytes()
+    assert client.calls == ["get_object"]
+
+    # Ranged sniffing reads the whole response, a single small one
+    client.calls.clear()
+    assert Schema.sniff_range(s3, schema_blob.get_ref()) is not None
+    assert Schema.sniff_range(s3, data_blob.get_ref()) is None
+    assert client.calls == ["get_object", "get_object"]
+
+
+def test_s3_read_range() -> None:
+    client = FakeS3Client()
+    s3 = S3(s3_client=client, bucket="bucket")
+    blob: Blob = Blob.from_contents_str("Hello, friends.")
+    s3.receive_blob(blob)
+
+    assert s3.read_range(blob.get_ref(), 7, 7) == b"friends"
+    assert s3.read_range(blob.get_ref(), 7, 100) == b"friends."
+    assert s3.read_range(blob.get_ref(), 7, 0) == b""
+
+
+def test_s3_stat_blobs() -> None:
+    client = FakeS3Client()
+    s3 = S3(s3_client=client, bucket="bucket")
+    blobs: List[Blob] = [Blob.from_contents_str("a" * i) for i in range(1, 6)]
+    s3.receive_blobs(blobs)
+
+    client.calls.clear()
+    missing: Ref = Ref.from_contents_str("missing")
+    assert s3.stat_blobs(
+        [blob.get_ref() for blob in blobs] + [missing, blobs[0].get_ref()]
+    ) == {blob.get_ref(): i for i, blob in enumerate(blobs, start=1)}
+    assert client.calls == ["head_object"] * 6
@@ -0,0 +1,110 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import List
+from typing import Optional
+
+import asyncio
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blobserver import AsyncStorage
+from perkeepy.blobserver import Storage
+
+
+def run_storage_test(storage: Storage) -> None:
+    """Suite of tests to validate a Storage implementation"""
+
+    # At first it should be empty
+    assert list(storage.enumerate_blobs(after=None)) == []
+
+    # Fetching a blob that does not exist
+    missing: Ref = Blob.from_contents_str("missing").get_ref()
+    assert storage.fetch_blob(missing) is None
+
+    # Receive some blobs, receiving one of them twice
+    blobs: List[Blob] = [Blob.from_contents_str(f"blob {i}") for i in range(20)]
+    for blob in blobs:
+        storage.receive_blob(blob)
+    storage.receive_blob(blobs[0])
+
+    # Fetch them back
+    for blob in blobs:
+        fetched = storage.fetch_blob(blob.get_ref())
+        assert fetched is not None
+        assert fetched.get_ref() == blob.get_ref()
+        assert fetched.get_bytes() == blob.get_bytes()
+
+    # Enumerate them, sorted
+    sorted_refs: List[str] = sorted(blob.get_ref().to_str() for blob in blobs)
+    assert [
+        ref.to_str() for ref in storage.enumerate_blobs(after=None)
+    ] == sorted_refs
+
+    # Enumerate after a stored ref, and after refs that are not stored
+    after: Ref = Ref.from_ref_str(sorted_refs[4])
+    assert [
+        ref.to_str() for ref in storage.enumerate_blobs(after=after)
+    ] == sorted_refs[5:]
+
+    after = Ref.from_ref_str("sha224-" + "0" * 56)
+    assert [
+        ref.to_str() for ref in storage.enumerate_blobs(after=after)
+    ] == sorted_refs
+
+    after = Ref.from_ref_str("sha224-" + "f" * 56)
+    assert list(storage.enumerate_blobs(after=after)) == []
+
+
+async def run_async_storage_test(storage: AsyncStorage) -> None:
+    """Suite of tests to validate an AsyncStorage implementation"""
+
+    async def enumerate_blobs(after: Optional[Ref]) -> List[str]:
+        return [ref.to_str() async for ref in storage.enumerate_blobs(after)]
+
+    # At first it should be empty
+    assert await enumerate_blobs(after=None) == []
+
+    # Fetching a blob that does not exist
+    missing: Ref = Blob.from_contents_str("missing").get_ref()
+    assert await storage.fetch_blob(missing) is None
+
+    # Receive some blobs concurrently, receiving one of them twice
+    blobs: List[Blob] = [Blob.from_contents_str(f"blob {i}") for i in range(20)]
+    await asyncio.gather(*(storage.receive_blob(blob) for blob in blobs))
+    await storage.receive_blob(blobs[0])
+
+    # Fetch them back concurrently
+    fetched_blobs: List[Optional[Blob]] = await asyncio.gather(
+        *(storage.fetch_blob(blob.get_ref()) for blob in blobs)
+    )
+    for blob, fetched in zip(blobs, fetched_blobs):
+        assert fetched is not None
+        assert fetched.get_ref() == blob.get_ref()
+        assert fetched.get_bytes() == blob.get_bytes()
+
+    # Enumerate them, sorted
+    sorted_refs: List[str] = sorted(blob.get_ref().to_str() for blob in blobs)
+    assert await enumerate_blobs(after=None) == sorted_refs
+
+    # Enumerate after a stored ref, and after refs that are not stored
+    after: Ref = Ref.from_ref_str(sorted_refs[4])
+    assert await enumerate_blobs(after=after) == sorted_refs[5:]
+
+    after = Ref.from_ref_str("sha224-" + "0" * 56)
+    assert await enumerate_blobs(after=after) == sorted_refs
+
+    after = Ref.from_ref_str("sha224-" + "f" * 56)
+    assert await enumerate_blobs(after=after) == []
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Iterable
+from typing import List
 from typing import Optional
 from typing import Protocol
 
@@ -24,3 +26,7 @@ from .blob_meta import BlobMeta
 class Indexer(BlobReceiver, Protocol):
     def get_blob_meta(self, ref: Ref) -> Optional[BlobMeta]:
         ...
+
+    def get_blob_metas(self, refs: Iterable[Ref]) -> List[Optional[BlobMeta]]:
+        """Returns the metadata of each ref, in the same order"""
+        ...
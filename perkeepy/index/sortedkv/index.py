@@ -12,17 +12,66 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import Final
+from typing import Iterable
+from typing import Iterator
+from typing import List
 from typing import Optional
 
+import itertools
+import time
+from collections import deque
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from dataclasses import dataclass
+from dataclasses import field
+
+from perkeepy import jsonsign
 from perkeepy.blob import Blob
+from perkeepy.blob import Fetcher
 from perkeepy.blob import Ref
+from perkeepy.blob import SubFetcher
+from perkeepy.blobserver import BlobStatter
+from perkeepy.blobserver import Storage
+from perkeepy.gpg import GPGKeyInspector
+from perkeepy.gpg import GPGSignatureVerifier
 from perkeepy.index import BlobMeta
 from perkeepy.index import Indexer
+from perkeepy.lru import LRUCache
+from perkeepy.schema import CamliType
+from perkeepy.schema import ClaimSchema
+from perkeepy.schema import Schema
+from perkeepy.sortedkv import BatchMutation
 from perkeepy.sortedkv import SortedKV
 
 from .key_value_builder import HaveValue
 from .key_value_builder import KeyValueBuilder
 
+# Attributes whose values are indexed in "signerattrvalue" rows.
+INDEXED_ATTRIBUTES: Final[frozenset[str]] = frozenset(
+    ["camliRoot", "camliImportRoot", "tag", "title"]
+)
+
+# Rows that get_blob_metas() reads past before jumping to the next ref.
+MAX_SKIPPED_META_ROWS: Final[int] = 16
+
+
+@dataclass
+class ReindexStats:
+    blobs: int = 0
+    total_size: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def get_elapsed_seconds(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def get_blobs_per_second(self) -> float:
+        elapsed: float = self.get_elapsed_seconds()
+        return self.blobs / elapsed if elapsed > 0 else 0.0
+
 
 class SortedKVIndex:
     """
@@ -49,15 +98,44 @@ class SortedKVIndex:
     * Other:
     "meta:<blobref>" -> "<size>|<mimetype>"
     "have:<blobref>" -> "<size>" (used for enumeration, which doesn't need mime type)
+        followed by "|indexed" once the blob is fully indexed
 
     * For GetOwnerClaims(permanode, signer):
     "claim|<permanode-blobref>|<keyid>|<date>|<claim-blobref>" -> "<URL:type>|<URL:attr>|<URL:value>
 
     """
 
-    def __init__(self, sorted_kv: SortedKV) -> None:
+    def __init__(
+        self,
+        sorted_kv: SortedKV,
+        *,
+        fetcher: Optional[Fetcher] = None,
+        gpg_key_inspector: Optional[GPGKeyInspector] = None,
+        gpg_signature_verifier: Optional[GPGSignatureVerifier] = None,
+        blob_meta_cache_size: int = 10000,
+    ) -> None:
+        """
+        Claims are only indexed once their signature has been verified,
+        which requires fetching the signer's public key. Without a fetcher,
+        a key inspector and a signature verifier, claims only get "have:"
+        and "meta:" rows, and are indexed again by later calls to
+        receive_blob() or reindex().
+
+        Decoded "meta:" rows are kept in an LRU cache of
+        'blob_meta_cache_size' entries.
+        """
         self._sorted_kv: SortedKV = sorted_kv
         self._key_value_builder: KeyValueBuilder = KeyValueBuilder()
+        self._fetcher: Optional[Fetcher] = fetcher
+        self._gpg_key_inspector: Optional[GPGKeyInspector] = gpg_key_inspector
+        self._gpg_signature_verifier: Optional[
+            GPGSignatureVerifier
+        ] = gpg_signature_verifier
+        # camliSigner blobref -> GPG key id
+        self._signer_key_ids: dict[str, str] = {}
+        self._blob_meta_cache: LRUCache[str, BlobMeta] = LRUCache(
+            max_size=blob_meta_cache_size
+        )
 
     def receive_blob(self, blob: Blob) -> None:
 
@@ -71,11 +149,382 @@ class SortedKVIndex:
             if have_value.indexed:
                 return
 
-        raise NotImplementedError()
+        batch: BatchMutation = self._sorted_kv.begin_batch()
+        self._populate_mutations(blob, batch, self._fetcher)
+        self._sorted_kv.commit_batch(batch)
+        self._blob_meta_cache.remove(blob.get_ref().to_str())
+
+    def reindex(
+        self,
+        storage: Storage,
+        *,
+        batch_size: int = 10000,
+        executor: Optional[Executor] = None,
+        fetch_ahead: int = 32,
+        progress: Optional[Callable[[ReindexStats], None]] = None,
+    ) -> ReindexStats:
+        """
+        Indexes every blob of the storage, committing rows in batches of
+        'batch_size' mutations. When an executor is provided, up to
+        'fetch_ahead' blobs are fetched concurrently on it.
+
+        'progress' is called with the current stats after each batch.
+        """
+        fetcher: Fetcher = self._fetcher if self._fetcher else storage
+        stats: ReindexStats = ReindexStats()
+        batch: BatchMutation = self._sorted_kv.begin_batch()
+        batch_refs: List[str] = []
+
+        for blob in _fetch_blobs(storage, executor, fetch_ahead):
+            size: int = self._populate_mutations(blob, batch, fetcher)
+            batch_refs.append(blob.get_ref().to_str())
+            stats.blobs += 1
+            stats.total_size += size
+
+            if len(batch) >= batch_size:
+                self._commit_reindex_batch(batch, batch_refs)
+                batch = self._sorted_kv.begin_batch()
+                batch_refs = []
+                if progress:
+                    progress(stats)
+
+        self._commit_reindex_batch(batch, batch_refs)
+        if progress:
+            progress(stats)
+
+        return stats
 
     def get_blob_meta(self, ref: Ref) -> Optional[BlobMeta]:
-        raise NotImplementedError()
+        ref_str: str = ref.to_str()
+        blob_meta: Optional[BlobMeta] = self._blob_meta_cache.get(ref_str)
+        if blob_meta is not None:
+            return blob_meta
+
+        meta_value: Optional[str] = self._sorted_kv.get(
+            self._key_value_builder.get_meta_key(ref)
+        )
+        if meta_value is None:
+            return None
+
+        blob_meta = self._key_value_builder.parse_meta_value(ref, meta_value)
+        self._blob_meta_cache.add(ref_str, blob_meta)
+        return blob_meta
+
+    def get_blob_metas(self, refs: Iterable[Ref]) -> List[Optional[BlobMeta]]:
+        """
+        Returns the metadata of each ref, in the same order.
+
+        Refs missing from the cache are looked up in key order. A find()
+        keeps going while the next ref is close in the keyspace, such as in
+        a page of enumerate_blobs(), and a new find() jumps to the next ref
+        when more than MAX_SKIPPED_META_ROWS rows separate them.
+        """
+        refs = list(refs)
+        blob_metas: List[Optional[BlobMeta]] = [None] * len(refs)
+
+        # meta key -> indexes of the refs that need it
+        missing: dict[str, List[int]] = {}
+        for i, ref in enumerate(refs):
+            blob_meta: Optional[BlobMeta] = self._blob_meta_cache.get(
+                ref.to_str()
+            )
+            if blob_meta is not None:
+                blob_metas[i] = blob_meta
+            else:
+                meta_key: str = self._key_value_builder.get_meta_key(ref)
+                missing.setdefault(meta_key, []).append(i)
+
+        if not missing:
+            return blob_metas
+
+        meta_keys: List[str] = sorted(missing)
+        end: str = meta_keys[-1] + "\x00"
+        pos: int = 0
+        while pos < len(meta_keys):
+            skipped: int = 0
+            for row in self._sorted_kv.find(meta_keys[pos], end):
+                key: str = row.key()
+
+                # Refs before this row are not indexed
+                while pos < len(meta_keys) and meta_keys[pos] < key:
+                    pos += 1
+                if pos == len(meta_keys):
+                    break
+
+                if key != meta_keys[pos]:
+                    skipped += 1
+                    if skipped > MAX_SKIPPED_META_ROWS:
+                        break
+                    continue
+
+                indexes: List[int] = missing[key]
+                ref = refs[indexes[0]]
+                blob_meta = self._key_value_builder.parse_meta_value(
+                    ref, row.value()
+                )
+                self._blob_meta_cache.add(ref.to_str(), blob_meta)
+                for i in indexes:
+                    blob_metas[i] = blob_meta
+
+                pos += 1
+                skipped = 0
+                if pos == len(meta_keys):
+                    break
+            else:
+                # No rows left, the remaining refs are not indexed
+                break
+
+        return blob_metas
+
+    def enumerate_blob_metas(
+        self, storage: Storage, *, page_size: int = 1000
+    ) -> Iterator[BlobMeta]:
+        """
+        Yields the metadata of every blob of the storage, in enumeration
+        order.
+
+        Refs are looked up in the index a page at a time. Only blobs that
+        are not indexed yet are read, and indexed on the way, so that later
+        enumerations only cost a listing of the storage. Use reindex() to
+        index a large storage up front.
+
+        When the storage is a BlobStatter, the sizes of new blobs are taken
+        from stat_blobs(), and when it is a SubFetcher, they are sniffed
+        with ranged reads, so that blobs that are not schemas are never
+        read past their prefix.
+        """
+        refs: Iterator[Ref] = storage.enumerate_blobs(after=None)
+        while True:
+            page: List[Ref] = list(itertools.islice(refs, page_size))
+            if not page:
+                return
+
+            blob_metas: List[Optional[BlobMeta]] = self.get_blob_metas(page)
+            sizes: Optional[Dict[Ref, int]] = None
+            if isinstance(storage, BlobStatter):
+                sizes = storage.stat_blobs(
+                    [ref for ref, meta in zip(page, blob_metas) if meta is None]
+                )
+
+            for ref, blob_meta in zip(page, blob_metas):
+                if blob_meta is None:
+                    size: Optional[int] = None
+                    if sizes is not None:
+                        size = sizes.get(ref)
+                        if size is None:
+                            continue
+                    if not self._index_stored_blob(storage, ref, size):
+                        continue
+                    blob_meta = self.get_blob_meta(ref)
+                if blob_meta is not None:
+                    yield blob_meta
+
+    def _index_stored_blob(
+        self, storage: Storage, ref: Ref, size: Optional[int]
+    ) -> bool:
+        """
+        Indexes a blob of the storage, reading only what is needed when its
+        size is known. Returns whether the blob exists.
+        """
+        schema: Optional[Schema]
+        if size is not None and isinstance(storage, SubFetcher):
+            schema = Schema.sniff_range(storage, ref)
+        else:
+            blob: Optional[Blob] = storage.fetch_blob(ref)
+            if blob is None:
+                return False
+            if size is None:
+                size = len(blob.get_bytes())
+            schema = Schema.sniff(blob)
+
+        batch: BatchMutation = self._sorted_kv.begin_batch()
+        self._populate_blob_mutations(ref, size, schema, batch, self._fetcher)
+        self._sorted_kv.commit_batch(batch)
+        self._blob_meta_cache.remove(ref.to_str())
+        return True
+
+    def _commit_reindex_batch(
+        self, batch: BatchMutation, refs: List[str]
+    ) -> None:
+        self._sorted_kv.commit_batch(batch)
+        for ref_str in refs:
+            self._blob_meta_cache.remove(ref_str)
+
+    def _populate_mutations(
+        self, blob: Blob, batch: BatchMutation, fetcher: Optional[Fetcher]
+    ) -> int:
+        """Returns the size of the blob"""
+        size: int = len(blob.get_bytes())
+        self._populate_blob_mutations(
+            blob.get_ref(), size, Schema.sniff(blob), batch, fetcher
+        )
+        return size
+
+    def _populate_blob_mutations(
+        self,
+        ref: Ref,
+        size: int,
+        schema: Optional[Schema],
+        batch: BatchMutation,
+        fetcher: Optional[Fetcher],
+    ) -> None:
+        """Populates the rows of a blob, given its size and its schema"""
+        indexed: bool = True
+        if schema is not None and schema.get_type() == CamliType.CLAIM:
+            indexed = self._populate_claim_mutations(
+                schema.get_blob(), schema.as_claim(), batch, fetcher
+            )
+
+        batch.set(
+            self._key_value_builder.get_meta_key(ref),
+            self._key_value_builder.get_meta_value(
+                size, schema.get_type() if schema else None
+            ),
+        )
+
+        # The have row goes last. Unless it marks the blob as fully
+        # indexed, receive_blob() indexes the blob again.
+        batch.set(
+            self._key_value_builder.get_have_key(ref),
+            self._key_value_builder.get_have_value(size, indexed=indexed),
+        )
+
+    def _populate_claim_mutations(
+        self,
+        blob: Blob,
+        claim: ClaimSchema,
+        batch: BatchMutation,
+        fetcher: Optional[Fetcher],
+    ) -> bool:
+        """
+        Returns whether the claim was processed. It is not when the
+        signature could not be checked, e.g. because the signer's public key
+        has not been received yet or the index has no GPG helpers, so that
+        the claim gets indexed again later. Claims whose signature does not
+        verify are processed, without claim rows.
+        """
+        if (
+            fetcher is None
+            or self._gpg_key_inspector is None
+            or self._gpg_signature_verifier is None
+        ):
+            return False
+
+        signer: str = claim.get_signer()
+        try:
+            verified: bool = jsonsign.verify_json_signature(
+                signed_json_object=blob.get_bytes(),
+                fetcher=fetcher,
+                gpg_signature_verifier=self._gpg_signature_verifier,
+            )
+            key_id: str = self._get_signer_key_id(
+                signer, fetcher, self._gpg_key_inspector
+            )
+        except Exception:
+            return False
+        if not verified:
+            return True
+
+        kvb: KeyValueBuilder = self._key_value_builder
+        ref: Ref = blob.get_ref()
+        permanode: str = claim.get_permanode()
+        claim_date: str = claim.get_claim_date()
+        claim_type: str = claim.get_claim_type()
+        attribute: str = claim.get_attribute()
+        value: str = claim.get_value()
+
+        batch.set(kvb.get_signer_key_id_key(signer), key_id)
+        batch.set(
+            kvb.get_recent_permanode_key(key_id, claim_date, ref), permanode
+        )
+        batch.set(
+            kvb.get_claim_key(permanode, key_id, claim_date, ref),
+            kvb.get_claim_value(claim_type, attribute, value),
+        )
+        if (
+            claim_type in ("add-attribute", "set-attribute")
+            and attribute in INDEXED_ATTRIBUTES
+        ):
+            batch.set(
+                kvb.get_signer_attr_value_key(
+                    key_id, attribute, value, claim_date, ref
+                ),
+                permanode,
+            )
+        return True
+
+    def _get_signer_key_id(
+        self,
+        signer: str,
+        fetcher: Fetcher,
+        gpg_key_inspector: GPGKeyInspector,
+    ) -> str:
+        key_id: Optional[str] = self._signer_key_ids.get(signer)
+        if key_id is None:
+            key_id = self._sorted_kv.get(
+                self._key_value_builder.get_signer_key_id_key(signer)
+            )
+        if key_id is None:
+            public_key_blob: Optional[Blob] = fetcher.fetch_blob(
+                Ref.from_ref_str(signer)
+            )
+            if not public_key_blob:
+                raise Exception(f"Could not fetch public key for {signer}")
+            fingerprint: str = gpg_key_inspector.get_key_fingerprint(
+                armored_key=public_key_blob.get_bytes().decode()
+            )
+            # Some inspectors group the fingerprint's hex digits with spaces.
+            key_id = "".join(fingerprint.split())[-16:].upper()
+
+        self._signer_key_ids[signer] = key_id
+        return key_id
 
     @staticmethod
     def _assert_implements_indexer(index: "SortedKVIndex") -> Indexer:
         return index
+
+
+def _fetch_blobs(
+    storage: Storage, executor: Optional[Executor], fetch_ahead: int
+) -> Iterator[Blob]:
+    """
+    Fetches all blobs of the storage in enumeration order, keeping up to
+    'fetch_ahead' fetches in flight when an executor is provided. Blobs are
+    yielded with their contents already read.
+    """
+    refs: Iterator[Ref] = storage.enumerate_blobs(after=None)
+
+    if executor is None:
+        for ref in refs:
+            blob: Optional[Blob] = _fetch_contents(storage, ref)
+            if blob is not None:
+                yield blob
+        return
+
+    in_flight: Deque["Future[Optional[Blob]]"] = deque()
+    try:
+        for ref in refs:
+            in_flight.append(executor.submit(_fetch_contents, storage, ref))
+            if len(in_flight) >= fetch_ahead:
+                fetched: Optional[Blob] = in_flight.popleft().result()
+                if fetched is not None:
+                    yield fetched
+        while in_flight:
+            fetched = in_flight.popleft().result()
+            if fetched is not None:
+                yield fetched
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def _fetch_contents(fetcher: Fetcher, ref: Ref) -> Optional[Blob]:
+    """
+    Fetches the blob and reads its contents, so that fetching ahead on an
+    executor also downloads them there, and returns a blob holding them.
+    """
+    blob: Optional[Blob] = fetcher.fetch_blob(ref)
+    if blob is None:
+        return None
+    data: bytes = blob.get_bytes()
+    return Blob(ref=ref, readall=lambda: data)
@@ -12,10 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+
+from typing import Final
+from typing import Optional
+
+import urllib.parse
 from dataclasses import dataclass
 
-from perkeepy.blob import Blob
 from perkeepy.blob import Ref
+from perkeepy.index import BlobMeta
+from perkeepy.schema import CamliType
+
+_CAMLI_TYPE_MIME_PREFIX: Final[str] = "application/json; camliType="
+
+# Translates each digit to '9'-<digit>, for reverse time strings.
+_REVERSE_DIGITS: Final[dict[int, Optional[int]]] = str.maketrans(
+    "0123456789", "9876543210"
+)
 
 
 @dataclass
@@ -31,9 +44,85 @@ class KeyValueBuilder:
     def get_have_key(self, ref: Ref) -> str:
         return f"have:{ref.to_str()}"
 
-    def get_have_value(self, blob: Blob) -> str:
-        raise NotImplementedError()
+    def get_have_value(self, size: int, *, indexed: bool = True) -> str:
+        """
+        Blobs that could not be fully indexed yet are stored without the
+        "|indexed" suffix, to be indexed again later.
+        """
+        return f"{size}|indexed" if indexed else f"{size}"
 
     def parse_have_value(self, value: str) -> HaveValue:
         indexed: bool = value.endswith("|indexed")
         return HaveValue(indexed=indexed)
+
+    def get_meta_key(self, ref: Ref) -> str:
+        return f"meta:{ref.to_str()}"
+
+    def get_meta_value(self, size: int, camli_type: Optional[CamliType]) -> str:
+        mime_type: str = ""
+        if camli_type is not None:
+            mime_type = _CAMLI_TYPE_MIME_PREFIX + camli_type.value
+        return f"{size}|{mime_type}"
+
+    def parse_meta_value(self, ref: Ref, value: str) -> BlobMeta:
+        size, _, mime_type = value.partition("|")
+        camli_type: Optional[CamliType] = None
+        if mime_type.startswith(_CAMLI_TYPE_MIME_PREFIX):
+            camli_type = CamliType(mime_type[len(_CAMLI_TYPE_MIME_PREFIX) :])
+        return BlobMeta(ref=ref, size=int(size), schema_type=camli_type)
+
+    def get_signer_key_id_key(self, signer: str) -> str:
+        return f"signerkeyid:{signer}"
+
+    def get_claim_key(
+        self, permanode: str, key_id: str, claim_date: str, claim_ref: Ref
+    ) -> str:
+        return f"claim|{permanode}|{key_id}|{claim_date}|{claim_ref.to_str()}"
+
+    def get_claim_value(
+        self, claim_type: str, attribute: str, value: str
+    ) -> str:
+        return "|".join(
+            urllib.parse.quote_plus(field)
+            for field in (claim_type, attribute, value)
+        )
+
+    def get_recent_permanode_key(
+        self, key_id: str, claim_date: str, claim_ref: Ref
+    ) -> str:
+        return "|".join(
+            (
+                "recpn",
+                key_id,
+                self.reverse_time_string(claim_date),
+                claim_ref.to_str(),
+            )
+        )
+
+    def get_signer_attr_value_key(
+        self,
+        key_id: str,
+        attribute: str,
+        value: str,
+        claim_date: str,
+        claim_ref: Ref,
+    ) -> str:
+        return "|".join(
+            (
+                "signerattrvalue",
+                key_id,
+                urllib.parse.quote_plus(attribute),
+                urllib.parse.quote_plus(value),
+                self.reverse_time_string(claim_date),
+                claim_ref.to_str(),
+            )
+        )
+
+    @staticmethod
+    def reverse_time_string(time_string: str) -> str:
+        """
+        Flips each digit to '9'-<digit> and prepends "rt", so that the most
+        recent times sort first:
+            "2011-11-27T01:23:45Z" = "rt7988-88-72T98:76:54Z"
+        """
+        return "rt" + time_string.translate(_REVERSE_DIGITS)
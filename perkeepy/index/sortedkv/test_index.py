@@ -0,0 +1,531 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from perkeepy import jsonsign
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blobserver.memory import MemoryBlobServer
+from perkeepy.gpg.pgpy import PGPYGPGKeyInspector
+from perkeepy.gpg.pgpy import PGPYGPGSignatureVerifier
+from perkeepy.gpg.pgpy import PGPYGPGSigner
+from perkeepy.index import BlobMeta
+from perkeepy.schema import CamliType
+from perkeepy.schema import Schema
+from perkeepy.sortedkv import KV
+from perkeepy.sortedkv import SortedKV
+from perkeepy.sortedkv.memory import MemorySortedKV
+
+from .index import MAX_SKIPPED_META_ROWS
+from .index import ReindexStats
+from .index import SortedKVIndex
+
+_TESTDATA_DIR: str = os.path.join(
+    os.path.dirname(__file__), "..", "..", "jsonsign", "testdata"
+)
+
+
+@dataclass
+class IndexTestEnv:
+    bs: MemoryBlobServer
+    data: Blob
+    file: Blob
+    claim: Blob
+    public_key: Blob
+    permanode: str
+
+
+@contextmanager
+def get_test_env() -> Iterator[IndexTestEnv]:
+    bs = MemoryBlobServer()
+
+    with open(
+        os.path.join(_TESTDATA_DIR, "key01.pub"), encoding="utf-8"
+    ) as public_key_file:
+        public_key: Blob = Blob.from_contents_str(public_key_file.read())
+    bs.receive_blob(public_key)
+
+    with open(
+        os.path.join(_TESTDATA_DIR, "key01.priv"), encoding="utf-8"
+    ) as private_key_file:
+        private_key: str = private_key_file.read()
+
+    data: Blob = Blob.from_contents_bytes(b"\x00\x01\x02")
+    bs.receive_blob(data)
+
+    file: Blob = Blob.from_contents_str(
+        json.dumps(
+            {
+                "camliVersion": 1,
+                "camliType": "file",
+                "parts": [{"blobRef": data.get_ref().to_str(), "size": 3}],
+            }
+        )
+    )
+    bs.receive_blob(file)
+
+    permanode: str = Blob.from_contents_str("permanode").get_ref().to_str()
+    claim: Blob = Blob.from_contents_bytes(
+        jsonsign.sign_json_str(
+            unsigned_json_str=json.dumps(
+                {
+                    "camliVersion": 1,
+                    "camliSigner": public_key.get_ref().to_str(),
+                    "camliType": "claim",
+                    "claimDate": "2011-11-27T01:23:45Z",
+                    "claimType": "set-attribute",
+                    "permaNode": permanode,
+                    "attribute": "title",
+                    "value": "Hello friends",
+                }
+            ),
+            gpg_signer=PGPYGPGSigner(armored_private_keys=[private_key]),
+            gpg_key_inspector=PGPYGPGKeyInspector(),
+            fetcher=bs,
+        )
+    )
+    bs.receive_blob(claim)
+
+    yield IndexTestEnv(
+        bs=bs,
+        data=data,
+        file=file,
+        claim=claim,
+        public_key=public_key,
+        permanode=permanode,
+    )
+
+
+def new_index(kv: SortedKV, bs: MemoryBlobServer) -> SortedKVIndex:
+    return SortedKVIndex(
+        kv,
+        fetcher=bs,
+        gpg_key_inspector=PGPYGPGKeyInspector(),
+        gpg_signature_verifier=PGPYGPGSignatureVerifier(),
+    )
+
+
+def get_rows(kv: SortedKV) -> List[Tuple[str, str]]:
+    return [(row.key(), row.value()) for row in kv.find("", None)]
+
+
+def test_receive_blob() -> None:
+    with get_test_env() as env:
+        kv = MemorySortedKV()
+        index: SortedKVIndex = new_index(kv, env.bs)
+
+        index.receive_blob(env.data)
+        assert get_rows(kv) == [
+            (f"have:{env.data.get_ref().to_str()}", "3|indexed"),
+            (f"meta:{env.data.get_ref().to_str()}", "3|"),
+        ]
+
+        index.receive_blob(env.file)
+        file_size: int = len(env.file.get_bytes())
+        assert (
+            kv.get(f"meta:{env.file.get_ref().to_str()}")
+            == f"{file_size}|application/json; camliType=file"
+        )
+
+        claim_ref: str = env.claim.get_ref().to_str()
+        key_id: str = "2931A67C26F5ABDA"
+        index.receive_blob(env.claim)
+        assert (
+            kv.get(f"signerkeyid:{env.public_key.get_ref().to_str()}") == key_id
+        )
+        assert (
+            kv.get(f"recpn|{key_id}|rt7988-88-72T98:76:54Z|{claim_ref}")
+            == env.permanode
+        )
+        assert (
+            kv.get(
+                f"claim|{env.permanode}|{key_id}|2011-11-27T01:23:45Z|{claim_ref}"
+            )
+            == "set-attribute|title|Hello+friends"
+        )
+        assert (
+            kv.get(
+                f"signerattrvalue|{key_id}|title|Hello+friends|"
+                f"rt7988-88-72T98:76:54Z|{claim_ref}"
+            )
+            == env.permanode
+        )
+
+        # Receiving an indexed blob again is a no-op.
+        rows: List[Tuple[str, str]] = get_rows(kv)
+        index.receive_blob(env.claim)
+        assert get_rows(kv) == rows
+
+
+def test_receive_claim_without_verifier() -> None:
+    with get_test_env() as env:
+        kv = MemorySortedKV()
+        SortedKVIndex(kv).receive_blob(env.claim)
+        assert [key for key, _ in get_rows(kv)] == [
+            f"have:{env.claim.get_ref().to_str()}",
+            f"meta:{env.claim.get_ref().to_str()}",
+        ]
+        # Not marked as indexed, so that it is indexed again later
+        assert kv.get(f"have:{env.claim.get_ref().to_str()}") == str(
+            len(env.claim.get_bytes())
+        )
+
+
+def test_receive_claim_before_public_key() -> None:
+    with get_test_env() as env:
+        bs = MemoryBlobServer()
+        kv = MemorySortedKV()
+        index: SortedKVIndex = new_index(kv, bs)
+        claim_ref: str = env.claim.get_ref().to_str()
+
+        index.receive_blob(env.claim)
+        assert kv.get(f"have:{claim_ref}") == str(len(env.claim.get_bytes()))
+        assert not [key for key, _ in get_rows(kv) if key.startswith("claim|")]
+
+        bs.receive_blob(env.public_key)
+        index.receive_blob(env.public_key)
+        index.receive_blob(env.claim)
+
+        claim_size: int = len(env.claim.get_bytes())
+        assert kv.get(f"have:{claim_ref}") == f"{claim_size}|indexed"
+        assert kv.get(f"signerkeyid:{env.public_key.get_ref().to_str()}")
+        assert [
+            key.split("|")[0]
+            for key, _ in get_rows(kv)
+            if key.split("|")[-1] == claim_ref
+        ] == ["claim", "recpn", "signerattrvalue"]
+
+
+def test_receive_claim_invalid_signature() -> None:
+    class RejectingVerifier:
+        def verify_signature(
+            self,
+            *,
+            data: bytes,
+            armored_detached_signature: str,
+            armored_public_key: str,
+        ) -> bool:
+            return False
+
+    with get_test_env() as env:
+        kv = MemorySortedKV()
+        SortedKVIndex(
+            kv,
+            fetcher=env.bs,
+            gpg_key_inspector=PGPYGPGKeyInspector(),
+            gpg_signature_verifier=RejectingVerifier(),
+        ).receive_blob(env.claim)
+
+        # Processed, without claim rows
+        claim_size: int = len(env.claim.get_bytes())
+        assert get_rows(kv) == [
+            (f"have:{env.claim.get_ref().to_str()}", f"{claim_size}|indexed"),
+            (
+                f"meta:{env.claim.get_ref().to_str()}",
+                f"{claim_size}|application/json; camliType=claim",
+            ),
+        ]
+
+
+def test_reindex() -> None:
+    with get_test_env() as env:
+        expected_kv = MemorySortedKV()
+        expected_index: SortedKVIndex = new_index(expected_kv, env.bs)
+        for ref in env.bs.enumerate_blobs():
+            blob = env.bs.fetch_blob(ref)
+            assert blob is not None
+            expected_index.receive_blob(blob)
+
+        progress: List[int] = []
+        kv = MemorySortedKV()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            stats: ReindexStats = new_index(kv, env.bs).reindex(
+                env.bs,
+                batch_size=3,
+                executor=executor,
+                fetch_ahead=2,
+                progress=lambda stats: progress.append(stats.blobs),
+            )
+
+        assert stats.blobs == 4
+        assert stats.get_blobs_per_second() > 0
+        assert progress[-1] == 4
+        assert len(progress) > 1
+        assert get_rows(kv) == get_rows(expected_kv)
+
+
+def test_reindex_reads_contents_on_executor() -> None:
+    reads: List[str] = []
+
+    class LazyBlobServer(MemoryBlobServer):
+        def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+            blob: Optional[Blob] = super().fetch_blob(ref)
+            if blob is None:
+                return None
+            data: bytes = blob.get_bytes()
+
+            def readall() -> bytes:
+                reads.append(threading.current_thread().name)
+                return data
+
+            return Blob(ref=ref, readall=readall)
+
+    with get_test_env() as env:
+        bs = LazyBlobServer()
+        for ref in env.bs.enumerate_blobs():
+            blob = env.bs.fetch_blob(ref)
+            assert blob is not None
+            bs.receive_blob(blob)
+
+        with ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="fetch"
+        ) as executor:
+            SortedKVIndex(MemorySortedKV()).reindex(
+                bs, executor=executor, fetch_ahead=2
+            )
+
+        # Each blob is read once, by the thread that fetched it
+        assert len(reads) == 4
+        assert all(name.startswith("fetch") for name in reads)
+
+
+def test_receive_blob_reads_contents_once() -> None:
+    reads: List[Ref] = []
+
+    class UncachedBlob(Blob):
+        # Like MmapBlob, streams chunks and returns a new copy of the
+        # contents on each access
+        def get_bytes(self) -> bytes:
+            reads.append(self.get_ref())
+            return self._readall()
+
+    data: bytes = b"\x00" * (1 << 20)
+    blob = UncachedBlob(
+        ref=Ref.from_contents_bytes(data),
+        readall=lambda: data,
+        open_chunks=lambda chunk_size: iter([data[:chunk_size]]),
+    )
+    kv = MemorySortedKV()
+    SortedKVIndex(kv).receive_blob(blob)
+
+    assert reads == [blob.get_ref()]
+    assert kv.get(f"have:{blob.get_ref().to_str()}") == f"{len(data)}|indexed"
+
+
+def test_get_blob_meta() -> None:
+    with get_test_env() as env:
+        kv = MemorySortedKV()
+        index: SortedKVIndex = new_index(kv, env.bs)
+        assert index.get_blob_meta(env.data.get_ref()) is None
+
+        index.receive_blob(env.data)
+        index.receive_blob(env.file)
+
+        data_meta: Optional[BlobMeta] = index.get_blob_meta(env.data.get_ref())
+        assert data_meta is not None
+        assert data_meta.get_ref() == env.data.get_ref()
+        assert data_meta.get_size() == 3
+        assert data_meta.get_schema_type() is None
+
+        file_meta: Optional[BlobMeta] = index.get_blob_meta(env.file.get_ref())
+        assert file_meta is not None
+        assert file_meta.get_size() == len(env.file.get_bytes())
+        assert file_meta.get_schema_type() == CamliType.FILE
+
+
+def test_get_blob_meta_invalidation() -> None:
+    with get_test_env() as env:
+        kv = MemorySortedKV()
+        index: SortedKVIndex = new_index(kv, env.bs)
+
+        # A stale row, left by an interrupted indexing.
+        kv.set(f"meta:{env.file.get_ref().to_str()}", "1|")
+        stale_meta: Optional[BlobMeta] = index.get_blob_meta(env.file.get_ref())
+        assert stale_meta is not None
+        assert stale_meta.get_size() == 1
+
+        index.receive_blob(env.file)
+        file_meta: Optional[BlobMeta] = index.get_blob_meta(env.file.get_ref())
+        assert file_meta is not None
+        assert file_meta.get_size() == len(env.file.get_bytes())
+        assert file_meta.get_schema_type() == CamliType.FILE
+
+
+def test_get_blob_metas() -> None:
+    with get_test_env() as env:
+        kv = MemorySortedKV()
+        index: SortedKVIndex = new_index(kv, env.bs)
+        index.reindex(env.bs)
+
+        # Populate the cache for one of them
+        assert index.get_blob_meta(env.file.get_ref()) is not None
+
+        missing: Ref = Blob.from_contents_str("missing").get_ref()
+        refs: List[Ref] = [
+            env.claim.get_ref(),
+            missing,
+            env.file.get_ref(),
+            env.data.get_ref(),
+            env.claim.get_ref(),
+        ]
+        blob_metas: List[Optional[BlobMeta]] = index.get_blob_metas(refs)
+        assert [
+            (meta.get_ref(), meta.get_size()) if meta else None
+            for meta in blob_metas
+        ] == [
+            (env.claim.get_ref(), len(env.claim.get_bytes())),
+            None,
+            (env.file.get_ref(), len(env.file.get_bytes())),
+            (env.data.get_ref(), 3),
+            (env.claim.get_ref(), len(env.claim.get_bytes())),
+        ]
+        assert index.get_blob_metas([]) == []
+
+
+def test_get_blob_metas_seeks() -> None:
+    class CountingSortedKV(MemorySortedKV):
+        def __init__(self) -> None:
+            super().__init__()
+            self.finds: int = 0
+            self.rows: int = 0
+
+        def find(self, start: str, end: Optional[str]) -> Iterator[KV]:
+            self.finds += 1
+            for row in super().find(start, end):
+                self.rows += 1
+                yield row
+
+    kv = CountingSortedKV()
+    refs: List[Ref] = sorted(
+        Blob.from_contents_str(str(i)).get_ref() for i in range(1000)
+    )
+    for ref in refs:
+        kv.set(f"meta:{ref.to_str()}", "1|")
+
+    # Refs spread over the index do not scan the rows between them
+    sparse: List[Ref] = [refs[900], refs[0], refs[500]]
+    blob_metas = SortedKVIndex(kv).get_blob_metas(sparse)
+    assert [meta.get_ref() if meta else None for meta in blob_metas] == sparse
+    assert kv.finds == 3
+    assert kv.rows <= 3 * (MAX_SKIPPED_META_ROWS + 1)
+
+    # Refs next to each other are read with a single find()
+    kv.finds = kv.rows = 0
+    missing: Ref = Blob.from_contents_str("missing").get_ref()
+    blob_metas = SortedKVIndex(kv).get_blob_metas(refs[100:150] + [missing])
+    assert [meta.get_ref() for meta in blob_metas[:-1] if meta] == (
+        refs[100:150]
+    )
+    assert blob_metas[-1] is None
+    assert kv.finds <= 2
+    assert kv.rows <= 50 + MAX_SKIPPED_META_ROWS + 1
+
+
+def test_enumerate_blob_metas() -> None:
+    fetched: List[Ref] = []
+
+    class RecordingBlobServer(MemoryBlobServer):
+        def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+            fetched.append(ref)
+            return super().fetch_blob(ref)
+
+    with get_test_env() as env:
+        bs = RecordingBlobServer()
+        for ref in env.bs.enumerate_blobs():
+            blob = env.bs.fetch_blob(ref)
+            assert blob is not None
+            bs.receive_blob(blob)
+
+        index = SortedKVIndex(MemorySortedKV())
+        expected: List[Tuple[Ref, Optional[CamliType]]] = sorted(
+            [
+                (env.public_key.get_ref(), None),
+                (env.data.get_ref(), None),
+                (env.file.get_ref(), CamliType.FILE),
+                (env.claim.get_ref(), CamliType.CLAIM),
+            ],
+            key=lambda ref_type: ref_type[0],
+        )
+
+        # Blobs are fetched and indexed the first time they are enumerated
+        for _ in range(2):
+            assert [
+                (meta.get_ref(), meta.get_schema_type())
+                for meta in index.enumerate_blob_metas(bs, page_size=3)
+            ] == expected
+        assert sorted(fetched) == sorted(ref for ref, _ in expected)
+
+        # Afterwards, only new blobs are fetched
+        fetched.clear()
+        new_blob: Blob = Blob.from_contents_str("new")
+        bs.receive_blob(new_blob)
+        assert len(list(index.enumerate_blob_metas(bs))) == 5
+        assert fetched == [new_blob.get_ref()]
+
+
+def test_enumerate_blob_metas_reads_prefixes() -> None:
+    reads: List[Tuple[Ref, int, int]] = []
+
+    class RangeBlobServer(MemoryBlobServer):
+        def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+            raise AssertionError("blobs must not be fetched whole")
+
+        def stat_blobs(self, refs: Iterable[Ref]) -> Dict[Ref, int]:
+            return {
+                ref: len(self.blobs[ref.to_str()].get_bytes())
+                for ref in refs
+                if ref.to_str() in self.blobs
+            }
+
+        def read_range(self, ref: Ref, offset: int, size: int) -> bytes:
+            reads.append((ref, offset, size))
+            data: bytes = self.blobs[ref.to_str()].get_bytes()
+            return data[offset : offset + size]
+
+    with get_test_env() as env:
+        bs = RangeBlobServer()
+        data: Blob = Blob.from_contents_bytes(b"\x00" * (1 << 16))
+        bs.receive_blob(data)
+        bs.receive_blob(env.file)
+
+        index = SortedKVIndex(MemorySortedKV())
+        assert sorted(
+            (meta.get_ref(), meta.get_size(), meta.get_schema_type())
+            for meta in index.enumerate_blob_metas(bs)
+        ) == sorted(
+            [
+                (data.get_ref(), 1 << 16, None),
+                (env.file.get_ref(), len(env.file.get_bytes()), CamliType.FILE),
+            ]
+        )
+
+        # Only the prefix of each blob is read
+        assert sorted(reads) == sorted(
+            (ref, 0, Schema.SNIFF_PREFIX_BYTES)
+            for ref in (data.get_ref(), env.file.get_ref())
+        )
@@ -0,0 +1,91 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Callable
+from typing import Generic
+from typing import Hashable
+from typing import Optional
+from typing import Tuple
+from typing import TypeVar
+
+import threading
+from collections import OrderedDict
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Thread-safe, size-bounded cache evicting the least recently used
+    entries first.
+
+    Each entry counts for 1 towards 'max_size' unless a 'sizeof' function
+    is provided, in which case the cache can be bounded in bytes. Entries
+    larger than 'max_size' are not cached.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        sizeof: Optional[Callable[[V], int]] = None,
+    ) -> None:
+        self._max_size: int = max_size
+        self._sizeof: Optional[Callable[[V], int]] = sizeof
+        self._entries: OrderedDict[K, Tuple[V, int]] = OrderedDict()
+        self._size: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry: Optional[Tuple[V, int]] = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def add(self, key: K, value: V) -> None:
+        size: int = self._sizeof(value) if self._sizeof else 1
+        with self._lock:
+            self._remove(key)
+            if size > self._max_size:
+                return
+
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self._max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def remove(self, key: K) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_size(self) -> int:
+        """Returns the sum of the sizes of the cached entries"""
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: K) -> None:
+        entry: Optional[Tuple[V, int]] = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
@@ -0,0 +1,62 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from .lru import LRUCache
+
+
+def test_lru() -> None:
+    cache: LRUCache[str, int] = LRUCache(max_size=2)
+    assert cache.get("a") is None
+
+    cache.add("a", 1)
+    cache.add("b", 2)
+    assert cache.get("a") == 1
+
+    # "b" is the least recently used entry.
+    cache.add("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+    cache.remove("a")
+    cache.remove("a")
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get_size() == 0
+
+
+def test_lru_sizeof() -> None:
+    cache: LRUCache[str, bytes] = LRUCache(max_size=10, sizeof=len)
+    cache.add("a", b"12345")
+    cache.add("b", b"1234")
+    assert cache.get_size() == 9
+
+    # Evicts "a" to make room
+    cache.add("c", b"12")
+    assert cache.get("a") is None
+    assert cache.get_size() == 6
+
+    # Replacing an entry updates the size
+    cache.add("c", b"123456")
+    assert cache.get_size() == 10
+
+    # Too big to be cached
+    cache.add("d", b"12345678901")
+    assert cache.get("d") is None
+    assert cache.get_size() == 10
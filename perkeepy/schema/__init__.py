@@ -12,8 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from .async_bytes_reader import AsyncBytesReader
 from .bytes_reader import BytesReader
+from .cache import SchemaCache
+from .cache import get_schema_cache
 from .schema import BytesSchema
 from .schema import CamliType
+from .schema import ClaimSchema
 from .schema import FileSchema
 from .schema import Schema
@@ -0,0 +1,216 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import AsyncIterator
+from typing import Optional
+from typing import TypeVar
+
+import asyncio
+import io
+
+from perkeepy.blob import AsyncFetcher
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+
+from .cache import SchemaCache
+from .cache import get_schema_cache
+from .parts import ContainsBytesParts
+from .parts import NestedIndexes
+from .parts import NestedRange
+from .parts import PartsIndex
+from .parts import PrefetchWindow
+from .parts import ReadBuffer
+from .parts import Segment
+from .parts import iter_part_ranges
+from .parts import require_part
+
+_T = TypeVar("_T")
+
+
+class AsyncBytesReader:
+    """
+    Asynchronous version of BytesReader, fetching parts from an
+    AsyncFetcher.
+
+    Up to 'prefetch' upcoming chunks are fetched concurrently, as long as
+    their combined size stays under 'max_prefetch_bytes'. Chunks are still
+    returned in order.
+
+    Nested bytes schemas are looked up in 'schema_cache', the process-wide
+    SchemaCache by default, before being fetched.
+    """
+
+    def __init__(
+        self,
+        blob: ContainsBytesParts,
+        fetcher: AsyncFetcher,
+        *,
+        prefetch: int = 8,
+        max_prefetch_bytes: int = 64 << 20,
+        schema_cache: Optional[SchemaCache] = None,
+    ) -> None:
+        if prefetch < 1:
+            raise ValueError(f"prefetch must be at least 1, got {prefetch}")
+
+        self._blob: ContainsBytesParts = blob
+        self._fetcher: AsyncFetcher = fetcher
+        self._prefetch: int = prefetch
+        self._max_prefetch_bytes: int = max_prefetch_bytes
+        self._index: Optional[PartsIndex] = None
+        self._nested_indexes: NestedIndexes = NestedIndexes(
+            schema_cache if schema_cache is not None else get_schema_cache()
+        )
+        self._chunks: Optional[AsyncIterator[bytes]] = None
+        self._buffer: ReadBuffer = ReadBuffer()
+
+    def get_size(self) -> int:
+        return self._get_index().get_size()
+
+    def tell(self) -> int:
+        return self._buffer.tell()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if self._buffer.seek(offset, whence, self.get_size):
+            self._chunks = None
+        return self.tell()
+
+    async def read(self, size: Optional[int] = None) -> bytes:
+        """
+        Reads up to 'size' bytes, or everything that is left if 'size' is
+        not provided. Returns an empty bytes object once all parts are read.
+        """
+        if size is None or size < 0:
+            return b"".join([chunk async for chunk in self.iter_chunks()])
+
+        read = bytearray()
+        while len(read) < size:
+            if self._buffer.is_empty():
+                chunk: Optional[bytes] = await _anext(self._get_chunks())
+                if chunk is None:
+                    break
+                self._buffer.fill(chunk)
+            read += self._buffer.take(size - len(read))
+
+        return bytes(read)
+
+    async def read_at(self, offset: int, size: int) -> bytes:
+        """
+        Reads up to 'size' bytes starting at 'offset', without moving the
+        position of the reader.
+        """
+        if offset < 0:
+            raise ValueError(f"negative offset {offset}")
+        return b"".join(
+            [
+                chunk
+                async for chunk in self._iter_range(
+                    self._get_index(), offset, size
+                )
+            ]
+        )
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """Yields the remaining contents, one chunk at a time."""
+        if not self._buffer.is_empty():
+            yield self._buffer.take_all()
+        async for chunk in self._get_chunks():
+            yield self._buffer.advance(chunk)
+
+    def _get_chunks(self) -> AsyncIterator[bytes]:
+        if self._chunks is None:
+            self._chunks = self._iter_range(
+                self._get_index(),
+                self.tell(),
+                max(self.get_size() - self.tell(), 0),
+            )
+        return self._chunks
+
+    def _get_index(self) -> PartsIndex:
+        if self._index is None:
+            self._index = PartsIndex(self._blob.get_parts())
+        return self._index
+
+    async def _get_nested_index(self, bytes_ref_str: str) -> PartsIndex:
+        index: Optional[PartsIndex] = self._nested_indexes.get(bytes_ref_str)
+        if index is None:
+            index = self._nested_indexes.parse(
+                bytes_ref_str, await self._fetch_part(bytes_ref_str)
+            )
+        return index
+
+    async def _iter_range(
+        self, index: PartsIndex, offset: int, size: int
+    ) -> AsyncIterator[bytes]:
+        """
+        Yields the contents of 'index' in [offset, offset + size), keeping
+        up to 'prefetch' segments (and at most 'max_prefetch_bytes') in
+        flight.
+        """
+        segments: AsyncIterator[Segment] = self._iter_segments(
+            index, offset, size
+        )
+        window: PrefetchWindow["asyncio.Task[bytes]"] = PrefetchWindow(
+            self._prefetch, self._max_prefetch_bytes
+        )
+        next_segment: Optional[Segment] = await _anext(segments)
+
+        try:
+            while window or next_segment is not None:
+                while next_segment is not None and window.has_room(
+                    next_segment
+                ):
+                    window.push(
+                        next_segment,
+                        asyncio.create_task(self._read_segment(next_segment)),
+                    )
+                    next_segment = await _anext(segments)
+
+                yield await window.pop()
+        finally:
+            for task in window.clear():
+                task.cancel()
+
+    async def _iter_segments(
+        self, index: PartsIndex, offset: int, size: int
+    ) -> AsyncIterator[Segment]:
+        """
+        Yields the leaf blob ranges making up [offset, offset + size) of
+        'index', descending into nested bytes schemas as needed.
+        """
+        for part_range in iter_part_ranges(index, offset, size):
+            if isinstance(part_range, NestedRange):
+                async for segment in self._iter_segments(
+                    await self._get_nested_index(part_range.bytes_ref_str),
+                    part_range.offset,
+                    part_range.length,
+                ):
+                    yield segment
+            else:
+                yield part_range
+
+    async def _read_segment(self, segment: Segment) -> bytes:
+        blob: Blob = await self._fetch_part(segment.ref_str)
+        return segment.slice(blob.get_bytes())
+
+    async def _fetch_part(self, ref_str: str) -> Blob:
+        return require_part(
+            ref_str, await self._fetcher.fetch_blob(Ref.from_ref_str(ref_str))
+        )
+
+
+async def _anext(iterator: AsyncIterator[_T]) -> Optional[_T]:
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
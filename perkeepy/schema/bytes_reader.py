@@ -12,70 +12,205 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import List
+from typing import Iterator
 from typing import Optional
-from typing import Protocol
+
+import io
+from concurrent.futures import Executor
+from concurrent.futures import Future
 
 from perkeepy.blob import Blob
 from perkeepy.blob import Fetcher
 from perkeepy.blob import Ref
 from perkeepy.typing import Reader
 
-from .schema import BytesPart
-from .schema import BytesSchema
-from .schema import Schema
+from .cache import SchemaCache
+from .cache import get_schema_cache
+from .parts import ContainsBytesParts
+from .parts import NestedIndexes
+from .parts import NestedRange
+from .parts import PartsIndex
+from .parts import PrefetchWindow
+from .parts import ReadBuffer
+from .parts import Segment
+from .parts import iter_part_ranges
+from .parts import require_part
 
 
-class ContainsBytesParts(Protocol):
-    """
-    Could be a File schema or could be a Bytes Schema, we don't care
+class BytesReader:
     """
+    Streams the contents described by the parts of a bytes or file schema.
 
-    def get_parts(self) -> List[BytesPart]:
-        ...
+    Parts are fetched lazily, in order, and only the chunk currently being
+    read is kept in memory. The reader is seekable and read_at() serves
+    random reads by fetching only the blobs overlapping the requested range.
 
+    When an executor is provided, up to 'prefetch' upcoming chunks are
+    fetched concurrently on it, as long as their combined size stays under
+    'max_prefetch_bytes'. Chunks are still returned in order.
+
+    Nested bytes schemas are looked up in 'schema_cache', the process-wide
+    SchemaCache by default, before being fetched.
+    """
 
-class BytesReader:
     def __init__(
         self,
         blob: ContainsBytesParts,
         fetcher: Fetcher,
+        *,
+        executor: Optional[Executor] = None,
+        prefetch: int = 8,
+        max_prefetch_bytes: int = 64 << 20,
+        schema_cache: Optional[SchemaCache] = None,
     ) -> None:
+        if prefetch < 1:
+            raise ValueError(f"prefetch must be at least 1, got {prefetch}")
+
         self._blob: ContainsBytesParts = blob
         self._fetcher: Fetcher = fetcher
+        self._executor: Optional[Executor] = executor
+        self._prefetch: int = prefetch
+        self._max_prefetch_bytes: int = max_prefetch_bytes
+        self._index: Optional[PartsIndex] = None
+        self._nested_indexes: NestedIndexes = NestedIndexes(
+            schema_cache if schema_cache is not None else get_schema_cache()
+        )
+        self._chunks: Optional[Iterator[bytes]] = None
+        self._buffer: ReadBuffer = ReadBuffer()
+
+    def get_size(self) -> int:
+        return self._get_index().get_size()
+
+    def tell(self) -> int:
+        return self._buffer.tell()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if self._buffer.seek(offset, whence, self.get_size):
+            self._chunks = None
+        return self.tell()
 
     def read(self, size: Optional[int] = None) -> bytes:
-        if size is not None:
-            raise Exception("size is not yet supported")
-
-        full_read = bytearray()
-
-        for part in self._blob.get_parts():
-
-            if part.get("bytesRef"):
-                bytes_ref_str: str = part["bytesRef"]
-                bytes_ref_blob: Optional[Blob] = self._fetcher.fetch_blob(
-                    Ref.from_ref_str(bytes_ref_str)
-                )
-                if not bytes_ref_blob:
-                    raise Exception(f"blob not found {bytes_ref_str}")
-
-                full_read += BytesReader(
-                    blob=BytesSchema(schema=Schema.from_blob(bytes_ref_blob)),
-                    fetcher=self._fetcher,
-                ).read()
-
-            elif part.get("blobRef"):
-                blob_ref_str: str = part["blobRef"]
-                blob_ref_blob: Optional[Blob] = self._fetcher.fetch_blob(
-                    Ref.from_ref_str(blob_ref_str)
+        """
+        Reads up to 'size' bytes, or everything that is left if 'size' is
+        not provided. Returns an empty bytes object once all parts are read.
+        """
+        if size is None or size < 0:
+            return b"".join(self.iter_chunks())
+
+        read = bytearray()
+        while len(read) < size:
+            if self._buffer.is_empty():
+                chunk: Optional[bytes] = next(self._get_chunks(), None)
+                if chunk is None:
+                    break
+                self._buffer.fill(chunk)
+            read += self._buffer.take(size - len(read))
+
+        return bytes(read)
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """
+        Reads up to 'size' bytes starting at 'offset', without moving the
+        position of the reader.
+        """
+        if offset < 0:
+            raise ValueError(f"negative offset {offset}")
+        return b"".join(self._iter_range(self._get_index(), offset, size))
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """Yields the remaining contents, one chunk at a time."""
+        if not self._buffer.is_empty():
+            yield self._buffer.take_all()
+        for chunk in self._get_chunks():
+            yield self._buffer.advance(chunk)
+
+    def _get_chunks(self) -> Iterator[bytes]:
+        if self._chunks is None:
+            self._chunks = self._iter_range(
+                self._get_index(),
+                self.tell(),
+                max(self.get_size() - self.tell(), 0),
+            )
+        return self._chunks
+
+    def _get_index(self) -> PartsIndex:
+        if self._index is None:
+            self._index = PartsIndex(self._blob.get_parts())
+        return self._index
+
+    def _get_nested_index(self, bytes_ref_str: str) -> PartsIndex:
+        index: Optional[PartsIndex] = self._nested_indexes.get(bytes_ref_str)
+        if index is None:
+            index = self._nested_indexes.parse(
+                bytes_ref_str, self._fetch_part(bytes_ref_str)
+            )
+        return index
+
+    def _iter_range(
+        self, index: PartsIndex, offset: int, size: int
+    ) -> Iterator[bytes]:
+        """Yields the contents of 'index' in [offset, offset + size)"""
+        segments: Iterator[Segment] = self._iter_segments(index, offset, size)
+
+        if self._executor is None:
+            for segment in segments:
+                yield self._read_segment(segment)
+            return
+
+        yield from self._prefetch_segments(self._executor, segments)
+
+    def _prefetch_segments(
+        self, executor: Executor, segments: Iterator[Segment]
+    ) -> Iterator[bytes]:
+        """
+        Reads segments in order while keeping up to 'prefetch' of them
+        (and at most 'max_prefetch_bytes') in flight on the executor.
+        """
+        window: PrefetchWindow["Future[bytes]"] = PrefetchWindow(
+            self._prefetch, self._max_prefetch_bytes
+        )
+        next_segment: Optional[Segment] = next(segments, None)
+
+        try:
+            while window or next_segment is not None:
+                while next_segment is not None and window.has_room(
+                    next_segment
+                ):
+                    window.push(
+                        next_segment,
+                        executor.submit(self._read_segment, next_segment),
+                    )
+                    next_segment = next(segments, None)
+
+                yield window.pop().result()
+        finally:
+            for future in window.clear():
+                future.cancel()
+
+    def _iter_segments(
+        self, index: PartsIndex, offset: int, size: int
+    ) -> Iterator[Segment]:
+        """
+        Yields the leaf blob ranges making up [offset, offset + size) of
+        'index', descending into nested bytes schemas as needed.
+        """
+        for part_range in iter_part_ranges(index, offset, size):
+            if isinstance(part_range, NestedRange):
+                yield from self._iter_segments(
+                    self._get_nested_index(part_range.bytes_ref_str),
+                    part_range.offset,
+                    part_range.length,
                 )
-                if not blob_ref_blob:
-                    raise Exception(f"blob not found {blob_ref_str}")
+            else:
+                yield part_range
 
-                full_read += blob_ref_blob.get_bytes()
+    def _read_segment(self, segment: Segment) -> bytes:
+        return segment.slice(self._fetch_part(segment.ref_str).get_bytes())
 
-        return bytes(full_read)
+    def _fetch_part(self, ref_str: str) -> Blob:
+        return require_part(
+            ref_str, self._fetcher.fetch_blob(Ref.from_ref_str(ref_str))
+        )
 
     @staticmethod
     def _assert_implements_reader(br: "BytesReader") -> Reader:
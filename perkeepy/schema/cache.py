@@ -0,0 +1,109 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Optional
+
+import json
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.lru import LRUCache
+from perkeepy.sortedkv import SortedKV
+
+from .schema import Schema
+from .schema import SchemaSuperset
+
+
+class SchemaCache:
+    """
+    Cache of parsed schemas by blobref, bounded by the total size of their
+    blobs in 'max_bytes'.
+
+    Schema blobs are immutable and content-addressed, so cached schemas
+    never need to be invalidated, and skip decoding and validation.
+
+    When a SortedKV is provided, parsed schemas are also persisted in it:
+
+    "schema:<blobref>" -> "<schema blob contents>"
+
+    Persisted schemas were validated before being stored, and are only
+    parsed again when loaded.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 << 20,
+        *,
+        sorted_kv: Optional[SortedKV] = None,
+    ) -> None:
+        self._schemas: LRUCache[Ref, Schema] = LRUCache(
+            max_size=max_bytes,
+            sizeof=_get_schema_size,
+        )
+        self._sorted_kv: Optional[SortedKV] = sorted_kv
+
+    def get(self, ref: Ref) -> Optional[Schema]:
+        schema: Optional[Schema] = self._schemas.get(ref)
+        if schema is None and self._sorted_kv is not None:
+            contents: Optional[str] = self._sorted_kv.get(self._get_key(ref))
+            if contents is not None:
+                schema = _load_schema(ref, contents)
+                self._schemas.add(ref, schema)
+        return schema
+
+    def parse(self, blob: Blob) -> Schema:
+        """Returns the schema of the blob, parsing it unless it is cached"""
+        ref: Ref = blob.get_ref()
+        schema: Optional[Schema] = self.get(ref)
+        if schema is not None:
+            return schema
+
+        schema = Schema.from_blob(blob)
+        self._schemas.add(ref, schema)
+        if self._sorted_kv is not None:
+            self._sorted_kv.set(
+                self._get_key(ref), blob.get_bytes().decode("utf-8")
+            )
+        return schema
+
+    def __len__(self) -> int:
+        return len(self._schemas)
+
+    def get_nbytes(self) -> int:
+        """Returns the total size of the cached schema blobs"""
+        return self._schemas.get_size()
+
+    @staticmethod
+    def _get_key(ref: Ref) -> str:
+        return f"schema:{ref.to_str()}"
+
+
+def _get_schema_size(schema: Schema) -> int:
+    return len(schema.get_blob().get_bytes())
+
+
+def _load_schema(ref: Ref, contents: str) -> Schema:
+    data: bytes = contents.encode("utf-8")
+    ss: SchemaSuperset = json.loads(contents)
+    return Schema(blob=Blob(ref=ref, readall=lambda: data), ss=ss)
+
+
+# Shared by readers that are not given a cache
+_SCHEMA_CACHE: SchemaCache = SchemaCache()
+
+
+def get_schema_cache() -> SchemaCache:
+    """Returns the process-wide schema cache"""
+    return _SCHEMA_CACHE
@@ -0,0 +1,27 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Iterator
+
+import pytest
+
+from perkeepy.schema import cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_schema_cache(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """Gives each test its own process-wide schema cache"""
+    monkeypatch.setattr(cache, "_SCHEMA_CACHE", cache.SchemaCache())
+    yield
@@ -12,14 +12,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Any
+from typing import ClassVar
 from typing import Dict
 from typing import Final
 from typing import List
+from typing import Optional
 
 import jsonschema
 
 
 class JsonSchemaValidator:
+    """
+    Validates schema blobs against blob_json_schema.
+
+    Validators are compiled once. Each branch of the top-level "oneOf"
+    matches a single camliType, so blobs with a known camliType are only
+    validated against the matching definition.
+    """
 
     blob_json_schema: Final[Dict] = {
         ##########
@@ -171,20 +181,51 @@ class JsonSchemaValidator:
         },
     }
 
+    # Compiled validators by camliType. None validates against the whole
+    # schema.
+    _validators: ClassVar[Optional[Dict[Optional[str], Any]]] = None
+
     @classmethod
     def validate(cls, data: Dict) -> List[str]:
-        validator = jsonschema.validators.validator_for(
-            schema=cls.blob_json_schema
-        )(cls.blob_json_schema)
+        return [
+            str(validation_error.message)
+            for validation_error in cls._get_validator(data).iter_errors(
+                instance=data
+            )
+        ]
 
-        validation_errors: List[str] = []
-        for validation_error in validator.iter_errors(instance=data):
-            validation_errors.append(str(validation_error.message))
-
-            print(validation_error)
+    @classmethod
+    def is_valid(cls, data: Dict) -> bool:
+        return cls._get_validator(data).is_valid(instance=data)
 
-        return validation_errors
+    @classmethod
+    def _get_validator(cls, data: Dict) -> Any:
+        validators: Dict[Optional[str], Any] = cls._get_validators()
+        camli_type: Any = (
+            data.get("camliType") if isinstance(data, dict) else None
+        )
+        if isinstance(camli_type, str) and camli_type in validators:
+            return validators[camli_type]
+        return validators[None]
 
     @classmethod
-    def is_valid(cls, data: Dict) -> bool:
-        return len(cls.validate(data)) == 0
+    def _get_validators(cls) -> Dict[Optional[str], Any]:
+        if cls._validators is None:
+            schema: Dict = cls.blob_json_schema
+            validator_cls: Any = jsonschema.validators.validator_for(schema)
+            validator_cls.check_schema(schema)
+
+            validators: Dict[Optional[str], Any] = {None: validator_cls(schema)}
+            for one_of in schema["oneOf"]:
+                # The definitions are named after their camliType
+                definition: str = one_of["$ref"].split("/")[-1]
+                validators[definition] = validator_cls(
+                    {
+                        "$id": schema["$id"],
+                        "$schema": schema["$schema"],
+                        "allOf": [one_of],
+                        "definitions": schema["definitions"],
+                    }
+                )
+            cls._validators = validators
+        return cls._validators
@@ -0,0 +1,284 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import Generic
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Protocol
+from typing import Tuple
+from typing import TypeVar
+from typing import Union
+
+import bisect
+import io
+import itertools
+from collections import deque
+from dataclasses import dataclass
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+
+from .cache import SchemaCache
+from .schema import BytesPart
+from .schema import BytesSchema
+from .schema import Schema
+
+_T = TypeVar("_T")
+
+
+class ContainsBytesParts(Protocol):
+    """
+    Could be a File schema or could be a Bytes Schema, we don't care
+    """
+
+    def get_parts(self) -> List[BytesPart]:
+        ...
+
+
+class PartsIndex:
+    """
+    Cumulative offsets of the parts of a bytes or file schema, built from
+    the size of each part.
+    """
+
+    def __init__(self, parts: List[BytesPart]) -> None:
+        self._parts: List[BytesPart] = parts
+        self._starts: List[int] = []
+
+        offset: int = 0
+        for part in parts:
+            self._starts.append(offset)
+            offset += part["size"]
+        self._size: int = offset
+
+    def get_size(self) -> int:
+        return self._size
+
+    def iter_parts_from(self, offset: int) -> Iterator[Tuple[int, BytesPart]]:
+        """
+        Yields (start, part) for every part ending after 'offset', starting
+        with the part that contains it.
+        """
+        first: int = max(bisect.bisect_right(self._starts, offset) - 1, 0)
+        yield from zip(
+            itertools.islice(self._starts, first, None),
+            itertools.islice(self._parts, first, None),
+        )
+
+
+@dataclass
+class Segment:
+    """A range of a blob referenced by a blobRef part"""
+
+    ref_str: str
+    offset: int
+    length: int
+
+    def slice(self, data: bytes) -> bytes:
+        """Returns the range of the blob contents 'data'"""
+        if self.offset == 0 and self.length == len(data):
+            return data
+        return data[self.offset : self.offset + self.length]
+
+
+@dataclass
+class NestedRange:
+    """A range of the contents of a nested bytes schema"""
+
+    bytes_ref_str: str
+    offset: int
+    length: int
+
+
+def iter_part_ranges(
+    index: PartsIndex, offset: int, size: int
+) -> Iterator[Union[Segment, NestedRange]]:
+    """
+    Yields the ranges of the parts of 'index' making up
+    [offset, offset + size). Readers resolve the nested ranges, which
+    requires fetching the nested bytes schemas, and call this again on
+    their index.
+    """
+    end: int = offset + size
+
+    for part_start, part in index.iter_parts_from(offset):
+        if part_start >= end:
+            break
+
+        # Portion of this part that overlaps the requested range.
+        skip: int = max(offset - part_start, 0)
+        length: int = min(part["size"], end - part_start) - skip
+        if length <= 0:
+            continue
+        part_offset: int = part.get("offset", 0) + skip
+
+        if part.get("bytesRef"):
+            yield NestedRange(
+                bytes_ref_str=part["bytesRef"],
+                offset=part_offset,
+                length=length,
+            )
+
+        elif part.get("blobRef"):
+            yield Segment(
+                ref_str=part["blobRef"],
+                offset=part_offset,
+                length=length,
+            )
+
+
+class NestedIndexes:
+    """
+    Indexes of the nested bytes schemas read by a reader, by bytesRef.
+    Schemas are looked up in 'schema_cache' before the reader fetches them.
+    """
+
+    def __init__(self, schema_cache: SchemaCache) -> None:
+        self._schema_cache: SchemaCache = schema_cache
+        self._indexes: Dict[str, PartsIndex] = {}
+
+    def get(self, bytes_ref_str: str) -> Optional[PartsIndex]:
+        index: Optional[PartsIndex] = self._indexes.get(bytes_ref_str)
+        if index is None:
+            schema: Optional[Schema] = self._schema_cache.get(
+                Ref.from_ref_str(bytes_ref_str)
+            )
+            if schema is not None:
+                index = self._add(bytes_ref_str, schema)
+        return index
+
+    def parse(self, bytes_ref_str: str, blob: Blob) -> PartsIndex:
+        """Indexes a fetched bytes schema"""
+        return self._add(bytes_ref_str, self._schema_cache.parse(blob))
+
+    def _add(self, bytes_ref_str: str, schema: Schema) -> PartsIndex:
+        index = PartsIndex(BytesSchema(schema=schema).get_parts())
+        self._indexes[bytes_ref_str] = index
+        return index
+
+
+def require_part(ref_str: str, blob: Optional[Blob]) -> Blob:
+    """Returns the fetched blob of a part, which must exist"""
+    if not blob:
+        raise Exception(f"blob not found {ref_str}")
+    return blob
+
+
+class PrefetchWindow(Generic[_T]):
+    """
+    Segments being read ahead, in order, with a handle on each read (a
+    future or a task). Holds up to 'prefetch' segments and at most
+    'max_bytes' of them, but always accepts a segment when empty, so that a
+    part larger than the budget can still be read.
+    """
+
+    def __init__(self, prefetch: int, max_bytes: int) -> None:
+        self._prefetch: int = prefetch
+        self._max_bytes: int = max_bytes
+        self._in_flight: Deque[Tuple[Segment, _T]] = deque()
+        self._bytes: int = 0
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    def has_room(self, segment: Segment) -> bool:
+        if not self._in_flight:
+            return True
+        return (
+            len(self._in_flight) < self._prefetch
+            and self._bytes + segment.length <= self._max_bytes
+        )
+
+    def push(self, segment: Segment, handle: _T) -> None:
+        self._in_flight.append((segment, handle))
+        self._bytes += segment.length
+
+    def pop(self) -> _T:
+        """Returns the handle of the oldest segment"""
+        segment, handle = self._in_flight.popleft()
+        self._bytes -= segment.length
+        return handle
+
+    def clear(self) -> List[_T]:
+        """Empties the window, returning the handles to cancel"""
+        handles: List[_T] = [handle for _, handle in self._in_flight]
+        self._in_flight.clear()
+        self._bytes = 0
+        return handles
+
+
+class ReadBuffer:
+    """
+    Position of a reader and the unread rest of the last chunk it got.
+    """
+
+    def __init__(self) -> None:
+        self._position: int = 0
+        self._buffer: memoryview = memoryview(b"")
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(
+        self, offset: int, whence: int, get_size: Callable[[], int]
+    ) -> bool:
+        """
+        Moves the position, dropping the buffer. Returns whether the
+        position changed, in which case the reader must restart its chunks.
+        """
+        if whence == io.SEEK_SET:
+            position: int = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = get_size() + offset
+        else:
+            raise ValueError(f"invalid whence {whence}")
+
+        if position < 0:
+            raise ValueError(f"negative seek position {position}")
+
+        if position == self._position:
+            return False
+
+        self._position = position
+        self._buffer = memoryview(b"")
+        return True
+
+    def is_empty(self) -> bool:
+        return not self._buffer
+
+    def fill(self, chunk: bytes) -> None:
+        self._buffer = memoryview(chunk)
+
+    def take(self, size: int) -> memoryview:
+        """Consumes up to 'size' bytes of the buffer"""
+        taken: memoryview = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        self._position += len(taken)
+        return taken
+
+    def take_all(self) -> bytes:
+        """Consumes the whole buffer"""
+        return self.take(len(self._buffer)).tobytes()
+
+    def advance(self, chunk: bytes) -> bytes:
+        """Accounts for a chunk returned without going through the buffer"""
+        self._position += len(chunk)
+        return chunk
@@ -14,6 +14,7 @@
 
 from typing import Dict
 from typing import Final
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Tuple
@@ -25,6 +26,8 @@ import json
 import jsonschema
 
 from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blob import SubFetcher
 
 from .json_schema import JsonSchemaValidator
 
@@ -38,6 +41,7 @@ class CamliType(enum.Enum):
 
 class BytesPart(TypedDict):
     size: int
+    offset: int
     blobRef: str
     bytesRef: str
 
@@ -45,7 +49,13 @@ class BytesPart(TypedDict):
 class SchemaSuperset(TypedDict):
     camliVersion: str
     camliType: str
+    camliSigner: str
     parts: List[BytesPart]
+    claimDate: str
+    claimType: str
+    permaNode: str
+    attribute: str
+    value: str
 
 
 class Schema:
@@ -56,6 +66,9 @@ class Schema:
 
     SCHEMA_MAX_BYTES: Final[int] = 1000000
 
+    # How much of a blob sniff() looks at to rule out schemas
+    SNIFF_PREFIX_BYTES: Final[int] = 4096
+
     def __init__(self, blob: Blob, ss: SchemaSuperset) -> None:
         self._blob = blob
         self._ss = ss
@@ -63,18 +76,27 @@ class Schema:
     def get_type(self) -> CamliType:
         return CamliType(self._ss["camliType"])
 
+    def get_blob(self) -> Blob:
+        return self._blob
+
     @classmethod
     def from_blob(cls, blob: Blob) -> "Schema":
-        if len(blob.get_bytes()) > cls.SCHEMA_MAX_BYTES:
+        return cls._from_bytes(blob, blob.get_bytes())
+
+    @classmethod
+    def _from_bytes(cls, blob: Blob, data: bytes) -> "Schema":
+        if len(data) > cls.SCHEMA_MAX_BYTES:
             raise Exception(
-                f"Schema blobs must be smaller than {cls.SCHEMA_MAX_BYTES} bytes, got {len(blob.get_bytes())}"
+                f"Schema blobs must be smaller than {cls.SCHEMA_MAX_BYTES} bytes, got {len(data)}"
             )
 
-        if not blob.is_utf8():
+        # Decoding validates the encoding, so the contents are only decoded
+        # once. json.loads would accept UTF-16 and UTF-32 given bytes.
+        try:
+            blob_str: str = data.decode("utf-8")
+        except UnicodeDecodeError:
             raise Exception("Schema blobs must be encoded using utf-8")
 
-        blob_str: str = blob.get_bytes().decode("utf-8")
-
         blob_json: SchemaSuperset = json.loads(blob_str)
 
         validation_errors = JsonSchemaValidator.validate(dict(blob_json))
@@ -88,6 +110,76 @@ class Schema:
             ss=blob_json,
         )
 
+    @classmethod
+    def sniff(cls, blob: Blob) -> Optional["Schema"]:
+        """
+        Returns the schema of the blob, or None if it is not a schema.
+
+        Like Perkeep's sniffer, blobs that do not start with "{" or do not
+        mention "camliVersion" in their first bytes are rejected by looking
+        at a prefix of their contents only, without decoding or parsing
+        them. The rest of a schema is read from the same stream, and the
+        returned schema holds the contents in memory.
+        """
+        return cls._sniff_chunks(
+            blob.get_ref(),
+            blob.iter_chunks(chunk_size=cls.SNIFF_PREFIX_BYTES),
+        )
+
+    @classmethod
+    def sniff_range(cls, fetcher: SubFetcher, ref: Ref) -> Optional["Schema"]:
+        """
+        Like sniff(), reading the prefix with one ranged read, and the rest
+        of larger schemas with another. Blobs that are rejected only cost
+        the read of their prefix.
+        """
+
+        def iter_chunks() -> Iterator[bytes]:
+            prefix: bytes = fetcher.read_range(ref, 0, cls.SNIFF_PREFIX_BYTES)
+            yield prefix
+            if len(prefix) == cls.SNIFF_PREFIX_BYTES:
+                yield fetcher.read_range(
+                    ref,
+                    cls.SNIFF_PREFIX_BYTES,
+                    cls.SCHEMA_MAX_BYTES + 1 - cls.SNIFF_PREFIX_BYTES,
+                )
+
+        return cls._sniff_chunks(ref, iter_chunks())
+
+    @classmethod
+    def _sniff_chunks(
+        cls, ref: Ref, chunks: Iterator[bytes]
+    ) -> Optional["Schema"]:
+        """Sniffs the first chunk, then parses the rest as a schema"""
+        prefix: bytes = next(chunks, b"")
+        if not cls._is_likely_schema_prefix(prefix):
+            return None
+
+        read: List[bytes] = [prefix]
+        size: int = len(prefix)
+        for chunk in chunks:
+            size += len(chunk)
+            if size > cls.SCHEMA_MAX_BYTES:
+                return None
+            read.append(chunk)
+
+        data: bytes = read[0] if len(read) == 1 else b"".join(read)
+        try:
+            return cls._from_bytes(Blob(ref=ref, readall=lambda: data), data)
+        except Exception:
+            return None
+
+    @classmethod
+    def is_likely_schema(cls, blob: Blob) -> bool:
+        """Checks the first bytes of the blob for the marks of a schema"""
+        return cls._is_likely_schema_prefix(
+            next(blob.iter_chunks(chunk_size=cls.SNIFF_PREFIX_BYTES), b"")
+        )
+
+    @staticmethod
+    def _is_likely_schema_prefix(prefix: bytes) -> bool:
+        return prefix.lstrip().startswith(b"{") and b'"camliVersion"' in prefix
+
     def get_superset(self) -> SchemaSuperset:
         return self._ss
 
@@ -97,6 +189,9 @@ class Schema:
     def as_file(self) -> "FileSchema":
         return FileSchema(schema=self)
 
+    def as_claim(self) -> "ClaimSchema":
+        return ClaimSchema(schema=self)
+
 
 class BytesSchema:
     def __init__(self, schema: Schema) -> None:
@@ -117,3 +212,32 @@ class FileSchema(BytesSchema):
                 f"Invalid camliype: got {schema.get_type()} and expected {CamliType.FILE.value}"
             )
         self._schema = schema
+
+
+class ClaimSchema:
+    def __init__(self, schema: Schema) -> None:
+        if schema.get_type() != CamliType.CLAIM:
+            raise Exception(
+                f"Invalid camliType: got {schema.get_type()} and expected {CamliType.CLAIM.value}"
+            )
+        self._schema = schema
+
+    def get_signer(self) -> str:
+        return self._schema.get_superset()["camliSigner"]
+
+    def get_claim_date(self) -> str:
+        return self._schema.get_superset()["claimDate"]
+
+    def get_claim_type(self) -> str:
+        return self._schema.get_superset()["claimType"]
+
+    def get_permanode(self) -> str:
+        """Returns the blobref of the permanode modified by this claim"""
+        return self._schema.get_superset()["permaNode"]
+
+    def get_attribute(self) -> str:
+        return self._schema.get_superset()["attribute"]
+
+    def get_value(self) -> str:
+        """del-attribute claims may not have a value"""
+        return self._schema.get_superset().get("value", "")
@@ -0,0 +1,103 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import List
+from typing import Optional
+
+import asyncio
+import io
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blobserver.memory import MemoryBlobServer
+from perkeepy.schema import AsyncBytesReader
+
+from .test_bytes_reader import make_file_schema
+
+
+class AsyncFetcherAdapter:
+    """Fetches from a MemoryBlobServer, recording concurrent fetches"""
+
+    def __init__(self, bs: MemoryBlobServer) -> None:
+        self.bs: MemoryBlobServer = bs
+        self.fetched: List[Ref] = []
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+
+    async def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+        self.fetched.append(ref)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        return self.bs.fetch_blob(ref)
+
+
+def test_async_read() -> None:
+    async def run() -> None:
+        bs = MemoryBlobServer()
+        reader = AsyncBytesReader(
+            blob=make_file_schema(bs), fetcher=AsyncFetcherAdapter(bs)
+        )
+        assert reader.get_size() == 15
+        assert await reader.read(3) == b"Hel"
+        assert await reader.read(6) == b"lo, fr"
+        assert reader.tell() == 9
+        assert await reader.read() == b"iends."
+        assert await reader.read() == b""
+
+        reader.seek(-6, io.SEEK_END)
+        assert [chunk async for chunk in reader.iter_chunks()] == [
+            b"iends",
+            b".",
+        ]
+
+    asyncio.run(run())
+
+
+def test_async_read_at() -> None:
+    async def run() -> None:
+        bs = MemoryBlobServer()
+        fetcher = AsyncFetcherAdapter(bs)
+        reader = AsyncBytesReader(blob=make_file_schema(bs), fetcher=fetcher)
+
+        assert await reader.read_at(7, 7) == b"friends"
+        assert reader.tell() == 0
+        # The nested bytes schema and the "friends" chunk
+        assert len(fetcher.fetched) == 2
+
+    asyncio.run(run())
+
+
+def test_async_prefetch() -> None:
+    async def run() -> None:
+        bs = MemoryBlobServer()
+        fetcher = AsyncFetcherAdapter(bs)
+        reader = AsyncBytesReader(
+            blob=make_file_schema(bs), fetcher=fetcher, prefetch=4
+        )
+        assert await reader.read() == b"Hello, friends."
+        assert fetcher.max_in_flight > 2
+
+        fetcher = AsyncFetcherAdapter(bs)
+        reader = AsyncBytesReader(
+            blob=make_file_schema(bs), fetcher=fetcher, prefetch=1
+        )
+        assert await reader.read() == b"Hello, friends."
+        # The nested bytes schema was cached by the first reader, so a
+        # single chunk is in flight at a time
+        assert fetcher.max_in_flight == 1
+
+    asyncio.run(run())
@@ -0,0 +1,242 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import List
+from typing import Optional
+
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blobserver.memory import MemoryBlobServer
+from perkeepy.schema import BytesReader
+from perkeepy.schema import FileSchema
+from perkeepy.schema import Schema
+from perkeepy.schema.schema import BytesPart
+
+
+def make_file_schema(bs: MemoryBlobServer) -> FileSchema:
+    """
+    Stores a file made of three chunks, the middle one being a nested
+    bytes schema, and returns its file schema.
+    """
+    chunks: List[Blob] = [
+        Blob.from_contents_bytes(data)
+        for data in (b"Hello", b", ", b"friends", b".")
+    ]
+    for chunk in chunks:
+        bs.receive_blob(chunk)
+
+    bytes_blob: Blob = Blob.from_contents_str(
+        json.dumps(
+            {
+                "camliVersion": 1,
+                "camliType": "bytes",
+                "parts": [
+                    {"blobRef": chunks[1].get_ref().to_str(), "size": 2},
+                    {"blobRef": chunks[2].get_ref().to_str(), "size": 7},
+                ],
+            }
+        )
+    )
+    bs.receive_blob(bytes_blob)
+
+    file_blob: Blob = Blob.from_contents_str(
+        json.dumps(
+            {
+                "camliVersion": 1,
+                "camliType": "file",
+                "parts": [
+                    {"blobRef": chunks[0].get_ref().to_str(), "size": 5},
+                    {"bytesRef": bytes_blob.get_ref().to_str(), "size": 9},
+                    {"blobRef": chunks[3].get_ref().to_str(), "size": 1},
+                ],
+            }
+        )
+    )
+    return Schema.from_blob(file_blob).as_file()
+
+
+def test_read_all() -> None:
+    bs = MemoryBlobServer()
+    reader = BytesReader(blob=make_file_schema(bs), fetcher=bs)
+    assert reader.read() == b"Hello, friends."
+    assert reader.read() == b""
+
+
+def test_read_size() -> None:
+    bs = MemoryBlobServer()
+    reader = BytesReader(blob=make_file_schema(bs), fetcher=bs)
+    assert reader.read(3) == b"Hel"
+    assert reader.read(4) == b"lo, "
+    assert reader.read(0) == b""
+    assert reader.read(100) == b"friends."
+    assert reader.read(1) == b""
+
+
+def test_iter_chunks() -> None:
+    bs = MemoryBlobServer()
+    reader = BytesReader(blob=make_file_schema(bs), fetcher=bs)
+    assert reader.read(2) == b"He"
+    assert list(reader.iter_chunks()) == [b"llo", b", ", b"friends", b"."]
+
+
+def test_seek() -> None:
+    bs = MemoryBlobServer()
+    reader = BytesReader(blob=make_file_schema(bs), fetcher=bs)
+    assert reader.get_size() == 15
+
+    assert reader.seek(7) == 7
+    assert reader.read(4) == b"frie"
+    assert reader.tell() == 11
+
+    assert reader.seek(-3, io.SEEK_CUR) == 8
+    assert reader.read() == b"riends."
+    assert reader.tell() == 15
+
+    assert reader.seek(-1, io.SEEK_END) == 14
+    assert reader.read() == b"."
+
+    assert reader.seek(100) == 100
+    assert reader.read() == b""
+
+    with pytest.raises(ValueError):
+        reader.seek(-1)
+
+
+def test_read_at() -> None:
+    bs = MemoryBlobServer()
+    reader = BytesReader(blob=make_file_schema(bs), fetcher=bs)
+    assert reader.read_at(0, 15) == b"Hello, friends."
+    assert reader.read_at(4, 5) == b"o, fr"
+    assert reader.read_at(14, 10) == b"."
+    assert reader.read_at(20, 10) == b""
+    assert reader.tell() == 0
+
+
+def test_read_at_fetches_only_overlapping_blobs() -> None:
+    bs = MemoryBlobServer()
+    file_schema: FileSchema = make_file_schema(bs)
+    fetched: List[str] = []
+
+    class RecordingFetcher:
+        def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+            fetched.append(ref.to_str())
+            return bs.fetch_blob(ref)
+
+    reader = BytesReader(blob=file_schema, fetcher=RecordingFetcher())
+    assert reader.read_at(9, 3) == b"ien"
+    parts: List[BytesPart] = file_schema.get_parts()
+    assert fetched == [
+        parts[1]["bytesRef"],
+        Ref.from_contents_bytes(b"friends").to_str(),
+    ]
+
+
+def test_part_offsets() -> None:
+    bs = MemoryBlobServer()
+    chunk: Blob = Blob.from_contents_bytes(b"0123456789")
+    bs.receive_blob(chunk)
+
+    file_blob: Blob = Blob.from_contents_str(
+        json.dumps(
+            {
+                "camliVersion": 1,
+                "camliType": "file",
+                "parts": [
+                    {
+                        "blobRef": chunk.get_ref().to_str(),
+                        "size": 3,
+                        "offset": 2,
+                    },
+                    {"blobRef": chunk.get_ref().to_str(), "size": 2},
+                ],
+            }
+        )
+    )
+    reader = BytesReader(
+        blob=Schema.from_blob(file_blob).as_file(),
+        fetcher=bs,
+    )
+    assert reader.read() == b"23401"
+    assert reader.read_at(1, 3) == b"340"
+
+
+def test_prefetch() -> None:
+    bs = MemoryBlobServer()
+    file_schema: FileSchema = make_file_schema(bs)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        reader = BytesReader(blob=file_schema, fetcher=bs, executor=executor)
+        assert reader.read(3) == b"Hel"
+        assert reader.read() == b"lo, friends."
+        assert reader.read_at(4, 5) == b"o, fr"
+
+        reader.seek(7)
+        assert list(reader.iter_chunks()) == [b"friends", b"."]
+
+
+def test_prefetch_window() -> None:
+    bs = MemoryBlobServer()
+    chunks: List[Blob] = [
+        Blob.from_contents_bytes(bytes([i]) * 10) for i in range(20)
+    ]
+    for chunk in chunks:
+        bs.receive_blob(chunk)
+    file_blob: Blob = Blob.from_contents_str(
+        json.dumps(
+            {
+                "camliVersion": 1,
+                "camliType": "file",
+                "parts": [
+                    {"blobRef": chunk.get_ref().to_str(), "size": 10}
+                    for chunk in chunks
+                ],
+            }
+        )
+    )
+
+    lock = threading.Lock()
+    in_flight: List[int] = [0]
+    max_in_flight: List[int] = [0]
+
+    class SlowFetcher:
+        def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+            with lock:
+                in_flight[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            time.sleep(0.005)
+            with lock:
+                in_flight[0] -= 1
+            return bs.fetch_blob(ref)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        reader = BytesReader(
+            blob=Schema.from_blob(file_blob).as_file(),
+            fetcher=SlowFetcher(),
+            executor=executor,
+            prefetch=8,
+            max_prefetch_bytes=30,
+        )
+        assert reader.read() == b"".join(c.get_bytes() for c in chunks)
+
+    # At most 3 parts of 10 bytes fit in the 30 bytes budget.
+    assert 1 <= max_in_flight[0] <= 3
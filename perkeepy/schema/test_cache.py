@@ -0,0 +1,125 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import List
+from typing import Optional
+
+import json
+import os
+import tempfile
+
+from perkeepy.blob import Blob
+from perkeepy.blob import Ref
+from perkeepy.blobserver.memory import MemoryBlobServer
+from perkeepy.sortedkv.memory import MemorySortedKV
+from perkeepy.sortedkv.sqlite import SQLiteSortedKV
+
+from .bytes_reader import BytesReader
+from .cache import SchemaCache
+from .cache import get_schema_cache
+from .schema import CamliType
+from .schema import Schema
+from .test_bytes_reader import make_file_schema
+
+
+def make_bytes_blob(i: int) -> Blob:
+    return Blob.from_contents_str(
+        json.dumps(
+            {
+                "camliVersion": 1,
+                "camliType": "bytes",
+                "parts": [{"blobRef": f"sha224-{i}", "size": i}],
+            }
+        )
+    )
+
+
+def test_schema_cache() -> None:
+    blobs: List[Blob] = [make_bytes_blob(i) for i in range(3)]
+    blob_size: int = len(blobs[0].get_bytes())
+    cache = SchemaCache(max_bytes=2 * blob_size)
+
+    schema: Schema = cache.parse(blobs[0])
+    assert schema.get_type() == CamliType.BYTES
+    assert cache.get(blobs[0].get_ref()) is schema
+    assert cache.parse(blobs[0]) is schema
+
+    # The least recently used schema is evicted
+    cache.parse(blobs[1])
+    cache.parse(blobs[2])
+    assert len(cache) == 2
+    assert cache.get_nbytes() == 2 * blob_size
+    assert cache.get(blobs[0].get_ref()) is None
+
+    assert cache.get(Ref.from_contents_str("missing")) is None
+
+    # Schemas larger than the cache are parsed but not kept
+    cache = SchemaCache(max_bytes=blob_size - 1)
+    assert cache.parse(blobs[0]).get_type() == CamliType.BYTES
+    assert len(cache) == 0
+
+
+def test_schema_cache_isolated() -> None:
+    # Each test starts with an empty process-wide cache, see conftest.py
+    assert len(get_schema_cache()) == 0
+    get_schema_cache().parse(make_bytes_blob(1))
+    assert len(get_schema_cache()) == 1
+
+
+def test_schema_cache_persistence() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path: str = os.path.join(tmpdir, "schemas.db")
+        blob: Blob = make_bytes_blob(1)
+
+        sorted_kv = SQLiteSortedKV(path)
+        SchemaCache(sorted_kv=sorted_kv).parse(blob)
+        sorted_kv.close()
+
+        sorted_kv = SQLiteSortedKV(path)
+        schema: Optional[Schema] = SchemaCache(sorted_kv=sorted_kv).get(
+            blob.get_ref()
+        )
+        sorted_kv.close()
+
+        assert schema is not None
+        assert schema.as_bytes().get_parts() == [
+            {"blobRef": "sha224-1", "size": 1}
+        ]
+        assert schema.get_blob().get_bytes() == blob.get_bytes()
+        assert schema.get_blob().is_valid()
+
+
+def test_bytes_reader_schema_cache() -> None:
+    fetched: List[Ref] = []
+
+    class RecordingFetcher:
+        def fetch_blob(self, ref: Ref) -> Optional[Blob]:
+            fetched.append(ref)
+            return bs.fetch_blob(ref)
+
+    bs = MemoryBlobServer()
+    file_schema = make_file_schema(bs)
+    cache = SchemaCache(sorted_kv=MemorySortedKV())
+
+    for _ in range(2):
+        reader = BytesReader(
+            blob=file_schema, fetcher=RecordingFetcher(), schema_cache=cache
+        )
+        assert reader.read() == b"Hello, friends."
+
+    # The nested bytes schema is only fetched by the first reader
+    bytes_ref: Ref = Ref.from_ref_str(file_schema.get_parts()[1]["bytesRef"])
+    assert fetched.count(bytes_ref) == 1
+    assert len(fetched) == 5 + 4
@@ -0,0 +1,88 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import List
+from typing import Union
+
+import io
+
+import pytest
+
+from perkeepy.blobserver.memory import MemoryBlobServer
+from perkeepy.schema.schema import BytesPart
+
+from .parts import NestedRange
+from .parts import PartsIndex
+from .parts import PrefetchWindow
+from .parts import ReadBuffer
+from .parts import Segment
+from .parts import iter_part_ranges
+from .test_bytes_reader import make_file_schema
+
+
+def test_iter_part_ranges() -> None:
+    # "Hello" + nested (", " + "friends") + "."
+    parts: List[BytesPart] = make_file_schema(MemoryBlobServer()).get_parts()
+    ranges: List[Union[Segment, NestedRange]] = list(
+        iter_part_ranges(PartsIndex(parts), 2, 10)
+    )
+    assert ranges == [
+        Segment(ref_str=parts[0]["blobRef"], offset=2, length=3),
+        NestedRange(bytes_ref_str=parts[1]["bytesRef"], offset=0, length=7),
+    ]
+
+
+def test_segment_slice() -> None:
+    data: bytes = b"Hello, friends."
+    assert Segment(ref_str="a", offset=0, length=len(data)).slice(data) is data
+    assert Segment(ref_str="a", offset=7, length=7).slice(data) == b"friends"
+
+
+def test_prefetch_window() -> None:
+    window: PrefetchWindow[str] = PrefetchWindow(prefetch=2, max_bytes=10)
+    big = Segment(ref_str="big", offset=0, length=20)
+
+    # A segment larger than the budget is accepted by an empty window
+    assert window.has_room(big)
+    window.push(big, "big")
+    assert not window.has_room(Segment(ref_str="a", offset=0, length=1))
+    assert window.pop() == "big"
+
+    window.push(Segment(ref_str="a", offset=0, length=4), "a")
+    window.push(Segment(ref_str="b", offset=0, length=4), "b")
+    assert not window.has_room(Segment(ref_str="c", offset=0, length=1))
+    assert window.clear() == ["a", "b"]
+    assert not window
+
+
+def test_read_buffer() -> None:
+    buffer = ReadBuffer()
+    buffer.fill(b"Hello, friends.")
+    assert bytes(buffer.take(5)) == b"Hello"
+    assert buffer.tell() == 5
+    assert buffer.take_all() == b", friends."
+    assert buffer.is_empty()
+    assert buffer.advance(b"!") == b"!"
+    assert buffer.tell() == 16
+
+    buffer.fill(b"rest")
+    assert not buffer.seek(16, io.SEEK_SET, lambda: 20)
+    assert not buffer.is_empty()
+    assert buffer.seek(-2, io.SEEK_END, lambda: 20)
+    assert buffer.tell() == 18
+    assert buffer.is_empty()
+
+    with pytest.raises(ValueError):
+        buffer.seek(-1, io.SEEK_SET, lambda: 20)
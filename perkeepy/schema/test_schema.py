@@ -12,6 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
 import json
 import os
 
@@ -19,6 +25,7 @@ import jsonschema
 import pytest
 
 from perkeepy.blob import Blob
+from perkeepy.blob import Ref
 from perkeepy.schema import Schema
 
 from .json_schema import JsonSchemaValidator
@@ -56,6 +63,37 @@ def test_json_schema() -> None:
             ), f"Expected {blob_filename} to yield {expected_bool}, got {not expected_bool}"
 
 
+def test_json_schema_dispatch(capsys: pytest.CaptureFixture) -> None:
+    """Validating by camliType agrees with the whole schema"""
+
+    test_files_dir = os.path.join(
+        os.path.dirname(__file__),
+        "testdata",
+        "jsonschema",
+    )
+    full_validator = jsonschema.validators.validator_for(
+        schema=JsonSchemaValidator.blob_json_schema
+    )(JsonSchemaValidator.blob_json_schema)
+
+    for blob_filename in os.listdir(test_files_dir):
+        with open(
+            os.path.join(test_files_dir, blob_filename), "r", encoding="utf-8"
+        ) as f:
+            data = json.loads(f.read())
+
+        assert JsonSchemaValidator.is_valid(data) == full_validator.is_valid(
+            data
+        ), blob_filename
+        assert bool(JsonSchemaValidator.validate(data)) != (
+            full_validator.is_valid(data)
+        ), blob_filename
+
+    # Errors are returned, not printed
+    assert JsonSchemaValidator.validate({"camliType": "bytes"})
+    assert JsonSchemaValidator.validate({"camliType": ["bytes"]})
+    assert capsys.readouterr().out == ""
+
+
 def test_schema_from_blob_bytes() -> None:
     schema: Schema = Schema.from_blob(
         Blob.from_contents_str(
@@ -142,3 +180,112 @@ def test_schema_from_blob_raises() -> None:
     )
     with pytest.raises(Exception):
         schema: Schema = Schema.from_blob(blob)
+
+
+def test_schema_from_blob_encoding() -> None:
+    data: str = """{"camliVersion": 1, "camliType": "bytes", "parts": []}"""
+    assert Schema.from_blob(Blob.from_contents_str(data)).get_type() == (
+        CamliType.BYTES
+    )
+
+    for encoded in (data.encode("utf-16"), b"\xdc" + data.encode("utf-8")):
+        with pytest.raises(Exception):
+            Schema.from_blob(Blob.from_contents_bytes(encoded))
+
+
+def test_schema_sniff() -> None:
+    schema_blob: Blob = Blob.from_contents_str(
+        """
+  {"camliVersion": 1,
+   "camliType": "permanode",
+   "random": "615e05c68c8411df81a2001b639d041f",
+   "camliSigner": "hashalg-xxxxxxxxxxx"
+  }
+"""
+    )
+    schema = Schema.sniff(schema_blob)
+    assert schema is not None
+    assert schema.get_type() == CamliType.PERMANODE
+
+    # Rejected by looking at the prefix only
+    for data in (b"\x89PNG\r\n", b'["camliVersion"]', b"{}", b""):
+        blob: Blob = Blob.from_contents_bytes(data)
+        assert not Schema.is_likely_schema(blob)
+        assert Schema.sniff(blob) is None
+
+    # Looks like a schema, but is not valid
+    assert Schema.sniff(Blob.from_contents_str('{"camliVersion": 1')) is None
+    assert (
+        Schema.sniff(Blob.from_contents_str('{"camliVersion": 1, "x": 2}'))
+        is None
+    )
+
+
+def make_large_schema_blob() -> Blob:
+    return Blob.from_contents_str(
+        json.dumps(
+            {
+                "camliVersion": 1,
+                "camliType": "permanode",
+                "random": "x" * (2 * Schema.SNIFF_PREFIX_BYTES),
+                "camliSigner": "sha224-xxx",
+            }
+        )
+    )
+
+
+def test_schema_sniff_reads_once() -> None:
+    schema_blob: Blob = make_large_schema_blob()
+    data: bytes = schema_blob.get_bytes()
+    opened: List[int] = []
+
+    def open_chunks(chunk_size: int) -> Iterator[bytes]:
+        opened.append(chunk_size)
+        for start in range(0, len(data), chunk_size):
+            yield data[start : start + chunk_size]
+
+    def readall() -> bytes:
+        raise AssertionError("the contents must be read from a single stream")
+
+    blob = Blob(
+        ref=schema_blob.get_ref(), readall=readall, open_chunks=open_chunks
+    )
+    schema: Optional[Schema] = Schema.sniff(blob)
+    assert schema is not None
+    assert schema.get_type() == CamliType.PERMANODE
+    assert schema.get_blob().get_bytes() == data
+    assert opened == [Schema.SNIFF_PREFIX_BYTES]
+
+
+def test_schema_sniff_range() -> None:
+    blobs: Dict[Ref, bytes] = {}
+    reads: List[Tuple[int, int]] = []
+
+    class RangeFetcher:
+        def read_range(self, ref: Ref, offset: int, size: int) -> bytes:
+            reads.append((offset, size))
+            return blobs[ref][offset : offset + size]
+
+    large: Blob = make_large_schema_blob()
+    small: Blob = Blob.from_contents_str(
+        '{"camliVersion": 1, "camliType": "permanode",'
+        ' "random": "x", "camliSigner": "sha224-xxx"}'
+    )
+    data: Blob = Blob.from_contents_bytes(b"\x00" * (1 << 16))
+    for blob in (large, small, data):
+        blobs[blob.get_ref()] = blob.get_bytes()
+
+    # Small schemas and rejected blobs take a single read
+    schema: Optional[Schema] = Schema.sniff_range(
+        RangeFetcher(), small.get_ref()
+    )
+    assert schema is not None
+    assert schema.get_blob().get_bytes() == small.get_bytes()
+    assert Schema.sniff_range(RangeFetcher(), data.get_ref()) is None
+    assert reads == [(0, Schema.SNIFF_PREFIX_BYTES)] * 2
+
+    reads.clear()
+    schema = Schema.sniff_range(RangeFetcher(), large.get_ref())
+    assert schema is not None
+    assert schema.get_blob().get_bytes() == large.get_bytes()
+    assert len(reads) == 2
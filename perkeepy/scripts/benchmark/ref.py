@@ -0,0 +1,92 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Measures how fast refs are created, and the memory used by Ref objects and
+by sets of refs.
+
+    python -m perkeepy.scripts.benchmark.ref --count 100000
+"""
+
+from typing import Callable
+from typing import List
+from typing import Set
+
+import hashlib
+import time
+import tracemalloc
+
+import click
+
+from perkeepy.blob import Ref
+from perkeepy.blob import RefSet
+
+
+@click.command()
+@click.option("--count", type=int, default=100000, help="Number of refs")
+def main(*, count: int) -> None:
+    ref_strs: List[str] = [
+        "sha224-" + hashlib.sha224(str(i).encode()).hexdigest()
+        for i in range(count)
+    ]
+
+    contents: List[bytes] = [str(i).encode() for i in range(count)]
+    for name, create_refs in [
+        ("from_ref_str", lambda: [Ref.from_ref_str(s) for s in ref_strs]),
+        ("parse_many", lambda: Ref.parse_many(ref_strs)),
+        ("from_contents_bytes", lambda: _from_contents(contents)),
+    ]:
+        seconds: float = _time(create_refs)
+        click.echo(f"{name}: {count / seconds:,.0f} refs/s")
+
+    tracemalloc.start()
+    refs: List[Ref] = [Ref.from_ref_str(ref_str) for ref_str in ref_strs]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Don't count the list holding the refs
+    allocated -= refs.__sizeof__()
+
+    click.echo(f"{count} refs: {allocated / count:.1f} bytes/ref")
+
+    tracemalloc.start()
+    str_set: Set[str] = {f"sha224-{ref.get_hexdigest()}" for ref in refs}
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    click.echo(f"set[str]: {allocated / len(str_set):.1f} bytes/ref")
+
+    tracemalloc.start()
+    refset: RefSet = RefSet(refs)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    click.echo(f"RefSet: {allocated / len(refset):.1f} bytes/ref")
+
+
+def _from_contents(contents: List[bytes]) -> List[Ref]:
+    return [Ref.from_contents_bytes(data) for data in contents]
+
+
+def _time(f: Callable[[], List[Ref]], repeat: int = 3) -> float:
+    """Returns the best time of 'repeat' runs"""
+    best: float = float("inf")
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    main()
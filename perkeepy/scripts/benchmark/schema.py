@@ -0,0 +1,171 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures how fast schema blobs are parsed and validated.
+
+    python -m perkeepy.scripts.benchmark.schema --count 10000
+"""
+
+from typing import Callable
+from typing import Dict
+from typing import List
+
+import hashlib
+import json
+import os
+import time
+
+import click
+import jsonschema
+
+from perkeepy.blob import Blob
+from perkeepy.schema import Schema
+from perkeepy.schema.json_schema import JsonSchemaValidator
+
+
+@click.command()
+@click.option("--count", type=int, default=10000, help="Number of schemas")
+@click.option(
+    "--data-count", type=int, default=1000, help="Number of data blobs"
+)
+def main(*, count: int, data_count: int) -> None:
+    blobs: List[Blob] = [_make_schema_blob(i) for i in range(count)]
+    datas: List[Dict] = [json.loads(blob.get_bytes()) for blob in blobs]
+
+    for name, run in [
+        ("validate, new validator", lambda: _validate_uncompiled(datas)),
+        ("validate", lambda: _validate(datas)),
+        ("Schema.from_blob", lambda: _from_blob(blobs)),
+        ("Schema.sniff", lambda: _sniff(blobs)),
+    ]:
+        seconds: float = _time(run)
+        click.echo(f"{name}: {count / seconds:,.0f} schemas/s")
+
+    # Parsing only, without validation
+    for name, parse in [
+        ("parse, decoding twice", _parse_decoding_twice),
+        ("parse", _parse),
+    ]:
+        seconds = _time(lambda: _parse_all(parse, blobs))
+        click.echo(f"{name}: {count / seconds:,.0f} schemas/s")
+
+    # Rejecting data chunks, which most blobs are
+    data_blobs: List[Blob] = [
+        Blob.from_contents_bytes(os.urandom(64 << 10))
+        for _ in range(data_count)
+    ]
+    for name, run in [
+        ("Schema.from_blob", lambda: _try_from_blob(data_blobs)),
+        ("Schema.sniff", lambda: _sniff(data_blobs)),
+    ]:
+        seconds = _time(run)
+        click.echo(f"{name}, data blobs: {data_count / seconds:,.0f} blobs/s")
+
+
+def _make_schema_blob(i: int) -> Blob:
+    """Returns a file, bytes or permanode schema blob"""
+    parts: List[Dict] = [
+        {
+            "blobRef": "sha224-"
+            + hashlib.sha224(f"{i}-{j}".encode()).hexdigest(),
+            "size": 65536,
+        }
+        for j in range(8)
+    ]
+    kind: int = i % 3
+    if kind == 0:
+        data: Dict = {
+            "camliVersion": 1,
+            "camliType": "file",
+            "fileName": f"file-{i}.bin",
+            "parts": parts,
+        }
+    elif kind == 1:
+        data = {"camliVersion": 1, "camliType": "bytes", "parts": parts}
+    else:
+        data = {
+            "camliVersion": 1,
+            "camliType": "permanode",
+            "random": hashlib.sha1(str(i).encode()).hexdigest(),
+            "camliSigner": "sha224-" + "0" * 56,
+        }
+    return Blob.from_contents_str(json.dumps(data, indent=2))
+
+
+def _validate_uncompiled(datas: List[Dict]) -> None:
+    """Builds a validator for every schema, as validation used to"""
+    schema: Dict = JsonSchemaValidator.blob_json_schema
+    for data in datas:
+        validator = jsonschema.validators.validator_for(schema)(schema)
+        assert not list(validator.iter_errors(instance=data))
+
+
+def _validate(datas: List[Dict]) -> None:
+    for data in datas:
+        assert not JsonSchemaValidator.validate(data)
+
+
+def _from_blob(blobs: List[Blob]) -> None:
+    for blob in blobs:
+        Schema.from_blob(blob)
+
+
+def _parse_decoding_twice(blob: Blob) -> Dict:
+    """Parses a schema blob as Schema.from_blob used to"""
+    if len(blob.get_bytes()) > Schema.SCHEMA_MAX_BYTES:
+        raise Exception("Schema blob too large")
+    # Blob.is_utf8, without its ASCII fast path
+    blob.get_bytes().decode("utf-8")
+    return json.loads(blob.get_bytes().decode("utf-8"))
+
+
+def _parse(blob: Blob) -> Dict:
+    """Parses a schema blob as Schema.from_blob does"""
+    data: bytes = blob.get_bytes()
+    if len(data) > Schema.SCHEMA_MAX_BYTES:
+        raise Exception("Schema blob too large")
+    return json.loads(data.decode("utf-8"))
+
+
+def _parse_all(parse: Callable[[Blob], Dict], blobs: List[Blob]) -> None:
+    for blob in blobs:
+        parse(blob)
+
+
+def _try_from_blob(blobs: List[Blob]) -> None:
+    for blob in blobs:
+        try:
+            Schema.from_blob(blob)
+        except Exception:
+            pass
+
+
+def _sniff(blobs: List[Blob]) -> None:
+    for blob in blobs:
+        Schema.sniff(blob)
+
+
+def _time(f: Callable[[], None], repeat: int = 3) -> float:
+    """Returns the best time of 'repeat' runs"""
+    best: float = float("inf")
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Compares the throughput of the in-memory SortedKV implementations.
+
+    python -m perkeepy.scripts.benchmark.sortedkv --count 5000
+"""
+
+from typing import Callable
+from typing import List
+from typing import Tuple
+
+import random
+import time
+
+import click
+
+from perkeepy.sortedkv import BatchMutation
+from perkeepy.sortedkv import SortedKV
+from perkeepy.sortedkv.memory import MemorySortedKV
+from perkeepy.sortedkv.ordered_dict.ordered_dict import OrderedDictSortedKV
+
+IMPLEMENTATIONS: List[Tuple[str, Callable[[], SortedKV]]] = [
+    ("OrderedDictSortedKV", OrderedDictSortedKV),
+    ("MemorySortedKV", MemorySortedKV),
+]
+
+
+@click.command()
+@click.option("--count", type=int, default=5000, help="Number of keys")
+@click.option("--finds", type=int, default=1000, help="Number of finds")
+@click.option("--seed", type=int, default=0)
+def main(*, count: int, finds: int, seed: int) -> None:
+    rand = random.Random(seed)
+    keys: List[str] = [
+        f"meta:sha224-{rand.randbytes(28).hex()}" for _ in range(count)
+    ]
+    find_starts: List[str] = rand.choices(keys, k=finds)
+
+    click.echo(f"{count} keys, {finds} finds of 10 keys each")
+    for name, new_kv in IMPLEMENTATIONS:
+        kv: SortedKV = new_kv()
+
+        set_seconds: float = _time(lambda: _set_all(kv, keys))
+        get_seconds: float = _time(lambda: _get_all(kv, keys))
+        find_seconds: float = _time(lambda: _find_10_all(kv, find_starts))
+        delete_seconds: float = _time(lambda: _delete_all(kv, keys))
+        batch_seconds: float = _time(lambda: _batch_set_all(kv, keys))
+
+        click.echo(
+            f"{name:<20}"
+            f" set: {count / set_seconds:>12,.0f}/s"
+            f" get: {count / get_seconds:>12,.0f}/s"
+            f" find: {finds / find_seconds:>12,.0f}/s"
+            f" delete: {count / delete_seconds:>12,.0f}/s"
+            f" batch set: {count / batch_seconds:>12,.0f}/s"
+        )
+
+
+def _set_all(kv: SortedKV, keys: List[str]) -> None:
+    for key in keys:
+        kv.set(key, "v")
+
+
+def _get_all(kv: SortedKV, keys: List[str]) -> None:
+    for key in keys:
+        kv.get(key)
+
+
+def _find_10_all(kv: SortedKV, starts: List[str]) -> None:
+    for start in starts:
+        for i, _ in enumerate(kv.find(start, None)):
+            if i == 9:
+                break
+
+
+def _batch_set_all(kv: SortedKV, keys: List[str]) -> None:
+    batch: BatchMutation = kv.begin_batch()
+    for key in keys:
+        batch.set(key, "v")
+    kv.commit_batch(batch)
+
+
+def _delete_all(kv: SortedKV, keys: List[str]) -> None:
+    for key in keys:
+        kv.delete(key)
+
+
+def _time(f: Callable[[], None]) -> float:
+    start: float = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -12,58 +12,136 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import BinaryIO
 from typing import Optional
 from typing import Protocol
 from typing import Union
 
 import base64
+from dataclasses import dataclass
 
 import boto3
 import click
 
 from perkeepy.blob import Blob
 from perkeepy.blob import Ref
+from perkeepy.blobserver import Storage
+from perkeepy.blobserver.caching import CachingStorage
+from perkeepy.blobserver.localdisk import LocalDisk
 from perkeepy.blobserver.s3 import S3
 from perkeepy.blobserver.s3 import S3Client
+from perkeepy.index.sortedkv.index import SortedKVIndex
 from perkeepy.schema import BytesReader
 from perkeepy.schema import BytesSchema
 from perkeepy.schema import CamliType
 from perkeepy.schema import FileSchema
 from perkeepy.schema import Schema
+from perkeepy.schema import SchemaCache
+from perkeepy.sortedkv.sqlite import SQLiteSortedKV
+
+
+@dataclass
+class _Context:
+    # Listing reads blobs once, so it uses the S3 store directly
+    blobserver: S3
+    # Reading contents may fetch the same blobs again, so it goes through
+    # the cache
+    cached_blobserver: Storage
+    schema_cache: SchemaCache
 
 
 @click.group()
 @click.option("--bucket", type=str, required=True)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help="Keep blobs fetched by 'get' in this directory across invocations",
+)
+@click.option(
+    "--schema-cache",
+    type=click.Path(dir_okay=False),
+    help="Keep parsed schemas in this SQLite database across invocations",
+)
 @click.pass_context
-def cli(ctx: click.Context, *, bucket: str) -> None:
+def cli(
+    ctx: click.Context,
+    *,
+    bucket: str,
+    cache_dir: Optional[str],
+    schema_cache: Optional[str],
+) -> None:
     s3_client: S3Client = boto3.client("s3")
     blobserver = S3(s3_client=s3_client, bucket=bucket)
-    ctx.obj = blobserver
+
+    schema_cache_kv: Optional[SQLiteSortedKV] = None
+    if schema_cache:
+        schema_cache_kv = SQLiteSortedKV(schema_cache)
+        ctx.call_on_close(schema_cache_kv.close)
+
+    ctx.obj = _Context(
+        blobserver=blobserver,
+        cached_blobserver=CachingStorage(
+            blobserver,
+            disk_cache=LocalDisk(cache_dir) if cache_dir else None,
+        ),
+        schema_cache=SchemaCache(sorted_kv=schema_cache_kv),
+    )
 
 
 @cli.command("list")
 @click.option("--only-schemas", is_flag=True)
 @click.option("--schema-type", type=str)
+@click.option(
+    "--index",
+    type=click.Path(dir_okay=False),
+    help=(
+        "Answer schema queries from this SQLite index of blob types, "
+        "fetching only blobs that it does not know yet"
+    ),
+)
 @click.pass_obj
 def list_(
-    blobserver: S3, *, only_schemas: bool, schema_type: Optional[str]
+    ctx: _Context,
+    *,
+    only_schemas: bool,
+    schema_type: Optional[str],
+    index: Optional[str],
 ) -> None:
+    blobserver: S3 = ctx.blobserver
     only_schemas = only_schemas or schema_type is not None
     camli_type: Optional[CamliType] = None
-    if only_schemas:
+    if schema_type is not None:
         camli_type = CamliType(schema_type)
 
-    for ref in blobserver.enumerate_blobs():
+    if not only_schemas:
+        for ref in blobserver.enumerate_blobs(after=None):
+            click.echo(ref.to_str())
+        return
+
+    if index is not None:
+        sorted_kv = SQLiteSortedKV(index)
+        try:
+            for blob_meta in SortedKVIndex(sorted_kv).enumerate_blob_metas(
+                blobserver
+            ):
+                blob_type: Optional[CamliType] = blob_meta.get_schema_type()
+                if blob_type is None:
+                    continue
+                if camli_type is not None and blob_type != camli_type:
+                    continue
+                click.echo(blob_meta.get_ref().to_str())
+        finally:
+            sorted_kv.close()
+        return
 
-        if only_schemas:
-            blob: Blob = blobserver.fetch_blob(ref)
-            try:
-                schema: Schema = Schema.from_blob(blob)
-            except Exception:
-                continue
+    for ref in blobserver.enumerate_blobs(after=None):
+        # Blobs that are not schemas only cost the read of their prefix
+        schema: Optional[Schema] = Schema.sniff_range(blobserver, ref)
+        if schema is None:
+            continue
 
-            if camli_type is not None and schema.get_type() != camli_type:
-                continue
+        if camli_type is not None and schema.get_type() != camli_type:
+            continue
 
         click.echo(ref.to_str())
 
@@ -74,12 +152,15 @@ def list_(
     "--contents", type=bool, required=False, default=False, is_flag=True
 )
 @click.pass_obj
-def get(blobserver: S3, *, ref: str, contents: bool) -> None:
+def get(ctx: _Context, *, ref: str, contents: bool) -> None:
     ref_: Ref = Ref.from_ref_str(ref)
-    blob = blobserver.fetch_blob(ref_)
 
     if contents:
-        schema: Schema = Schema.from_blob(blob)
+        schema: Optional[Schema] = ctx.schema_cache.get(ref_)
+        if schema is None:
+            schema = ctx.schema_cache.parse(
+                _fetch_blob(ctx.cached_blobserver, ref_)
+            )
         schema_to_read: Union[BytesSchema, FileSchema]
 
         if schema.get_type() == CamliType.FILE:
@@ -92,17 +173,28 @@ def get(blobserver: S3, *, ref: str, contents: bool) -> None:
 
         bytes_reader: BytesReader = BytesReader(
             blob=schema_to_read,
-            fetcher=blobserver,
+            fetcher=ctx.cached_blobserver,
+            schema_cache=ctx.schema_cache,
         )
-        full_contents: bytes = bytes_reader.read()
-        click.echo(full_contents)
+        stdout: BinaryIO = click.get_binary_stream("stdout")
+        for chunk in bytes_reader.iter_chunks():
+            stdout.write(chunk)
+        stdout.flush()
         return
 
+    blob: Blob = _fetch_blob(ctx.cached_blobserver, ref_)
     if blob.is_utf8():
         click.echo(blob.get_bytes().decode("utf-8"))
     else:
         click.echo(base64.b64encode(blob.get_bytes()))
 
 
+def _fetch_blob(blobserver: Storage, ref: Ref) -> Blob:
+    blob: Optional[Blob] = blobserver.fetch_blob(ref)
+    if blob is None:
+        raise click.ClickException(f"Blob not found: {ref.to_str()}")
+    return blob
+
+
 if __name__ == "__main__":
     cli()
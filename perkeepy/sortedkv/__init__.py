@@ -12,5 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from .batch import BatchMutation
+from .batch import Mutation
 from .interface import KV
 from .interface import SortedKV
@@ -0,0 +1,51 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import List
+from typing import Optional
+
+from dataclasses import dataclass
+
+
+@dataclass
+class Mutation:
+    key: str
+    # None when the mutation deletes the key.
+    value: Optional[str]
+
+    def is_delete(self) -> bool:
+        return self.value is None
+
+
+class BatchMutation:
+    """
+    Buffered sets and deletes, applied atomically and in order when passed
+    to SortedKV.commit_batch().
+    """
+
+    def __init__(self) -> None:
+        self._mutations: List[Mutation] = []
+
+    def set(self, key: str, value: str) -> None:
+        self._mutations.append(Mutation(key=key, value=value))
+
+    def delete(self, key: str) -> None:
+        self._mutations.append(Mutation(key=key, value=None))
+
+    def get_mutations(self) -> List[Mutation]:
+        return self._mutations
+
+    def __len__(self) -> int:
+        return len(self._mutations)
@@ -16,6 +16,8 @@ from typing import Iterator
 from typing import Optional
 from typing import Protocol
 
+from .batch import BatchMutation
+
 
 class KV(Protocol):
     def key(self) -> str:
@@ -46,3 +48,10 @@ class SortedKV(Protocol):
         to 'start' but smaller than 'end'.
         """
         ...
+
+    def begin_batch(self) -> BatchMutation:
+        ...
+
+    def commit_batch(self, batch: BatchMutation) -> None:
+        """Atomically applies the mutations of the batch, in order"""
+        ...
@@ -0,0 +1,151 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Final
+from typing import Iterator
+from typing import Optional
+
+import bisect
+
+from perkeepy.sortedkv import KV
+from perkeepy.sortedkv import BatchMutation
+from perkeepy.sortedkv import SortedKV
+
+
+class MemoryKeyValue:
+    def __init__(self, key: str, value: str) -> None:
+        self._key = key
+        self._value = value
+
+    def key(self) -> str:
+        return self._key
+
+    def value(self) -> str:
+        return self._value
+
+    @staticmethod
+    def _assert_implements_kv(kv: "MemoryKeyValue") -> KV:
+        return kv
+
+
+class MemorySortedKV:
+    """
+    In-memory SortedKV that keeps its keys in a sorted list next to a dict
+    of values.
+
+    get() is a dict lookup, find() starts with a binary search on the
+    sorted keys and set()/delete() only bisect when adding or removing a key.
+    """
+
+    # Batches adding or removing more keys than this rebuild the sorted
+    # keys instead of bisecting once per key.
+    _BATCH_REBUILD_THRESHOLD: Final[int] = 64
+
+    def __init__(self) -> None:
+        self._values: dict[str, str] = {}
+        self._sorted_keys: list[str] = []
+        # Incremented when keys are added or removed, so that ongoing finds
+        # know that they need to look for their position again.
+        self._version: int = 0
+
+    def get(self, key: str) -> Optional[str]:
+        return self._values.get(key, None)
+
+    def set(self, key: str, value: str) -> None:
+        if key not in self._values:
+            bisect.insort(self._sorted_keys, key)
+            self._version += 1
+        self._values[key] = value
+
+    def delete(self, key: str) -> None:
+        """Deleting non-existent keys is OK"""
+        if self._values.pop(key, None) is None:
+            return
+        del self._sorted_keys[bisect.bisect_left(self._sorted_keys, key)]
+        self._version += 1
+
+    def find(self, start: str, end: Optional[str]) -> Iterator[KV]:
+        """
+        Returns an iterator starting at the first key greater or equal
+        to 'start' but smaller than 'end'.
+        """
+        index: int = bisect.bisect_left(self._sorted_keys, start)
+        version: int = self._version
+
+        while index < len(self._sorted_keys):
+            key: str = self._sorted_keys[index]
+            if end is not None and key >= end:
+                break
+
+            yield MemoryKeyValue(key=key, value=self._values[key])
+
+            if version == self._version:
+                index += 1
+            else:
+                index = bisect.bisect_right(self._sorted_keys, key)
+                version = self._version
+
+    def begin_batch(self) -> BatchMutation:
+        return BatchMutation()
+
+    def commit_batch(self, batch: BatchMutation) -> None:
+        # Apply the mutations to the values, remembering whether each key
+        # existed before the batch.
+        existed: dict[str, bool] = {}
+        for mutation in batch.get_mutations():
+            if mutation.key not in existed:
+                existed[mutation.key] = mutation.key in self._values
+            if mutation.value is None:
+                self._values.pop(mutation.key, None)
+            else:
+                self._values[mutation.key] = mutation.value
+
+        added: list[str] = [
+            key
+            for key, did_exist in existed.items()
+            if not did_exist and key in self._values
+        ]
+        removed: set[str] = {
+            key
+            for key, did_exist in existed.items()
+            if did_exist and key not in self._values
+        }
+        if not added and not removed:
+            return
+
+        # Then update the sorted keys once for the whole batch.
+        if len(removed) > self._BATCH_REBUILD_THRESHOLD:
+            self._sorted_keys = [
+                key for key in self._sorted_keys if key not in removed
+            ]
+        else:
+            for key in removed:
+                index: int = bisect.bisect_left(self._sorted_keys, key)
+                del self._sorted_keys[index]
+
+        if len(added) > self._BATCH_REBUILD_THRESHOLD:
+            # Both runs are sorted, timsort merges them in linear time.
+            added.sort()
+            self._sorted_keys.extend(added)
+            self._sorted_keys.sort()
+        else:
+            for key in added:
+                bisect.insort(self._sorted_keys, key)
+
+        self._version += 1
+
+    @staticmethod
+    def _assert_implements_sortedkv(d: "MemorySortedKV") -> SortedKV:
+        return d
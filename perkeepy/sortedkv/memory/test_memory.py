@@ -0,0 +1,41 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import List
+
+from perkeepy.sortedkv import test_sorted
+
+from .memory import MemorySortedKV
+
+
+def test_memory() -> None:
+    kv = MemorySortedKV()
+    test_sorted.run_sortedkv_test(kv)
+
+
+def test_mutate_while_finding() -> None:
+    kv = MemorySortedKV()
+    for key in ["a", "c", "e", "g"]:
+        kv.set(key, key + "v")
+
+    found: List[str] = []
+    for key_value in kv.find("b", None):
+        found.append(key_value.key())
+        if key_value.key() == "c":
+            kv.delete("c")
+            kv.set("d", "dv")
+            kv.delete("g")
+
+    assert found == ["c", "d", "e"]
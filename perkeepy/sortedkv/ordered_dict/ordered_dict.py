@@ -18,6 +18,7 @@ from typing import Optional
 from collections import OrderedDict
 
 from perkeepy.sortedkv import KV
+from perkeepy.sortedkv import BatchMutation
 from perkeepy.sortedkv import SortedKV
 
 
@@ -46,6 +47,9 @@ class OrderedDictSortedKV:
 
     def set(self, key: str, value: str) -> None:
         self._dict[key] = value
+        self._sort()
+
+    def _sort(self) -> None:
         for key in sorted(self._dict.keys()):
             self._dict.move_to_end(key)
 
@@ -62,6 +66,17 @@ class OrderedDictSortedKV:
             if key >= start and (end is None or key < end):
                 yield OrderedDictKeyValue(key=key, value=value)
 
+    def begin_batch(self) -> BatchMutation:
+        return BatchMutation()
+
+    def commit_batch(self, batch: BatchMutation) -> None:
+        for mutation in batch.get_mutations():
+            if mutation.value is None:
+                self._dict.pop(mutation.key, None)
+            else:
+                self._dict[mutation.key] = mutation.value
+        self._sort()
+
     @staticmethod
     def _assert_implements_sortedkv(d: "OrderedDictSortedKV") -> SortedKV:
         return d
@@ -0,0 +1,140 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import sqlite3
+
+from perkeepy.sortedkv import KV
+from perkeepy.sortedkv import BatchMutation
+from perkeepy.sortedkv import SortedKV
+
+
+class SQLiteKeyValue:
+    def __init__(self, key: str, value: str) -> None:
+        self._key = key
+        self._value = value
+
+    def key(self) -> str:
+        return self._key
+
+    def value(self) -> str:
+        return self._value
+
+    @staticmethod
+    def _assert_implements_kv(kv: "SQLiteKeyValue") -> KV:
+        return kv
+
+
+class SQLiteSortedKV:
+    """
+    SortedKV persisted in a SQLite database.
+
+    Rows are stored in a WITHOUT ROWID table keyed by 'k', so that range
+    scans are served directly from the table's B-tree. The database uses
+    write-ahead logging and survives restarts.
+    """
+
+    def __init__(self, path: str, *, find_page_size: int = 1000) -> None:
+        self._find_page_size: int = find_page_size
+        self._conn: sqlite3.Connection = sqlite3.connect(
+            path,
+            isolation_level=None,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " k TEXT PRIMARY KEY NOT NULL,"
+            " v TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        row: Optional[Tuple[str]] = self._conn.execute(
+            "SELECT v FROM kv WHERE k = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO kv (k, v) VALUES (?, ?)", (key, value)
+        )
+
+    def delete(self, key: str) -> None:
+        """Deleting non-existent keys is OK"""
+        self._conn.execute("DELETE FROM kv WHERE k = ?", (key,))
+
+    def find(self, start: str, end: Optional[str]) -> Iterator[KV]:
+        """
+        Returns an iterator starting at the first key greater or equal
+        to 'start' but smaller than 'end'.
+
+        Rows are fetched in pages so that no read transaction is held open
+        while the caller consumes the iterator.
+        """
+        end_clause: str = " AND k < ?" if end is not None else ""
+        end_params: Tuple[str, ...] = (end,) if end is not None else ()
+
+        start_op: str = ">="
+        while True:
+            rows: List[Tuple[str, str]] = self._conn.execute(
+                f"SELECT k, v FROM kv WHERE k {start_op} ?{end_clause}"
+                " ORDER BY k LIMIT ?",
+                (start, *end_params, self._find_page_size),
+            ).fetchall()
+
+            for key, value in rows:
+                yield SQLiteKeyValue(key=key, value=value)
+
+            if len(rows) < self._find_page_size:
+                return
+
+            start = rows[-1][0]
+            start_op = ">"
+
+    def begin_batch(self) -> BatchMutation:
+        return BatchMutation()
+
+    def commit_batch(self, batch: BatchMutation) -> None:
+        """Applies the whole batch in a single transaction"""
+        self._conn.execute("BEGIN")
+        try:
+            for mutation in batch.get_mutations():
+                if mutation.value is None:
+                    self._conn.execute(
+                        "DELETE FROM kv WHERE k = ?", (mutation.key,)
+                    )
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO kv (k, v) VALUES (?, ?)",
+                        (mutation.key, mutation.value),
+                    )
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _assert_implements_sortedkv(d: "SQLiteSortedKV") -> SortedKV:
+        return d
@@ -0,0 +1,51 @@
+# Copyright 2021 The Perkeepy Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import tempfile
+
+from perkeepy.sortedkv import test_sorted
+
+from .sqlite import SQLiteSortedKV
+
+
+def test_sqlite() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        kv = SQLiteSortedKV(os.path.join(tmpdir, "index.sqlite"))
+        test_sorted.run_sortedkv_test(kv)
+        kv.close()
+
+
+def test_sqlite_find_pages() -> None:
+    kv = SQLiteSortedKV(":memory:", find_page_size=2)
+    keys = [f"k{i:02d}" for i in range(7)]
+    for key in keys:
+        kv.set(key, key)
+    assert [kv.key() for kv in kv.find("", None)] == keys
+    assert [kv.key() for kv in kv.find("k01", "k05")] == keys[1:5]
+    kv.close()
+
+
+def test_sqlite_persists() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path: str = os.path.join(tmpdir, "index.sqlite")
+
+        kv = SQLiteSortedKV(path)
+        kv.set("foo", "bar")
+        kv.close()
+
+        kv = SQLiteSortedKV(path)
+        assert kv.get("foo") == "bar"
+        kv.close()
@@ -56,6 +56,31 @@ def run_sortedkv_test(kv: SortedKV) -> None:
     kv.set("y", "x:foo")
     assert_find_returns(kv, "x:", "x~", [])
 
+    # Batches are only applied when committed, in order.
+    batch = kv.begin_batch()
+    batch.set("d", "dv")
+    batch.set("b", "bv2")
+    batch.delete("c")
+    batch.delete("y")
+    batch.set("e", "ev")
+    batch.delete("e")
+    batch.delete("z")
+    assert kv.get("d") is None
+    kv.commit_batch(batch)
+    assert_find_returns(kv, "", None, [("a", "av"), ("b", "bv2"), ("d", "dv")])
+
+    # Large batches
+    batch = kv.begin_batch()
+    for i in range(200):
+        batch.set(f"batch:{i:03d}", str(i))
+    kv.commit_batch(batch)
+    assert len(list(kv.find("batch:", "batch;"))) == 200
+    batch = kv.begin_batch()
+    for i in range(200):
+        batch.delete(f"batch:{i:03d}")
+    kv.commit_batch(batch)
+    assert_find_returns(kv, "", None, [("a", "av"), ("b", "bv2"), ("d", "dv")])
+
 
 def is_empty(kv: SortedKV) -> bool:
     return len(list(kv.find("", None))) == 0